@@ -1,12 +1,32 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
 
 from backend.models.input_model import InputData
+from backend.services.comparables import get_comparables
+from backend.services.datasets import (
+    download_dataset,
+    get_rows,
+    get_rows_in_bbox,
+    get_rows_nearby,
+    list_datasets,
+)
 from backend.services.prediction import predict_cost_dpe
+from src.ml import warm_models
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the models once at startup, the first prediction does not wait for them.
+    warm_models()
+    yield
+
 
 app = FastAPI(
     title="DEP and consumption prediction API",
     description="API for predicting DPE class and energy consumption based on building features. Developped for M2 SISE 2025 project.",
+    lifespan=lifespan,
 )
 
 # Autoriser les appels depuis Streamlit
@@ -28,3 +48,79 @@ app.add_middleware(
 def predict_route(data: InputData):
     result = predict_cost_dpe(features=data)
     return result
+
+
+@app.post(
+    "/comparables",
+    summary="Find comparable homes",
+    description="Find the k stored homes most similar to the described home (same climate zone, building type and heating energy, closest surface, age and number of floors), with their actual DPE class and total cost.",
+)
+def comparables_route(data: InputData, k: int = Query(10, ge=1, le=100)):
+    return get_comparables(features=data, k=k)
+
+
+@app.get(
+    "/datasets",
+    summary="List the stored datasets",
+    description="List the stored datasets with their metadata (rows, departments, reception dates, summary statistics).",
+)
+def datasets_route():
+    return list_datasets()
+
+
+@app.get(
+    "/datasets/{name}/rows",
+    summary="Read rows of a dataset",
+    description="Read a page of rows of a stored dataset, optionally restricted to some columns.",
+)
+def dataset_rows_route(
+    name: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=10_000),
+    columns: list[str] | None = Query(None),
+):
+    return get_rows(name, offset=offset, limit=limit, columns=columns)
+
+
+@app.get(
+    "/datasets/{name}/download",
+    summary="Download a dataset",
+    description="Stream a stored dataset as a compressed CSV (csv.gz), a CSV or a Parquet file.",
+)
+def dataset_download_route(name: str, format: str = "csv.gz"):
+    return download_dataset(name, fmt=format)
+
+
+@app.get(
+    "/datasets/{name}/bbox",
+    summary="Read the rows of a dataset inside a bounding box",
+    description="Read the rows of a stored dataset whose coordinates are inside a bounding box, using the spatial index of the dataset.",
+)
+def dataset_bbox_route(
+    name: str,
+    lat_min: float = Query(..., ge=-90, le=90),
+    lon_min: float = Query(..., ge=-180, le=180),
+    lat_max: float = Query(..., ge=-90, le=90),
+    lon_max: float = Query(..., ge=-180, le=180),
+    limit: int = Query(1000, ge=1, le=10_000),
+    columns: list[str] | None = Query(None),
+):
+    return get_rows_in_bbox(
+        name, (lat_min, lon_min, lat_max, lon_max), limit=limit, columns=columns
+    )
+
+
+@app.get(
+    "/datasets/{name}/nearby",
+    summary="Read the rows of a dataset around a point",
+    description="Read the rows of a stored dataset within a radius (radius_m) and/or the k nearest rows of a point, closest first, using the spatial index of the dataset.",
+)
+def dataset_nearby_route(
+    name: str,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float | None = Query(None, gt=0, le=100_000),
+    k: int | None = Query(None, ge=1, le=10_000),
+    columns: list[str] | None = Query(None),
+):
+    return get_rows_nearby(name, lat, lon, radius_m=radius_m, k=k, columns=columns)
@@ -0,0 +1,42 @@
+from fastapi import HTTPException
+
+from backend.models.input_model import InputData
+from src.data_requesters import geo_api
+from src.storage.comparables import find_comparables
+
+
+def get_comparables(features: InputData, k: int = 10) -> dict:
+    """Find the stored homes most similar to the home described by the user.
+
+    Args:
+        features (InputData): The home described by the user (the cost is not used).
+        k (int, optional): Number of comparables. Defaults to 10.
+
+    Returns:
+        dict: The climate zone of the city and the comparables, closest first, with
+            their actual DPE class and total cost.
+    """
+    geo_info = geo_api.get_city_info(ville=features.city)
+    if not geo_info or geo_info.get("zone_climatique") is None:
+        raise HTTPException(
+            status_code=400,
+            detail="❌ Unable to retrieve geographical features for the provided city/INSEE code.",
+        )
+
+    home = {
+        "zone_climatique": geo_info["zone_climatique"],
+        "type_batiment": features.building.value,
+        "type_energie_principale_chauffage": features.main_heating_energy.value,
+        "surface_habitable_logement": features.area,
+        "age_batiment": features.age,
+        "nombre_niveau_logement": features.n_floors,
+    }
+    comparables = find_comparables(home, k=k)
+    comparables["distance"] = comparables["distance"].astype(float).round(3)
+
+    return {
+        "zone_climatique": home["zone_climatique"],
+        "comparables": comparables.astype(object)
+        .where(comparables.notna(), None)
+        .to_dict(orient="records"),
+    }
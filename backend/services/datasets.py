@@ -0,0 +1,167 @@
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from src.storage import dataset_info, read_catalog
+from src.storage.arrow_mmap import open_table
+from src.storage.exports import EXPORT_FORMATS, iter_export
+from src.storage.spatial_index import load_spatial_index
+
+
+def list_datasets() -> list[dict]:
+    """List the stored datasets with their catalog metadata (no dataset is opened)."""
+    return [
+        {k: v for k, v in entry.items() if k != "schema"}
+        for entry in read_catalog().values()
+    ]
+
+
+def _dataset_info(name: str) -> dict:
+    """Catalog entry of a dataset, 404 if it does not exist."""
+    info = dataset_info(name)
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"❌ Unknown dataset: {name}")
+    return info
+
+
+def _check_columns(info: dict, columns: list[str] | None) -> None:
+    """Raise a 400 error if some requested columns are not in the dataset."""
+    if columns:
+        unknown = set(columns) - set(info["schema"])
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"❌ Unknown column(s): {sorted(unknown)}"
+            )
+
+
+def _records(df) -> list[dict]:
+    """Rows of a DataFrame as JSON-ready records (missing values as None)."""
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def get_rows(
+    name: str, offset: int = 0, limit: int = 100, columns: list[str] | None = None
+) -> dict:
+    """Get a page of rows of a dataset, read from its memory-mapped Arrow file.
+
+    The file is shared with the Streamlit app: only the requested page is converted.
+
+    Args:
+        name (str): The dataset name.
+        offset (int, optional): Index of the first row. Defaults to 0.
+        limit (int, optional): Number of rows. Defaults to 100.
+        columns (list[str] | None, optional): Columns to return. Defaults to None (all columns).
+
+    Returns:
+        dict: The dataset version, its number of rows and the page of rows.
+    """
+    info = _dataset_info(name)
+    _check_columns(info, columns)
+
+    table = open_table(name, columns)
+    return {
+        "name": name,
+        "version": info["version"],
+        "total_rows": table.num_rows,
+        "offset": offset,
+        "rows": table.slice(offset, limit).to_pylist(),
+    }
+
+
+def download_dataset(name: str, fmt: str = "csv.gz") -> StreamingResponse:
+    """Stream the export of a dataset in chunks, the file is built once per dataset version.
+
+    Args:
+        name (str): The dataset name.
+        fmt (str, optional): Export format, a key of EXPORT_FORMATS. Defaults to "csv.gz".
+
+    Returns:
+        StreamingResponse: The file, sent chunk by chunk.
+    """
+    _dataset_info(name)
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"❌ Unknown format {fmt}, expected one of {list(EXPORT_FORMATS)}",
+        )
+
+    extension, mime = EXPORT_FORMATS[fmt]
+    return StreamingResponse(
+        iter_export(name, fmt),
+        media_type=mime,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+    )
+
+
+def get_rows_in_bbox(
+    name: str,
+    bbox: tuple[float, float, float, float],
+    limit: int = 1000,
+    columns: list[str] | None = None,
+) -> dict:
+    """Get the rows of a dataset inside a bounding box, found with its spatial index.
+
+    Args:
+        name (str): The dataset name.
+        bbox (tuple[float, float, float, float]): (lat_min, lon_min, lat_max, lon_max).
+        limit (int, optional): Maximum number of rows returned. Defaults to 1000.
+        columns (list[str] | None, optional): Columns to return. Defaults to None (all columns).
+
+    Returns:
+        dict: The dataset version, the number of rows in the box and the first rows.
+    """
+    _check_columns(_dataset_info(name), columns)
+
+    index = load_spatial_index(name)
+    row_ids = index.bbox(*bbox)
+    return {
+        "name": name,
+        "version": index.version,
+        "total_rows": len(row_ids),
+        "rows": _records(index.rows(row_ids[:limit], columns)),
+    }
+
+
+def get_rows_nearby(
+    name: str,
+    lat: float,
+    lon: float,
+    radius_m: float | None = None,
+    k: int | None = None,
+    columns: list[str] | None = None,
+) -> dict:
+    """Get the rows of a dataset around a point, closest first, with their distance.
+
+    Args:
+        name (str): The dataset name.
+        lat (float): Latitude of the point.
+        lon (float): Longitude of the point.
+        radius_m (float | None, optional): Keep the rows within this distance in meters. Defaults to None.
+        k (int | None, optional): Keep the k closest rows. Defaults to None.
+        columns (list[str] | None, optional): Columns to return. Defaults to None (all columns).
+
+    Returns:
+        dict: The dataset version and the rows, with a distance_m field.
+    """
+    _check_columns(_dataset_info(name), columns)
+    if radius_m is None and k is None:
+        raise HTTPException(
+            status_code=400,
+            detail="❌ Give a radius (radius_m), a number of rows (k) or both",
+        )
+
+    index = load_spatial_index(name)
+    if radius_m is not None:
+        row_ids, distances = index.within(lat, lon, radius_m)
+        if k is not None:
+            row_ids, distances = row_ids[:k], distances[:k]
+    else:
+        row_ids, distances = index.nearest(lat, lon, k)
+
+    rows = index.rows(row_ids, columns)
+    rows["distance_m"] = distances.round(1)
+    return {
+        "name": name,
+        "version": index.version,
+        "total_rows": len(rows),
+        "rows": _records(rows),
+    }
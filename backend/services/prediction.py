@@ -1,15 +1,8 @@
-import joblib
 from fastapi import HTTPException
 
 from backend.models.input_model import InputData
-from backend.services import BASE_DIR
 from backend.services.data_preparation import prepare_data
-
-CLASSIFICATION_MODEL_PATH = (
-    BASE_DIR / "MLmodels" / "pipeline_xgboost_classification.pkl"
-)
-REGRESSION_MODEL_PATH = BASE_DIR / "MLmodels" / "pipeline_best_regression.pkl"
-ENCODER_PATH = BASE_DIR / "MLmodels" / "label_encoder_target.pkl"
+from src.ml import CURRENT_MODELS, load_models
 
 
 def predict_cost_dpe(features: InputData) -> dict:
@@ -23,13 +16,15 @@ def predict_cost_dpe(features: InputData) -> dict:
             detail="❌ Unable to retrieve geographical features for the provided city/INSEE code.",
         )
 
+    # Current version of the models (cached, follows the promotions of the registry)
+    pipeline_regression_model, pipeline_classification_model, label_encoder = (
+        load_models(CURRENT_MODELS)
+    )
+
     need_cost_prediction = X_input["cout_total_5_usages"].isnull().any()
     # Check if the cost is provided or not.
     if need_cost_prediction:
         # If not provided, run the prediction using the regression model.
-        # load the regression pipeline
-        pipeline_regression_model = joblib.load(REGRESSION_MODEL_PATH)
-
         X_input_regression = X_input.drop(columns=["cout_total_5_usages"])
 
         # Make the prediction
@@ -38,10 +33,6 @@ def predict_cost_dpe(features: InputData) -> dict:
         # Complete the cost in the input data for classification.
         X_input["cout_total_5_usages"] = cost_pred
 
-    # load the pipeline and the model
-    pipeline_classification_model = joblib.load(CLASSIFICATION_MODEL_PATH)
-    label_encoder = joblib.load(ENCODER_PATH)
-
     # ---- Prediction
     try:
         y_pred_int = pipeline_classification_model.predict(X_input)
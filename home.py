@@ -6,6 +6,8 @@ from pathlib import Path
 
 import streamlit as st
 
+from src.ml import warm_models_in_background
+
 # === Pages path definition and Menu ===
 PAGES_PATH = Path(__file__).parent / "pages"
 ASSETS_PATH = Path(__file__).parent / "assets"
@@ -23,6 +25,7 @@ pages = {
     ],
     "Prediction": [
         st.Page(PAGES_PATH / "prediction.py", title="🔮 Predict DPE Class"),
+        st.Page(PAGES_PATH / "batch_prediction.py", title="📦 Batch Scoring"),
         st.Page(PAGES_PATH / "retrain_models.py", title="⚙️ Model Retraining"),
     ],
 }
@@ -58,6 +61,9 @@ st.markdown(
 )
 
 
+# === Models loaded in the background at app start (shared by every session) ===
+warm_models_in_background()
+
 pg = st.navigation(pages)
 
 
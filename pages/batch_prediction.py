@@ -0,0 +1,148 @@
+import time
+
+import pandas as pd
+import streamlit as st
+
+from src.data_requesters.city_lookup import resolve_cities
+from src.ml import available_model_versions, load_models
+from src.ml.batch_scoring import (
+    OPTIONAL_COLUMNS,
+    REQUIRED_COLUMNS,
+    check_columns,
+    score,
+    template,
+)
+
+# Page configuration
+st.set_page_config(page_title="DPE Batch Scoring", page_icon="📦", layout="wide")
+st.title("📦 Batch Scoring of a Housing Portfolio")
+st.write(
+    "Upload a CSV file with one home per row: the cost (when missing) and the DPE class "
+    "of every home are predicted at once."
+)
+
+# Sidebar model selection
+st.sidebar.header("⚙️ Settings")
+model_choice = st.sidebar.selectbox(
+    "🧠 Model selection",
+    options=available_model_versions(),
+    help="Choose which version of the models to use for prediction.",
+)
+online = st.sidebar.checkbox(
+    "🌐 Look up unknown cities online",
+    value=True,
+    help="Cities are first searched in the previous lookups and in the stored datasets. "
+    "Untick to work offline.",
+)
+
+try:
+    pipeline_regression, pipeline_classification, label_encoder = load_models(
+        model_choice
+    )
+except FileNotFoundError as e:
+    st.error(f"❌ Missing model file: {e}")
+    st.stop()
+except Exception as e:
+    st.error(f"❌ Error while loading models: {e}")
+    st.stop()
+
+# Expected format
+with st.expander("📄 Expected file format"):
+    st.markdown(
+        f"- **Required columns:** {', '.join(f'`{c}`' for c in REQUIRED_COLUMNS)}\n"
+        f"- **Optional columns:** {', '.join(f'`{c}`' for c in OPTIONAL_COLUMNS)} "
+        "(total cost in €/year, positive, predicted when empty)\n"
+        "- `city`: city name or INSEE code\n"
+        "- `main_heating_energy`: Électricité, Gaz naturel or Autre\n"
+        "- `building`: maison, appartement or immeuble\n"
+        "- Other columns are kept as they are in the scored file."
+    )
+    st.dataframe(template(), hide_index=True)
+    st.download_button(
+        "⬇️ Download the template",
+        template().to_csv(index=False).encode("utf-8"),
+        file_name="batch_scoring_template.csv",
+        mime="text/csv",
+    )
+
+uploaded = st.file_uploader("📤 CSV file to score", type=["csv"])
+if uploaded is None:
+    st.info("⬆️ Please upload a CSV file to get started.")
+    st.stop()
+
+# INSEE codes keep their leading zeros.
+df = pd.read_csv(uploaded, sep=None, engine="python", dtype={"city": str})
+missing = check_columns(df)
+if missing:
+    st.error(f"❌ Missing column(s): {', '.join(missing)}")
+    st.stop()
+
+st.write(f"**Rows:** {len(df):,} — **Distinct cities:** {df['city'].nunique():,}")
+st.dataframe(df.head(), hide_index=True)
+
+# The result is kept for the file and the models it was computed with.
+result_key = (uploaded.file_id, model_choice)
+
+if st.button("🚀 Score the file"):
+    start = time.time()
+
+    with st.spinner("📡 Resolving the cities..."):
+        geo_bar = st.progress(0.0, text="Cities")
+        geo = resolve_cities(
+            df["city"].astype("string").str.strip().dropna().unique(),
+            online=online,
+            progress=lambda p: geo_bar.progress(p, text="Cities"),
+        )
+
+    with st.spinner("🔮 Predicting..."):
+        score_bar = st.progress(0.0, text="Homes")
+        scored = score(
+            df,
+            geo,
+            pipeline_regression,
+            pipeline_classification,
+            label_encoder,
+            progress=lambda p: score_bar.progress(p, text="Homes"),
+        )
+
+    st.session_state.batch_scoring = {
+        "key": result_key,
+        "scored": scored,
+        "unknown_cities": sorted(c for c, info in geo.items() if info is None),
+        "duration": time.time() - start,
+    }
+
+result = st.session_state.get("batch_scoring")
+if result is None or result["key"] != result_key:
+    st.stop()
+
+scored = result["scored"]
+ok = scored["status"] == "ok"
+st.success(f"✅ {ok.sum():,} homes scored in {result['duration']:.1f} s")
+
+col1, col2, col3 = st.columns(3)
+col1.metric("🏠 Scored", f"{ok.sum():,}")
+col2.metric("⚠️ Rejected", f"{(~ok).sum():,}")
+col3.metric("❓ Unknown cities", len(result["unknown_cities"]))
+
+if (~ok).any():
+    st.warning("⚠️ Some rows could not be scored:")
+    st.dataframe(
+        scored.loc[~ok, "status"].value_counts().rename("rows"),
+        width="content",
+    )
+    if result["unknown_cities"]:
+        st.caption("Unknown cities: " + ", ".join(result["unknown_cities"][:50]))
+
+st.markdown("#### 📊 Predicted DPE classes")
+st.bar_chart(scored.loc[ok, "predicted_dpe_class"].value_counts().sort_index())
+
+st.markdown("#### 📋 Scored homes")
+st.dataframe(scored.head(1000), hide_index=True)
+
+st.download_button(
+    "⬇️ Download the scored file",
+    scored.to_csv(index=False).encode("utf-8"),
+    file_name=f"scored_{uploaded.name}",
+    mime="text/csv",
+)
@@ -4,6 +4,7 @@
 
 import os
 import sys
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
 import pandas as pd
@@ -27,6 +28,30 @@ config = {"width": "stretch"}
 # ⚙️ General configuration
 st.set_page_config(page_title="DPE - Data Context", page_icon="📋", layout="wide")
 
+
+def fetch_api_schemas() -> dict[str, Future]:
+    """Fetch the ADEME (existing and new housing) and Enedis schemas concurrently.
+
+    The answers are cached (memory and disk, see metadata_cache): after the first
+    load the futures are resolved without any request.
+
+    Returns:
+        dict[str, Future]: Futures of the fields, keyed by "existing", "new" and "enedis".
+    """
+    ademe, enedis = Ademe_API_requester(), Enedis_API_requester()
+    pool = ThreadPoolExecutor(max_workers=3)
+    futures = {
+        "existing": pool.submit(ademe.get_fields_by_group, neuf=False),
+        "new": pool.submit(ademe.get_fields_by_group, neuf=True),
+        "enedis": pool.submit(enedis.get_dataset_fields),
+    }
+    # The page keeps rendering while the requests run.
+    pool.shutdown(wait=False)
+    return futures
+
+
+api_schemas = fetch_api_schemas()
+
 # 📋 Title
 st.title("📋 Context - Overview of Available Data")
 
@@ -100,8 +125,7 @@ with st.expander("📋 See available DPE variables (fetched in real time from th
 
     try:
         with st.spinner(f"Fetching ADEME API metadata ({dataset_type})..."):
-            requester = Ademe_API_requester()
-            fields_by_group = requester.get_fields_by_group(neuf=neuf)
+            fields_by_group = api_schemas["new" if neuf else "existing"].result()
 
         if fields_by_group:
             total_fields = sum(len(fields) for fields in fields_by_group.values())
@@ -227,8 +251,7 @@ with st.expander(
 ):
     try:
         with st.spinner("Fetching Enedis API metadata..."):
-            requester = Enedis_API_requester()
-            fields = requester.get_dataset_fields()
+            fields = api_schemas["enedis"].result()
 
         if fields:
             st.success(
@@ -1,12 +1,13 @@
-from pathlib import Path
-
 import os
+
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
-from streamlit_dynamic_filters import DynamicFilters
 
+from src.storage import dataset_columns
+from src.storage.cube import FilterCube, load_cube
+from src.storage.query_engine import correlation, count_rows, query_dataset
 from src.utils.dataloader import generate_file_selector
 
 ASSETS = "assets"
@@ -17,8 +18,31 @@ config = {"width": "stretch"}
 # General configuration
 st.set_page_config(page_title="Statistics", page_icon="📊", layout="wide")
 
-# === Path to CSV Files ===
-DATASETS_DIR = Path(__file__).parent.parent / "data" / "datasets"
+DPE_CLASSES = ["A", "B", "C", "D", "E", "F", "G"]
+
+
+def display_filters(cube: FilterCube, columns: list[str]) -> dict[str, list[str]]:
+    """Display one multiselect per column, the options of each filter depending on the other selections.
+
+    Args:
+        cube (FilterCube): The pre-aggregated cube of the dataset.
+        columns (list[str]): The columns to filter on (dimensions of the cube).
+
+    Returns:
+        dict[str, list[str]]: The active filters (column -> selected values), to be pushed down to the queries.
+    """
+    selections = {c: st.session_state.get(f"filter_{c}", []) for c in columns}
+
+    for col, container in zip(columns, st.columns(len(columns), gap="large")):
+        other_filters = {k: v for k, v in selections.items() if k != col and v}
+        options = cube.options(col, other_filters)
+
+        # Drop selected values which are no longer available.
+        st.session_state[f"filter_{col}"] = [v for v in selections[col] if v in options]
+        with container:
+            selections[col] = st.multiselect(col, options, key=f"filter_{col}")
+
+    return {k: v for k, v in selections.items() if v}
 
 
 st.title("📊 Statistics of the DPE Dataset")
@@ -28,17 +52,17 @@ st.title("📊 Statistics of the DPE Dataset")
 with st.sidebar:
     st.header("📂 Dataset Selection")
 
-generate_file_selector()
-
-# Load the data in memory.
-data = st.session_state.get("df", None)
+# The dataset is queried by the statistics, it is never fully loaded in memory.
+generate_file_selector(load_data=False)
+dataset = st.session_state.get("last_file", None)
 
 # === Display Data ===
-if data is not None:
+if dataset is not None:
     # Check required columns
     required_cols = {"lat", "lon", "etiquette_dpe", "cout_total_5_usages"}
-    if not required_cols.issubset(data.columns):
-        st.error(f"❌ Missing columns: {required_cols - set(data.columns)}")
+    columns = set(dataset_columns(dataset))
+    if not required_cols.issubset(columns):
+        st.error(f"❌ Missing columns: {required_cols - columns}")
         st.stop()
 
     # Main tabs
@@ -50,30 +74,35 @@ if data is not None:
     # --- Tab 1: Datasets ---
     with tab1:
         st.subheader("Your data preview")
-        if data is not None:
-            st.write(f"Number of rows: {len(data)}")
-            st.dataframe(data.head(50), width="stretch")
-        else:
-            st.info("No CSV files uploaded.")
+        st.write(f"Number of rows: {count_rows(dataset)}")
+        st.dataframe(query_dataset(dataset, limit=50), width="stretch")
 
     # --- Tab 3: Statistics ---
     with tab2:
         # ------------------------------------------------------------------------------------------
+        # Metrics and charts come from the cube (built once per dataset version).
+        cube = load_cube(dataset)
 
         # Filter Section
         cols = ["nom_commune_ban", "type_batiment", "etiquette_dpe"]
-        for c in cols:
-            data[c] = data[c].fillna("Unknown").astype(str)
 
-        dynamic_filters = DynamicFilters(data, filters=cols)
         st.markdown("<br>", unsafe_allow_html=True)
         st.write("Filters")
-        dynamic_filters.display_filters(location="columns", num_columns=3, gap="large")
-
-        filtered_df = dynamic_filters.filter_df()
+        filters = display_filters(cube, cols)
 
         # Get the number of filtered rows
-        n = filtered_df.shape[0]
+        n = cube.count(filters)
+        if n == 0:
+            st.warning("⚠️ No data matches the selected filters.")
+            st.stop()
+
+        # Counts per DPE and GES class
+        dpe_counts = cube.class_counts("etiquette_dpe", filters).reindex(
+            DPE_CLASSES, fill_value=0
+        )
+        ges_counts = cube.class_counts("etiquette_ges", filters).reindex(
+            DPE_CLASSES, fill_value=0
+        )
 
         st.divider()
 
@@ -81,33 +110,39 @@ if data is not None:
         # Metrics Section
         col1, col2, col3, col4 = st.columns(4)
 
+        means = cube.stats(
+            ["surface_habitable_logement", "cout_total_5_usages"], filters
+        ).iloc[0]
+
         # Mean surface habitable
-        surface_moyenne = filtered_df["surface_habitable_logement"].mean()
+        surface_moyenne = means["surface_habitable_logement|avg"]
         col1.metric(
             label="Average living area",
             value=f"{round(surface_moyenne, 2)} m²",
             border=True,
         )
         # Mean consumption
-        consommation_moyenne = filtered_df["cout_total_5_usages"].mean()
+        consommation_moyenne = means["cout_total_5_usages|avg"]
         col2.metric(
             label="Average consumption (kWep/year)",
             value=f"{round(consommation_moyenne, 2)}",
             border=True,
         )
         # Mean cost
-        cout_moyen = filtered_df["cout_total_5_usages"].mean()
+        cout_moyen = means["cout_total_5_usages|avg"]
         col3.metric(
             label="Average cost (€/year)",
             value=f"{round(cout_moyen, 2)} €",
             border=True,
         )
         # Most frequent DPE class
-        most_common_dpe = filtered_df["etiquette_dpe"].mode()[0]
+        most_common_dpe = dpe_counts.idxmax()
         icon = f"Small-DPE-{most_common_dpe.upper()}.png"
         # Detect active theme
         theme = st.get_option("theme.base")
-        text_color = "rgba(250, 250, 250, 0.6)" if theme == "dark" else "rgba(30, 30, 30, 0.6)"
+        text_color = (
+            "rgba(250, 250, 250, 0.6)" if theme == "dark" else "rgba(30, 30, 30, 0.6)"
+        )
         with col4.container(border=True):
             st.markdown(
                 """
@@ -122,11 +157,10 @@ if data is not None:
                 </style>
                 <div class="metric-label">Most frequent DPE label</div>
                 """,
-                unsafe_allow_html=True
+                unsafe_allow_html=True,
             )
             st.image(os.path.join(ASSETS, icon), width=190)
 
-
         # ------------------------------------------------------------------------------------------
         # General Info
         col1, col2, col3 = st.columns([0.4, 0.3, 0.3])
@@ -135,9 +169,17 @@ if data is not None:
         with col1:
             st.write("")
             st.write("")
-            conso_stats = filtered_df["conso_5_usages_ef"].describe()
-            cout_stats = filtered_df["cout_total_5_usages"].describe()
-            ges_stat = filtered_df["emission_ges_5_usages"].describe()
+            stats = cube.describe(
+                [
+                    "conso_5_usages_ef",
+                    "cout_total_5_usages",
+                    "emission_ges_5_usages",
+                ],
+                filters,
+            )
+            conso_stats = stats["conso_5_usages_ef"]
+            cout_stats = stats["cout_total_5_usages"]
+            ges_stat = stats["emission_ges_5_usages"]
             with st.container():
                 summary_df = pd.DataFrame(
                     {
@@ -154,11 +196,6 @@ if data is not None:
                 )
         # DPE class Distribution
         with col2:
-            dpe_counts = (
-                filtered_df["etiquette_dpe"]
-                .value_counts()
-                .reindex(["A", "B", "C", "D", "E", "F", "G"], fill_value=0)
-            )
             labels = dpe_counts.index.tolist()
             counts = dpe_counts.values
             percentages = counts / counts.sum() * 100
@@ -211,11 +248,6 @@ if data is not None:
             }
 
             # Count and order
-            ges_counts = (
-                filtered_df["etiquette_ges"]
-                .value_counts()
-                .reindex(["A", "B", "C", "D", "E", "F", "G"], fill_value=0)
-            )
             labels = ges_counts.index.tolist()
             counts = ges_counts.values
             percentages = counts / counts.sum() * 100
@@ -247,27 +279,47 @@ if data is not None:
 
         # Energy consumption and cost by DPE class
         col1, col2 = st.columns(2)
+        by_class = cube.quantiles(
+            "conso_5_usages_ef", [0.25, 0.5, 0.75], filters, "etiquette_dpe"
+        ).set_axis(["etiquette_dpe", "q1", "median", "q3"], axis=1)
+        class_stats = cube.stats(
+            ["conso_5_usages_ef", "cout_total_5_usages"], filters, "etiquette_dpe"
+        )
+        by_class["min"] = class_stats["conso_5_usages_ef|min"]
+        by_class["max"] = class_stats["conso_5_usages_ef|max"]
+        by_class["cout_total_5_usages"] = class_stats["cout_total_5_usages|avg"]
+        by_class = by_class[by_class["etiquette_dpe"].isin(DPE_CLASSES)]
 
         # Energy consumption by DPE class
         with col1:
-            fig_box = px.box(
-                filtered_df,
-                x="etiquette_dpe",
-                y="conso_5_usages_ef",
-                category_orders={"etiquette_dpe": ["A", "B", "C", "D", "E", "F", "G"]},
-                points=False,
+            # Box plot from the quartiles estimated by the cube (whiskers at 1.5 IQR).
+            iqr = by_class["q3"] - by_class["q1"]
+            fig_box = go.Figure(
+                go.Box(
+                    x=by_class["etiquette_dpe"],
+                    q1=by_class["q1"],
+                    median=by_class["median"],
+                    q3=by_class["q3"],
+                    lowerfence=by_class["min"].combine(by_class["q1"] - 1.5 * iqr, max),
+                    upperfence=by_class["max"].combine(by_class["q3"] + 1.5 * iqr, min),
+                    boxpoints=False,
+                )
+            )
+            fig_box.update_layout(
                 title="Energy consumption by DPE class",
+                xaxis_title="etiquette_dpe",
+                yaxis_title="conso_5_usages_ef",
             )
+            fig_box.update_xaxes(categoryorder="array", categoryarray=DPE_CLASSES)
             st.plotly_chart(fig_box, config=config)
 
         # Average cost by DPE class
         with col2:
-            fig = px.histogram(
-                filtered_df,
+            fig = px.bar(
+                by_class,
                 x="etiquette_dpe",
                 y="cout_total_5_usages",
-                category_orders={"etiquette_dpe": ["A", "B", "C", "D", "E", "F", "G"]},
-                histfunc="avg",
+                category_orders={"etiquette_dpe": DPE_CLASSES},
                 title="Average cost by DPE class",
                 labels={
                     "etiquette_dpe": "DPE class",
@@ -320,29 +372,31 @@ if data is not None:
         cout_col = usage_map[selected_usage]["cout"]
         ges_col = usage_map[selected_usage]["ges"]
 
+        usage_stats = cube.stats(
+            [
+                conso_col,
+                ges_col,
+                cout_col,
+                "conso_5_usages_ef",
+                "emission_ges_5_usages",
+            ],
+            filters,
+        ).iloc[0]
+
         col1, col2, col3 = st.columns([0.5, 0.25, 0.25])
         # statistics table
         with col1:
             summary_df = pd.DataFrame(
                 {
-                    "Energy consumption (kWep/year)": [
-                        filtered_df[conso_col].mean(),
-                        filtered_df[conso_col].std(),
-                        filtered_df[conso_col].min(),
-                        filtered_df[conso_col].max(),
-                    ],
-                    "GES emissions (kgCO₂/year)": [
-                        filtered_df[ges_col].mean(),
-                        filtered_df[ges_col].std(),
-                        filtered_df[ges_col].min(),
-                        filtered_df[ges_col].max(),
-                    ],
-                    "Cost (€)": [
-                        filtered_df[cout_col].mean(),
-                        filtered_df[cout_col].std(),
-                        filtered_df[cout_col].min(),
-                        filtered_df[cout_col].max(),
-                    ],
+                    label: [
+                        usage_stats[f"{col}|{func}"]
+                        for func in ["avg", "std", "min", "max"]
+                    ]
+                    for label, col in [
+                        ("Energy consumption (kWep/year)", conso_col),
+                        ("GES emissions (kgCO₂/year)", ges_col),
+                        ("Cost (€)", cout_col),
+                    ]
                 },
                 index=["Average", "Std dev", "Min", "Max"],
             ).round(2)
@@ -352,8 +406,8 @@ if data is not None:
 
         # Gauge consumption
         with col2:
-            total_conso_sum = filtered_df["conso_5_usages_ef"].sum()
-            usage_sum = filtered_df[conso_col].sum()
+            total_conso_sum = usage_stats["conso_5_usages_ef|sum"]
+            usage_sum = usage_stats[f"{conso_col}|sum"]
             prop = usage_sum / total_conso_sum * 100
 
             # Simple gauge
@@ -384,9 +438,9 @@ if data is not None:
 
         # Gauge GES emissions
         with col3:
-            total_ges_sum = filtered_df["emission_ges_5_usages"].sum()
+            total_ges_sum = usage_stats["emission_ges_5_usages|sum"]
 
-            usage_ges_sum = filtered_df[ges_col].sum()
+            usage_ges_sum = usage_stats[f"{ges_col}|sum"]
 
             prop_ges = usage_ges_sum / total_ges_sum * 100
 
@@ -421,16 +475,26 @@ if data is not None:
         st.subheader("Impact of variables on energy consumption")
         col1, col2 = st.columns([0.3, 0.7])
         with col1:
-            numeric_cols = filtered_df.select_dtypes(include="number").columns.tolist()
+            numeric_cols = (
+                query_dataset(dataset, limit=0)
+                .select_dtypes(include="number")
+                .columns.tolist()
+            )
             option = st.selectbox(
                 "Choose Y variable",
                 numeric_cols,
             )
             st.write("Y = ", option)
         with col2:
-            corr_value = filtered_df["conso_5_usages_ef"].corr(filtered_df[option])
+            corr_value = correlation(dataset, "conso_5_usages_ef", option, filters)
+            sample_df = query_dataset(
+                dataset,
+                list(dict.fromkeys(["conso_5_usages_ef", option])),
+                filters,
+                sample=1000 if n > 1000 else None,
+            )
             fig = px.scatter(
-                filtered_df.sample(n=1000 if n > 1000 else n, random_state=42),
+                sample_df,
                 x="conso_5_usages_ef",  # X is fixed as total consumption
                 y=option,
                 labels={
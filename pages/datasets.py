@@ -5,6 +5,17 @@ import streamlit as st
 
 from src.data_requesters import Ademe_API_requester, api_ademe
 from src.processing.data_cleaner import DataCleaner
+from src.storage import (
+    append_dataset,
+    conform,
+    dataset_info,
+    delete_dataset,
+    read_catalog,
+    read_csv,
+    write_dataset,
+)
+from src.storage.cache import dataset_cache
+from src.storage.exports import EXPORT_FORMATS, build_export, export_path
 from src.utils.dataloader import generate_file_selector
 
 ASSETS_PATH = Path(__file__).parent.parent / "assets"
@@ -14,20 +25,9 @@ st.sidebar.image(ASSETS_PATH / "light_bulb.gif")
 # General configuration
 st.set_page_config(page_title="Datasets", page_icon="📂", layout="wide")
 
-# === Path to CSV Files ===
-DATASETS_DIR = Path(__file__).parent.parent / "data" / "datasets"
-
-# === Side bar files selection ===
-csv_files = sorted([f.name for f in DATASETS_DIR.glob("*.csv")])
-
-
-@st.cache_data
-def load_csv(files):
-    dfs = []
-    for f in files:
-        df = pd.read_csv(f)
-        dfs.append(df)
-    return pd.concat(dfs, ignore_index=True)
+# === Stored datasets (metadata from the catalog, no dataset is opened) ===
+catalog = read_catalog()
+datasets = list(catalog)
 
 
 st.title("📂 Manage your Datasets")
@@ -42,10 +42,50 @@ st.title("📂 Manage your Datasets")
 # === Dataset manager ===
 # === File uploader ===
 with tab1:
-    if not csv_files:
+    # Import a CSV file as a new dataset
+    with st.expander("📥 Import a dataset from a CSV file"):
+        uploaded_csv = st.file_uploader("CSV file", type="csv")
+        if uploaded_csv is not None and st.button("➕ Import CSV"):
+            name = Path(uploaded_csv.name).stem
+            write_dataset(read_csv(uploaded_csv), name)
+            dataset_cache.invalidate(name)
+            st.session_state.last_file = name
+            st.rerun()
+
+    if not datasets:
         st.warning("⚠️ Aucun dataset disponible.")
 
     else:
+        # Overview of the stored datasets, filterable by department.
+        all_departments = sorted(
+            {d for e in catalog.values() for d in e["departments"]}
+        )
+        selected_departments = st.multiselect(
+            "Filter the datasets by department", all_departments
+        )
+
+        overview = pd.DataFrame(
+            [
+                {
+                    "Dataset": e["name"],
+                    "Rows": e["rows"],
+                    "Departments": ", ".join(e["departments"]),
+                    "First DPE": e["date_min"],
+                    "Last DPE": e["date_max"],
+                    "Mean total cost (€)": e["stats"]
+                    .get("cout_total_5_usages", {})
+                    .get("mean"),
+                    "Size (MB)": round(e["size_bytes"] / 1e6, 2),
+                    "Version": e["version"],
+                    "Updated": e["updated_at"],
+                }
+                for e in catalog.values()
+                if not selected_departments
+                or set(e["departments"]) & set(selected_departments)
+            ]
+        )
+        st.dataframe(overview, hide_index=True, width="stretch")
+
         generate_file_selector(sidebar=False)
 
         # Load the data in memory.
@@ -62,33 +102,46 @@ with tab1:
             col1, col2, col3 = st.columns(3)
 
             with col1:
-                # Download button to download the current dataset
-                st.download_button(
-                    "💾 Download current dataset (CSV)",
-                    data=data.to_csv(index=False).encode("utf-8"),
-                    file_name=f"{st.session_state.last_file}",
-                    mime="text/csv",
+                # Download the current dataset: the file is built once per dataset version
+                # and format, only when requested. It is sent to the browser only after
+                # "Prepare" in this session, and once per request.
+                export_format = st.selectbox(
+                    "Download format", list(EXPORT_FORMATS), key="export_format"
                 )
+                extension, mime = EXPORT_FORMATS[export_format]
+                export_file = export_path(st.session_state.last_file, export_format)
+
+                if st.session_state.get("export_prepared") != str(export_file):
+                    if st.button("📦 Prepare the download"):
+                        with st.spinner("Preparing the file..."):
+                            export_file = build_export(
+                                st.session_state.last_file, export_format
+                            )
+                        st.session_state.export_prepared = str(export_file)
+
+                if st.session_state.get("export_prepared") == str(export_file):
+                    with open(export_file, "rb") as f:
+                        st.download_button(
+                            "💾 Download current dataset",
+                            data=f,
+                            file_name=f"{st.session_state.last_file}.{extension}",
+                            mime=mime,
+                            on_click=lambda: st.session_state.pop(
+                                "export_prepared", None
+                            ),
+                        )
 
             with col2:
                 # Button to refresh the current data set.
 
                 if st.button("🔄 Refresh the current dataset with new data"):
-                    file_path = DATASETS_DIR / st.session_state.last_file
-
                     # List to get the new data from the both API endpoints
                     new_data = list()
 
-                    # Get the latest DPE date by converting to datetime
-                    latest_dpe_date = pd.to_datetime(
-                        data["date_reception_dpe"], errors="coerce"
-                    ).max()
-
-                    # Get the string representation of the date.
-                    latest_dpe_date = latest_dpe_date.strftime("%Y-%m-%d")
-
-                    # Get the partment code from the dataset
-                    departement = str(data["code_departement_ban"].iloc[0]).zfill(2)
+                    # Latest DPE date and department code, from the catalog.
+                    info = dataset_info(st.session_state.last_file)
+                    latest_dpe_date = info["date_max"]
+                    departement = str(info["departments"][0]).zfill(2)
 
                     with st.spinner("Fetching new data from both ADEME API..."):
                         loading_text = st.empty()
@@ -132,24 +185,19 @@ with tab1:
                         if new_data:
                             new_df = pd.DataFrame(new_data)
                             cleaner = DataCleaner(new_df)
-                            new_df = cleaner.clean_all()
-
-                            # Concatenate the new data to the existing one
-                            combined_df = pd.concat(
-                                [data, new_df], ignore_index=True
-                            ).drop_duplicates()
+                            new_df = conform(cleaner.clean_all())
 
                             # free the memory
                             del cleaner
-                            del new_df
                             st.session_state.df = None
 
-                            # Save the updated data to the CSV file
-                            combined_df.to_csv(file_path, index=False)
+                            # Append the new data to the dataset store, only the partitions
+                            # (department / reception year) receiving new rows are rewritten.
+                            append_dataset(new_df, st.session_state.last_file)
+                            del new_df
 
-                            # Update the session state
-                            st.session_state.df = combined_df
-                            data = st.session_state.df
+                            # Drop the cached frames of the previous version
+                            dataset_cache.invalidate(st.session_state.last_file)
 
                             # Keep track of the update
                             st.session_state.has_updated = True
@@ -164,8 +212,8 @@ with tab1:
             with col3:
                 # Button to delete the current dataset
                 if st.button("🗑️ Delete this dataset"):
-                    file_path = DATASETS_DIR / st.session_state.last_file
-                    file_path.unlink()  # supprime le fichier
+                    delete_dataset(st.session_state.last_file)  # supprime le fichier
+                    dataset_cache.invalidate(st.session_state.last_file)
                     st.success(
                         f"✅ `{st.session_state.last_file}` supprimé avec succès."
                     )
@@ -216,8 +264,9 @@ with tab2:
         data_api = load_api(neuf, limit, departement, size)
         if not data_api.empty:
             cleaner_api = DataCleaner(data_api)
-            data_api = cleaner_api.clean_all()
+            data_api = conform(cleaner_api.clean_all())
             st.session_state.data_api = data_api
+            st.session_state.data_api_csv = None
         else:
             st.warning("⚠️ No data returned from ADEME API.")
             st.session_state.data_api = None
@@ -239,50 +288,54 @@ with tab2:
         col1, col2 = st.columns(2)
 
         with col1:
-            st.download_button(
-                "💾 Download result API (CSV)",
-                data=data_api.to_csv(index=False).encode("utf-8"),
-                file_name=f"dpe_ademe_{dep}_{'new' if neuf else 'existing'}.csv",
-                mime="text/csv",
-            )
+            # The CSV is only serialised when requested, once per fetch.
+            if st.session_state.get("data_api_csv") is None:
+                if st.button("📦 Prepare the CSV download"):
+                    st.session_state.data_api_csv = data_api.to_csv(index=False).encode(
+                        "utf-8"
+                    )
+
+            if st.session_state.get("data_api_csv") is not None:
+                st.download_button(
+                    "💾 Download result API (CSV)",
+                    data=st.session_state.data_api_csv,
+                    file_name=f"dpe_ademe_{dep}_{'new' if neuf else 'existing'}.csv",
+                    mime="text/csv",
+                )
         with col2:
-            file_path = DATASETS_DIR / f"data_{dep}.csv"
+            dataset_name = f"data_{dep}"
+            dataset_exists = dataset_name in datasets
 
             action = st.session_state.get("action", "Replace")
 
             if st.button("➕ Add to your datasets"):
-                if file_path.exists():
+                if dataset_exists:
                     if action == "Replace":
-                        data_api.to_csv(file_path, index=False)
+                        write_dataset(data_api, dataset_name)
+                        dataset_cache.invalidate(dataset_name)
                         st.session_state.has_newfile = True
                         st.rerun()
 
                     elif action == "Concat & Overwrite":
-                        existing_df = pd.read_csv(file_path, low_memory=False)
-
-                        combined_df = pd.concat(
-                            [existing_df, data_api], ignore_index=True
-                        ).drop_duplicates()
-
-                        combined_df.to_csv(file_path, index=False)
+                        # Only the partitions receiving new rows are rewritten.
+                        append_dataset(data_api, dataset_name)
+                        dataset_cache.invalidate(dataset_name)
 
                         st.session_state.has_newfile = True
                         st.rerun()
 
                 else:
-                    data_api.to_csv(
-                        file_path,
-                        index=False,
-                    )
+                    write_dataset(data_api, dataset_name)
+                    dataset_cache.invalidate(dataset_name)
                     st.session_state.has_newfile = True
                     st.rerun()
 
             # Update the state to refresh the selection menu.
             if st.session_state.get("has_newfile", False):
-                st.success(f"✅ File `{file_path.name}` added to your dataset.")
+                st.success(f"✅ Dataset `{dataset_name}` added to your datasets.")
                 st.session_state.has_newfile = False
 
-            if file_path.exists():
+            if dataset_exists:
                 st.warning(f"⚠️ Data for department `{dep}` already exists.")
                 # Display a radio button to choose action
                 action = st.radio(
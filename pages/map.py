@@ -1,15 +1,18 @@
-from pathlib import Path
-
+import numpy as np
 import pydeck as pdk
 import streamlit as st
 
+from src.storage.query_engine import aggregate
+from src.storage.spatial_grid import grid_bins, viewport_bbox
+from src.storage.spatial_index import load_spatial_index
 from src.utils.dataloader import generate_file_selector
+from src.utils.map_payload import FILL_COLOR, map_payload
 
 # General configuration
 st.set_page_config(page_title="DPE Map & Statistics", page_icon="🗺️", layout="wide")
 
-# === Path to CSV Files ===
-DATASETS_DIR = Path(__file__).parent.parent / "data" / "datasets"
+# === Columns needed by the map, only those are queried ===
+MAP_COLUMNS = ["lat", "lon", "etiquette_dpe", "cout_total_5_usages"]
 
 
 st.title("🗺️ Map the DPE Dataset")
@@ -18,8 +21,9 @@ st.title("🗺️ Map the DPE Dataset")
 with st.sidebar:
     st.header("📂 Dataset Selection")
 
-generate_file_selector()
-data = st.session_state.get("df", None)
+# The dataset is queried with the filters, it is never fully loaded in memory.
+generate_file_selector(load_data=False)
+dataset = st.session_state.get("last_file", None)
 
 
 st.subheader("Geographical visualization of housing")
@@ -29,9 +33,18 @@ DEFAULT_POINTS_MAP = 50_000
 DEFAULT_ROWS_DISPLAY = 10_000
 NB_BINS = 50
 
+# === Level of detail ===
+# Below RAW_ZOOM the homes are aggregated in the bins of the spatial grid,
+# from RAW_ZOOM the homes of the visible area are displayed one by one.
+RAW_ZOOM = 13
+DEFAULT_ZOOM = 9
+# Grid level used for a zoom level: bins about 2^3 = 8 times smaller than a map tile.
+BIN_LEVEL_OFFSET = 3
+WHOLE_DATASET = "Whole dataset"
+
 # === Sidebar Filters ===
 
-if data is not None:
+if dataset is not None:
     col_map, col_filters = st.columns([0.75, 0.25])
 
     with col_filters:
@@ -44,84 +57,161 @@ if data is not None:
             if st.checkbox(f"Class {c}", value=True, key=f"dpe_{c}"):
                 selected_dpe.append(c)
 
-        # Filtering
-        data_filtered = data[data["etiquette_dpe"].isin(selected_dpe)]
-
-        # Slider to choose the number of points on the map
-        max_points_possible = len(data_filtered)
-        if max_points_possible == 0:
+        if not selected_dpe:
             st.warning("⚠️ No data matches the selected filters.")
             st.stop()
 
-        nb_points_map = st.slider(
-            "Number of homes displayed on the map 🗺️",
-            min_value=0,
-            max_value=max_points_possible,
-            value=min(DEFAULT_POINTS_MAP, max_points_possible),
-            step=10,
-            help="Adjust to limit the number of points and improve smoothness.",
+        st.markdown("### 🧭 View")
+
+        # Center of the map: a city or the whole dataset
+        centers = aggregate(
+            dataset,
+            {"lat": ("avg", "lat"), "lon": ("avg", "lon")},
+            ["nom_commune_ban"],
+        ).dropna(subset=["lat", "lon", "nom_commune_ban"])
+        center_name = st.selectbox(
+            "Center the map on",
+            [WHOLE_DATASET] + centers["nom_commune_ban"].tolist(),
+        )
+        if center_name == WHOLE_DATASET:
+            center = aggregate(
+                dataset, {"lat": ("avg", "lat"), "lon": ("avg", "lon")}
+            ).iloc[0]
+        else:
+            center = centers.set_index("nom_commune_ban").loc[center_name]
+
+        zoom = st.slider(
+            "Zoom level",
+            min_value=5,
+            max_value=16,
+            value=DEFAULT_ZOOM,
+            help=f"Homes are aggregated below zoom {RAW_ZOOM}, and displayed one by one in the visible area from zoom {RAW_ZOOM}.",
+        )
+
+        # Visible area of the map
+        lat_min, lon_min, lat_max, lon_max = viewport_bbox(
+            center["lat"], center["lon"], zoom
         )
 
-        if nb_points_map == 0:
-            st.error("🏠 No homes displayed on the map.")
-            st.stop()
-        # Random sampling
-        if len(data_filtered) > nb_points_map:
-            data_map = data_filtered.sample(nb_points_map, random_state=42)
-            st.warning(
-                f"🏠 {nb_points_map:,} homes displayed out of {max_points_possible:,}."
+        if zoom < RAW_ZOOM:
+            # Aggregated view: every home is counted in a bin, no row is loaded.
+            data_map = grid_bins(
+                dataset,
+                zoom + BIN_LEVEL_OFFSET,
+                bbox=(lat_min, lon_min, lat_max, lon_max),
+                dpe_classes=selected_dpe,
+            )
+            if data_map.empty:
+                st.warning("⚠️ No data in the visible area.")
+                st.stop()
+
+            st.success(
+                f"🧩 {data_map['n'].sum():,} homes aggregated in {len(data_map):,} areas."
             )
+
         else:
-            data_map = data_filtered
-            st.success(f"🏠 All {len(data_filtered):,} homes are displayed.")
+            # Detailed view: only the homes of the visible area (or around the center)
+            # are read, found with the spatial index of the dataset.
+            index = load_spatial_index(dataset)
+            radius_km = st.number_input(
+                "Only homes around the center (km)",
+                min_value=0.0,
+                value=0.0,
+                step=0.5,
+                help="0 keeps every home of the visible area.",
+            )
+            if radius_km > 0:
+                row_ids, _ = index.within(
+                    center["lat"], center["lon"], radius_km * 1000
+                )
+            else:
+                row_ids = index.bbox(lat_min, lon_min, lat_max, lon_max)
+            homes = index.rows(row_ids, MAP_COLUMNS)
+            homes = homes[homes["etiquette_dpe"].isin(selected_dpe)]
+
+            # Slider to choose the number of points on the map
+            max_points_possible = len(homes)
+            if max_points_possible == 0:
+                st.warning("⚠️ No data in the visible area.")
+                st.stop()
+
+            nb_points_map = st.slider(
+                "Number of homes displayed on the map 🗺️",
+                min_value=0,
+                max_value=max_points_possible,
+                value=min(DEFAULT_POINTS_MAP, max_points_possible),
+                step=10,
+                help="Adjust to limit the number of points and improve smoothness.",
+            )
+
+            if nb_points_map == 0:
+                st.error("🏠 No homes displayed on the map.")
+                st.stop()
+            # Random sampling
+            if max_points_possible > nb_points_map:
+                data_map = homes.sample(n=nb_points_map, random_state=42)
+                st.warning(
+                    f"🏠 {nb_points_map:,} homes displayed out of {max_points_possible:,}."
+                )
+            else:
+                data_map = homes
+                st.success(f"🏠 All {max_points_possible:,} homes are displayed.")
 
     with col_map:
         with st.spinner("⏳ Generating the map..."):
             load_bar = st.progress(0.0)
 
-            # Define DPE colors
-            dpe_colors = {
-                "A": [38, 160, 110],  # Dark green
-                "B": [84, 176, 87],  # Green
-                "C": [165, 202, 118],  # Light green
-                "D": [238, 229, 54],  # Yellow
-                "E": [237, 180, 37],  # Orange
-                "F": [231, 131, 63],  # Orange red
-                "G": [212, 38, 41],  # Red
-            }
-
-            # Add color column to data_map
-            data_map["color"] = data_map["etiquette_dpe"].map(
-                lambda x: dpe_colors.get(x, [128, 128, 128])
-            )
-
             # Pydeck map
             view_state = pdk.ViewState(
-                latitude=data_map["lat"].mean(),
-                longitude=data_map["lon"].mean(),
-                zoom=6,
+                latitude=center["lat"],
+                longitude=center["lon"],
+                zoom=zoom,
                 pitch=0,
             )
 
             load_bar.progress(0.3)
 
-            layer = pdk.Layer(
-                "ScatterplotLayer",
-                data=data_map,
-                get_position="[lon, lat]",
-                get_color="color",
-                get_radius=10,
-                pickable=True,
-            )
-
-            load_bar.progress(0.5)
-
-            tooltip = {
-                "html": "<b>DPE Label:</b> {etiquette_dpe}<br/>"
-                "<b>Total Cost (5 Uses):</b> {cout_total_5_usages}<br/>"
-                "<b>Lat:</b> {lat}<br/><b>Lon:</b> {lon} <br/>",
-                "style": {"backgroundColor": "white", "color": "black"},
-            }
+            if zoom < RAW_ZOOM:
+                payload = map_payload(data_map, ["n", "etiquette_dpe", "cout_moyen"])
+                # Area of each circle proportional to the number of homes of its bin.
+                payload["radius"] = (
+                    data_map["size_m"]
+                    / 2
+                    * np.sqrt(data_map["n"] / data_map["n"].max())
+                ).round(0)
+                layer = pdk.Layer(
+                    "ScatterplotLayer",
+                    data=payload,
+                    get_position="[lon, lat]",
+                    get_fill_color=FILL_COLOR,
+                    get_radius="radius",
+                    opacity=0.7,
+                    pickable=True,
+                )
+                tooltip = {
+                    "html": "<b>Homes:</b> {n}<br/>"
+                    "<b>Most frequent DPE Label:</b> {etiquette_dpe}<br/>"
+                    "<b>Average Total Cost (5 Uses):</b> {cout_moyen}<br/>",
+                    "style": {"backgroundColor": "white", "color": "black"},
+                }
+            else:
+                payload = map_payload(
+                    data_map, ["etiquette_dpe", "cout_total_5_usages"]
+                )
+                layer = pdk.Layer(
+                    "ScatterplotLayer",
+                    data=payload,
+                    get_position="[lon, lat]",
+                    get_fill_color=FILL_COLOR,
+                    get_radius=10,
+                    pickable=True,
+                )
+                tooltip = {
+                    "html": "<b>DPE Label:</b> {etiquette_dpe}<br/>"
+                    "<b>Total Cost (5 Uses):</b> {cout_total_5_usages}<br/>"
+                    "<b>Lat:</b> {lat}<br/><b>Lon:</b> {lon} <br/>",
+                    "style": {"backgroundColor": "white", "color": "black"},
+                }
 
             load_bar.progress(0.6)
 
@@ -1,56 +1,35 @@
 import os
 
-import joblib
 import pandas as pd
 import streamlit as st
 
 from src.data_requesters import geo_api
 from src.data_requesters.elevation import Elevation_API_requester
+from src.ml import load_models
+from src.ml.onnx_backend import OnnxPipeline
+from src.ml.registry import model_versions
 
 # Page configuration
 st.set_page_config(page_title="DPE Prediction", page_icon="🔮", layout="centered")
 st.title("🔮 Prediction of a Home's DPE Class")
 
-ML_DIR = "MLmodels"
 ASSETS = "assets"
 
-# Dynamic model selector in sidebar
-
-
-def get_available_model_versions():
-    """Detect which model versions exist."""
-    options = ["Original models"]
-    retrain_reg = os.path.join(ML_DIR, "pipeline_best_regression_retrained.pkl")
-    retrain_clf = os.path.join(ML_DIR, "pipeline_xgboost_classification_retrained.pkl")
-    if os.path.exists(retrain_reg) and os.path.exists(retrain_clf):
-        options.append("New models (retrained)")
-    return options
-
-
-def load_models(selection):
-    """Load regression/classification pipelines and label encoder."""
-    if selection == "New models (retrained)":
-        reg_path = os.path.join(ML_DIR, "pipeline_best_regression_retrained.pkl")
-        clf_path = os.path.join(ML_DIR, "pipeline_xgboost_classification_retrained.pkl")
-    else:
-        reg_path = os.path.join(ML_DIR, "pipeline_best_regression.pkl")
-        clf_path = os.path.join(ML_DIR, "pipeline_xgboost_classification.pkl")
-
-    reg_model = joblib.load(reg_path)
-    clf_model = joblib.load(clf_path)
-    label_enc = joblib.load(os.path.join(ML_DIR, "label_encoder_target.pkl"))
-    return reg_model, clf_model, label_enc
-
-
 # Sidebar model selection
 st.sidebar.header("⚙️ Settings")
-available_models = get_available_model_versions()
+available_models = model_versions()
 model_choice = st.sidebar.selectbox(
     "🧠 Model selection",
-    options=available_models,
+    options=list(available_models),
     help="Choose which version of the models to use for prediction.",
 )
 st.sidebar.info(f"Using: **{model_choice}**")
+st.sidebar.caption(
+    " · ".join(
+        f"{family.capitalize()} {version}"
+        for family, version in available_models[model_choice].items()
+    )
+)
 
 # Load models safely
 try:
@@ -58,6 +37,8 @@ try:
         model_choice
     )
     st.sidebar.success("✅ ML models successfully loaded")
+    if isinstance(pipeline_classification, OnnxPipeline):
+        st.sidebar.caption("⚡ Predictions run with ONNX Runtime")
 except FileNotFoundError as e:
     st.error(f"❌ Missing model file: {e}")
     st.stop()
@@ -183,7 +164,7 @@ if submitted:
                     f"⚠️ The regression model doesn't recognize category **'{bad_cat}'** "
                     f"for variable **'{col_name}'**.\n\n"
                     f"This usually means your input contains a new value not seen during training.\n\n"
-                    f"👉 Try switching to the **retrained model** in the sidebar or choose a different input."
+                    f"👉 Try switching to another **model version** in the sidebar or choose a different input."
                 )
                 st.stop()
             else:
@@ -211,7 +192,7 @@ if submitted:
                 f"for variable **'{col_name}'**.\n\n"
                 f"This typically means your input contains a value never seen during training "
                 f"(e.g., a new climate zone or energy type).\n\n"
-                f"👉 Try using the **retrained model** in the sidebar."
+                f"👉 Try using another **model version** in the sidebar."
             )
             st.stop()
         else:
@@ -1,38 +1,46 @@
-import os
-import pickle
 import time
 
-import joblib
-import numpy as np
+import pandas as pd
 import streamlit as st
-from sklearn.metrics import accuracy_score, mean_squared_error, r2_score
-from sklearn.preprocessing import LabelEncoder
 
+from src.ml.jobs import (
+    FAILED,
+    JOB_FUNCTIONS,
+    MODES,
+    SUCCEEDED,
+    Job,
+    JobConflictError,
+    list_jobs,
+    submit,
+)
+from src.ml.registry import current_version, list_versions, promote, read_manifest
+from src.ml.sampling import CONFIDENCE, EVAL_ROWS, SAMPLE_ROWS
+from src.ml.training import INCREMENTAL_ROUNDS, read_training_info
+from src.ml.tuning import N_CANDIDATES, TUNING_TIME_BUDGET
+from src.storage import dataset_info, read_catalog
+from src.storage.query_engine import query_dataset
 from src.utils.dataloader import generate_file_selector
 
-MODELS_DIR = "./MLmodels/"
+# Refresh period of the job status (seconds).
+POLL_INTERVAL = 2
+
+# Wall times reported by the training jobs.
+STEP_NAMES = {
+    "load_s": "loading",
+    "evaluate_original_s": "current model evaluation",
+    "folds_s": "folds preprocessing",
+    "search_s": "search",
+    "matrix_s": "streaming",
+    "fit_s": "training",
+    "refit_s": "training on all rows",
+    "evaluate_s": "evaluation",
+}
 
 # General configuration
 st.set_page_config(page_title="Model retaining", page_icon="⚙️")
 
 
 # helpers
-def load_model(path):
-    return joblib.load(path)
-
-
-def save_model(obj, path):
-    joblib.dump(obj, path)
-
-
-def rmse_score(y_true, y_pred):
-    """Compute RMSE safely (compatible with older sklearn versions)."""
-    try:
-        return mean_squared_error(y_true, y_pred, squared=False)
-    except TypeError:
-        return np.sqrt(mean_squared_error(y_true, y_pred))
-
-
 def diff_icon(new, old, higher_is_better=True):
     """Display an icon depending on metric improvement."""
     if old is None:
@@ -45,166 +53,295 @@ def diff_icon(new, old, higher_is_better=True):
         return "⚠️🔽"
 
 
-# Interface
-st.title("🔄 Retrain regression and classification models")
-st.caption("Training may take several minutes depending on dataset size ⏳")
-st.write(
-    "Select a dataset in the **sidebar**, then click the button to retrain both models on the new data."
-)
-
-# Sidebar dataset selector
-with st.sidebar:
-    st.header("📂 Dataset selection")
-    generate_file_selector(sidebar=True)
-
-df = st.session_state.get("df", None)
-if df is None:
-    st.info("⬅️ Please select a dataset in the sidebar.")
-    st.stop()
-
-st.success(f"✅ Dataset loaded: {st.session_state.get('last_file', '')}")
-st.write(f"**Rows:** {len(df)}")
-st.dataframe(df.head())
-
-# Retraining
-if st.button("🚀 Retrain models"):
-    with st.spinner("Processing..."):
-        # Load features and targets info
-        with open(
-            os.path.join(MODELS_DIR, "features_target_columns_regression.pkl"), "rb"
-        ) as f:
-            reg_info = pickle.load(f)
-        with open(
-            os.path.join(MODELS_DIR, "features_target_columns_classification.pkl"), "rb"
-        ) as f:
-            clf_info = pickle.load(f)
-
-        reg_features = (
-            reg_info["quantitative_features"] + reg_info["qualitative_features"]
+def with_interval(value: str, interval: list[float] | None) -> str:
+    """Metric value followed by its confidence interval, when computed."""
+    if not interval:
+        return value
+    return f"{value} [{interval[0]:.4g}, {interval[1]:.4g}]"
+
+
+def display_metrics(family: str, result: dict) -> None:
+    """Display the metrics of the current and retrained models of a finished job."""
+    original, retrained = result["metrics_original"], result["metrics_retrained"]
+    intervals_original = result.get("intervals_original") or {}
+    intervals_retrained = result.get("intervals_retrained") or {}
+    incremental = result.get("mode") == "incremental"
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(
+            "**Before the update**"
+            if incremental
+            else f"**Current model {result.get('base', '')}**"
         )
-        reg_target = reg_info["target"]
-        clf_features = (
-            clf_info["quantitative_features"] + clf_info["qualitative_features"]
+        st.write(
+            {
+                k: with_interval(
+                    f"{v:.4f}" if v is not None else "-", intervals_original.get(k)
+                )
+                for k, v in original.items()
+            }
         )
-        clf_target = clf_info["target"]
-
-        # Regression
-        with st.spinner("Training regression model..."):
-            start = time.time()
-
-            reg_pipeline_orig = load_model(
-                os.path.join(MODELS_DIR, "pipeline_best_regression.pkl")
+    with col2:
+        st.markdown(
+            "**After the update**"
+            if incremental
+            else f"**Retrained model {result.get('version', '')}**"
+        )
+        if family == "regression":
+            st.write(
+                {
+                    "R2": with_interval(
+                        f"{retrained['R2']:.4f}", intervals_retrained.get("R2")
+                    )
+                    + f" {diff_icon(retrained['R2'], original['R2'], True)}",
+                    "RMSE": with_interval(
+                        f"{retrained['RMSE']:.2f}", intervals_retrained.get("RMSE")
+                    )
+                    + f" {diff_icon(retrained['RMSE'], original['RMSE'], False)}",
+                }
             )
-            X_reg, y_reg = df[reg_features], df[reg_target]
-
-            # Evaluate original model on new data
-            try:
-                y_pred_orig = reg_pipeline_orig.predict(X_reg)
-                metrics_reg_orig = {
-                    "R2": r2_score(y_reg, y_pred_orig),
-                    "RMSE": rmse_score(y_reg, y_pred_orig),
+        else:
+            st.write(
+                {
+                    "Accuracy": with_interval(
+                        f"{retrained['Accuracy']:.4f}",
+                        intervals_retrained.get("Accuracy"),
+                    )
+                    + f" {diff_icon(retrained['Accuracy'], original['Accuracy'], True)}"
                 }
-            except Exception as e:
-                st.warning(f"⚠️ Could not evaluate original regression model: {e}")
-                metrics_reg_orig = {"R2": None, "RMSE": None}
-
-            # Retrain the model directly (DataCleaner already handles unseen categories)
-            reg_pipeline_retrained = load_model(
-                os.path.join(MODELS_DIR, "pipeline_best_regression.pkl")
             )
-            reg_pipeline_retrained.fit(X_reg, y_reg)
 
-            retrain_reg_path = os.path.join(
-                MODELS_DIR, "pipeline_best_regression_retrained.pkl"
+
+# The page only reads the job states: the training runs in the worker processes.
+@st.fragment(run_every=POLL_INTERVAL)
+def display_jobs() -> None:
+    """Display the last job of each model family, refreshed while the page is open."""
+    for family in JOB_FUNCTIONS:
+        st.subheader(f"📊 {family.capitalize()}")
+        jobs = list_jobs(family, limit=1)
+        if not jobs:
+            st.caption("No training yet.")
+            continue
+
+        job = jobs[0]
+        started = time.strftime("%Y-%m-%d %H:%M", time.localtime(job["created_at"]))
+        st.caption(f"Dataset `{job['dataset']}` — submitted {started}")
+
+        if job["status"] == SUCCEEDED:
+            result = job["result"]
+            st.success(
+                f"✅ {family.capitalize()} retrained on {result['rows']:,} rows "
+                f"in {result['duration_s'] / 60:.2f} min"
+            )
+            if result.get("mode") == "incremental":
+                st.caption(
+                    f"Boosting continued from `{result['base']}` on the rows received "
+                    f"since {result['since'] or 'ever'}, measured on "
+                    f"{result['rows_holdout']:,} held-out new rows."
+                )
+            elif result.get("mode") == "external":
+                st.caption(
+                    "Trained out of memory on the datasets "
+                    + ", ".join(f"`{d}`" for d in result["datasets"])
+                )
+            elif result.get("mode") == "tune":
+                best, current = result["cv_score_best"], result["cv_score_current"]
+                st.caption(
+                    f"Best of the search ({result['n_estimators']} rounds): "
+                    f"{result['best_params']}"
+                    + (
+                        f" — cross-validation score {best:.4g}"
+                        if best is not None
+                        else ""
+                    )
+                    + (
+                        f" against {current:.4g} with the current hyperparameters "
+                        "(lower is better)"
+                        if current is not None
+                        else ""
+                    )
+                )
+            if result.get("rows_eval"):
+                st.caption(
+                    f"Measured on {result['rows_eval']:,} stratified rows held out of "
+                    f"the training ({result['rows_total']:,} rows in the dataset), "
+                    f"{CONFIDENCE:.0%} confidence intervals in brackets."
+                    + (
+                        " The registered version was then trained on all the rows."
+                        if result.get("mode") in ("full", "tune")
+                        else ""
+                    )
+                )
+            display_metrics(family, result)
+            if result.get("version"):
+                st.caption(
+                    f"📦 Registered as version **{result['version']}**, promote it "
+                    "below to serve it to the users."
+                )
+            st.caption(
+                f"⏱️ {result.get('n_jobs') or 'default'} thread(s) — "
+                + " · ".join(
+                    f"{STEP_NAMES[k]} {v:.1f} s"
+                    for k, v in result.get("timings", {}).items()
+                )
+            )
+        elif job["status"] == FAILED:
+            st.error(f"❌ Training failed: {job.get('error')}")
+        else:
+            st.progress(
+                job["progress"],
+                text=f"⏳ {job['step']} ({job.get('n_jobs', '?')} thread(s))",
             )
-            save_model(reg_pipeline_retrained, retrain_reg_path)
 
-            y_pred_new = reg_pipeline_retrained.predict(X_reg)
-            metrics_reg_new = {
-                "R2": r2_score(y_reg, y_pred_new),
-                "RMSE": rmse_score(y_reg, y_pred_new),
+        with st.expander("📜 Log"):
+            st.code(Job(job["id"]).read_log() or "(empty)", language=None)
+
+
+def display_versions(family: str) -> None:
+    """Display the registered versions of a model family, with their promotion."""
+    current = current_version(family)
+    versions = list_versions(family)
+    rows = []
+    for version in reversed(versions):
+        manifest = read_manifest(family, version)
+        training = manifest["training"]
+        rows.append(
+            {
+                "Version": version + (" ⭐" if version == current else ""),
+                "Created": manifest["created_at"].replace("T", " "),
+                "Mode": training.get("mode"),
+                "Dataset": training.get("dataset"),
+                "Rows": training.get("rows"),
+                "Trained until": training.get("trained_until"),
+                "Metrics": ", ".join(
+                    f"{k} {v:.4g}"
+                    for k, v in (manifest["metrics"] or {}).items()
+                    if v is not None
+                ),
+                "Size (MB)": round(manifest["size_bytes"] / 2**20, 1),
             }
+        )
+    st.dataframe(pd.DataFrame(rows), hide_index=True)
 
-            duration = time.time() - start
-            st.success(f"✅ Regression retrained in {duration/60:.2f} min")
-
-            st.subheader("📊 Regression comparison")
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown("**Original model**")
-                st.write(metrics_reg_orig)
-            with col2:
-                st.markdown("**Retrained model**")
-                st.write(
-                    {
-                        "R2": f"{metrics_reg_new['R2']:.4f} {diff_icon(metrics_reg_new['R2'], metrics_reg_orig['R2'], True)}",
-                        "RMSE": f"{metrics_reg_new['RMSE']:.2f} {diff_icon(metrics_reg_new['RMSE'], metrics_reg_orig['RMSE'], False)}",
-                    }
-                )
+    col1, col2 = st.columns([2, 1], vertical_alignment="bottom")
+    with col1:
+        version = st.selectbox(
+            "Version to serve", list(reversed(versions)), key=f"promote_{family}"
+        )
+    if version and read_manifest(family, version)["training"].get("mode") == "sample":
+        st.warning(
+            f"⚠️ {version} was trained on a sample of the rows: run a full retraining "
+            "before serving it to the users."
+        )
+    with col2:
+        if st.button(
+            "⭐ Promote", key=f"promote_button_{family}", disabled=version == current
+        ):
+            promote(family, version)
+            st.toast(f"{family.capitalize()} {version} is now served to the users")
+            st.rerun(scope="fragment")
 
-        # Classification
-        with st.spinner("Training classification model..."):
-            start = time.time()
 
-            clf_pipeline_orig = load_model(
-                os.path.join(MODELS_DIR, "pipeline_xgboost_classification.pkl")
-            )
+@st.fragment
+def display_registry() -> None:
+    """Display the model registry: the current version (⭐) of each family is the one
+    the prediction pages and the API use."""
+    st.subheader("📦 Model versions")
+    for family in JOB_FUNCTIONS:
+        with st.expander(family.capitalize()):
+            display_versions(family)
 
-            # Import the original label encoder to decode predicted labels for the original model (for comparison purposes)
-            label_encoder_original = joblib.load(
-                os.path.join(MODELS_DIR, "label_encoder_target.pkl")
-            )
 
-            # Create a new label encoder in case the training data does not have the same classes
-            label_encoder = LabelEncoder()
-            X_clf, y_clf = df[clf_features], df[clf_target]
-            y_clf_encoded = label_encoder.fit_transform(y_clf)
+# Interface
+st.title("🔄 Retrain regression and classification models")
+st.caption(
+    "Training runs in the background and may take several minutes depending on "
+    "dataset size ⏳ You can leave this page, the status is kept."
+)
+st.write(
+    "Select a dataset in the **sidebar**, then click the button to retrain the models on the new data."
+)
 
-            try:
-                y_pred_orig_encoded = clf_pipeline_orig.predict(X_clf)
+# Sidebar dataset selector, the training job reads the dataset itself.
+with st.sidebar:
+    st.header("📂 Dataset selection")
+    generate_file_selector(sidebar=True, load_data=False)
 
-                # Use the original label encoder to decode predictions from the original model.
-                y_pred_orig = label_encoder_original.inverse_transform(
-                    y_pred_orig_encoded
+dataset = st.session_state.get("last_file", None)
+if dataset is None:
+    st.info("⬅️ Please select a dataset in the sidebar.")
+else:
+    st.success(f"✅ Dataset selected: {dataset}")
+    st.write(f"**Rows:** {dataset_info(dataset)['rows']:,}")
+    st.dataframe(query_dataset(dataset, limit=5))
+
+    families = st.multiselect(
+        "Models to retrain",
+        list(JOB_FUNCTIONS),
+        default=list(JOB_FUNCTIONS),
+        format_func=str.capitalize,
+    )
+
+    mode = st.radio(
+        "Training mode",
+        MODES,
+        format_func={
+            "full": "Full retraining (all rows, from scratch)",
+            "sample": "Quick run on a stratified sample",
+            "incremental": "Incremental update (new rows only, fast)",
+            "tune": "Hyperparameter search (slow)",
+            "external": "Several datasets, streamed from disk",
+        }.get,
+        horizontal=True,
+    )
+    if mode == "incremental":
+        for family in families:
+            since = read_training_info(family).get("trained_until")
+            st.caption(
+                f"{family.capitalize()}: {INCREMENTAL_ROUNDS} trees added to the "
+                f"current version {current_version(family)} on the rows "
+                + (
+                    f"received after {since}."
+                    if since
+                    else "of the dataset (no training date recorded)."
                 )
+            )
 
-                metrics_clf_orig = {"Accuracy": accuracy_score(y_clf, y_pred_orig)}
-            except Exception as e:
-                st.warning(f"⚠️ Could not evaluate original classification model: {e}")
-                metrics_clf_orig = {"Accuracy": None}
+    elif mode == "sample":
+        st.caption(
+            f"Trained on {SAMPLE_ROWS:,} rows and measured on {EVAL_ROWS:,} other rows "
+            "at most, both drawn in the proportions of the DPE labels, climate zones "
+            "and building types. Run a full retraining before promoting a version."
+        )
 
-            clf_pipeline_retrained = load_model(
-                os.path.join(MODELS_DIR, "pipeline_xgboost_classification.pkl")
-            )
+    elif mode == "tune":
+        st.caption(
+            f"{N_CANDIDATES} candidates per model, compared by cross-validation within "
+            f"{TUNING_TIME_BUDGET / 60:.0f} min; the best one is retrained on all rows."
+        )
 
-            clf_pipeline_retrained.fit(X_clf, y_clf_encoded)
+    datasets = None
+    if mode == "external":
+        catalog = read_catalog()
+        datasets = st.multiselect(
+            "Datasets to train on",
+            list(catalog),
+            default=list(catalog),
+            format_func=lambda name: f"{name} ({catalog[name]['rows']:,} rows)",
+        )
+        st.caption(
+            "The rows are streamed batch by batch to XGBoost, they are never all "
+            "loaded in memory. The datasets cannot be updated during the training."
+        )
 
-            retrain_clf_path = os.path.join(
-                MODELS_DIR, "pipeline_xgboost_classification_retrained.pkl"
-            )
-            save_model(clf_pipeline_retrained, retrain_clf_path)
-
-            y_pred_new_encoded = clf_pipeline_retrained.predict(X_clf)
-
-            # Use the new label encoder to decode predictions from the retrained model.
-            y_pred_new = label_encoder.inverse_transform(y_pred_new_encoded)
-            metrics_clf_new = {"Accuracy": accuracy_score(y_clf, y_pred_new)}
-
-            duration = time.time() - start
-            st.success(f"✅ Classification retrained in {duration/60:.2f} min")
-
-            st.subheader("📊 Classification comparison")
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown("**Original model**")
-                st.write(metrics_clf_orig)
-            with col2:
-                st.markdown("**Retrained model**")
-                st.write(
-                    {
-                        "Accuracy": f"{metrics_clf_new['Accuracy']:.4f} "
-                        f"{diff_icon(metrics_clf_new['Accuracy'], metrics_clf_orig['Accuracy'], True)}"
-                    }
-                )
+    # Retraining
+    if st.button("🚀 Retrain models", disabled=not families or datasets == []):
+        for family in families:
+            try:
+                submit(family, dataset, mode, datasets)
+                st.toast(f"{family.capitalize()} training submitted")
+            except JobConflictError as e:
+                st.warning(f"⚠️ {e}")
 
-    st.success("🎉 All models retrained successfully")
+display_jobs()
+display_registry()
@@ -1,9 +1,8 @@
 from typing import Any, Callable, Optional
 
-import requests
-
 from data_requesters.helper import retry_on_error
 from src.data_requesters.base_api import BaseAPIRequester
+from src.data_requesters.metadata_cache import fetch_metadata
 
 
 class Ademe_API_requester(BaseAPIRequester):
@@ -258,9 +257,8 @@ class Ademe_API_requester(BaseAPIRequester):
         # Get the appropriate base URL
         url = self.__base_url_neuf if neuf else self.__base_url_existant
 
-        response = requests.get(url)
-        response.raise_for_status()
-        dataset_info = response.json()
+        # Cached on disk and revalidated, see metadata_cache.
+        dataset_info = fetch_metadata(url)
 
         schema = dataset_info.get("schema", [])
 
@@ -0,0 +1,191 @@
+import json
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Iterable
+
+import pandas as pd
+
+from src.data_requesters.elevation import Elevation_API_requester
+from src.data_requesters.geo_features import Geo_API_requester
+from src.data_requesters.metadata_cache import CACHE_DIR
+from src.storage import read_catalog
+from src.storage.locks import atomic_write_text
+from src.storage.query_engine import aggregate
+
+# ============================================================ #
+# Geographical features of many cities at once                 #
+# ============================================================ #
+
+# Cities resolved by the APIs, kept across runs: normalised name -> features.
+CITIES_CACHE_PATH = CACHE_DIR / "cities.json"
+
+# Concurrent API requests when resolving unknown cities.
+MAX_WORKERS = 8
+
+GEO_FIELDS = ["zone_climatique", "altitude_moyenne", "lat", "lon"]
+
+
+def normalise_city(city: str) -> str:
+    """Comparable form of a city name or INSEE code: lower case, no accents, single spaces."""
+    text = unicodedata.normalize("NFKD", str(city)).encode("ascii", "ignore").decode()
+    return re.sub(r"[\s\-']+", " ", text).strip().lower()
+
+
+def _is_insee_code(city: str) -> bool:
+    """Whether a city looks like an INSEE code (e.g. 69123, 2A004)."""
+    return len(city) == 5 and city[2:].isdigit()
+
+
+@lru_cache(maxsize=4)
+def _gazetteer(versions: tuple) -> dict[str, dict[str, Any]]:
+    """Cities of the stored datasets (names and INSEE codes), for a set of dataset versions."""
+    frames = []
+    for name, _ in versions:
+        try:
+            frames.append(
+                aggregate(
+                    name,
+                    {
+                        "n": ("count", "*"),
+                        "altitude_moyenne": ("avg", "altitude_moyenne"),
+                        "lat": ("avg", "lat"),
+                        "lon": ("avg", "lon"),
+                    },
+                    ["nom_commune_ban", "code_insee_ban", "zone_climatique"],
+                )
+            )
+        except (KeyError, ValueError):
+            # Dataset without the geographical columns.
+            continue
+    if not frames:
+        return {}
+
+    cities = pd.concat(frames, ignore_index=True).dropna(subset=["zone_climatique"])
+    # The most represented entry wins when a name is shared.
+    cities = cities.sort_values("n", ascending=False)
+
+    gazetteer = {}
+    for key_column in ["code_insee_ban", "nom_commune_ban"]:
+        for row in cities.dropna(subset=[key_column]).itertuples(index=False):
+            key = normalise_city(getattr(row, key_column))
+            if key not in gazetteer:
+                gazetteer[key] = {
+                    "zone_climatique": row.zone_climatique,
+                    "altitude_moyenne": (
+                        None
+                        if pd.isna(row.altitude_moyenne)
+                        else float(row.altitude_moyenne)
+                    ),
+                    "lat": None if pd.isna(row.lat) else float(row.lat),
+                    "lon": None if pd.isna(row.lon) else float(row.lon),
+                    "source": "datasets",
+                }
+    return gazetteer
+
+
+def offline_gazetteer() -> dict[str, dict[str, Any]]:
+    """Cities known from the stored datasets, rebuilt when a dataset changes."""
+    versions = tuple(
+        sorted((name, entry["version"]) for name, entry in read_catalog().items())
+    )
+    return _gazetteer(versions)
+
+
+def _read_cities_cache() -> dict[str, dict[str, Any]]:
+    """Cities previously resolved by the APIs."""
+    try:
+        return json.loads(CITIES_CACHE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _lookup_online(city: str) -> dict[str, Any] | None:
+    """Resolve a city with the Geo and Elevation APIs (None if unknown or offline)."""
+    geo_info = Geo_API_requester().get_city_info(ville=city)
+    if not geo_info:
+        return None
+    lat, lon = geo_info.get("lat"), geo_info.get("lon")
+    altitude = (
+        Elevation_API_requester().get_elevation(lat, lon) if lat and lon else None
+    )
+    return {
+        "zone_climatique": geo_info.get("zone_climatique"),
+        "altitude_moyenne": altitude,
+        "lat": lat,
+        "lon": lon,
+        "source": "api",
+    }
+
+
+def resolve_cities(
+    cities: Iterable[str],
+    online: bool = True,
+    progress: Callable[[float], None] | None = None,
+) -> dict[str, dict[str, Any] | None]:
+    """Geographical features of distinct cities, each city being resolved once.
+
+    Lookup order: cities already resolved by the APIs (disk cache), cities of the
+    stored datasets, then the APIs (concurrent requests, results added to the disk
+    cache). An INSEE code still unknown gets the climate zone of its department.
+
+    Args:
+        cities (Iterable[str]): City names or INSEE codes (duplicates are resolved once).
+        online (bool, optional): Ask the APIs for unknown cities. Defaults to True.
+        progress (Callable[[float], None] | None, optional): Called with the fraction of cities resolved. Defaults to None.
+
+    Returns:
+        dict[str, dict[str, Any] | None]: City -> zone_climatique, altitude_moyenne, lat,
+            lon and source ("cache", "datasets", "api" or "department"), None if unknown.
+    """
+    distinct = list(
+        dict.fromkeys(c for c in cities if isinstance(c, str) and c.strip())
+    )
+    cached, gazetteer = _read_cities_cache(), offline_gazetteer()
+
+    resolved: dict[str, dict[str, Any] | None] = {}
+    missing = []
+    for city in distinct:
+        key = normalise_city(city)
+        if key in cached:
+            resolved[city] = cached[key] | {"source": "cache"}
+        elif key in gazetteer:
+            resolved[city] = gazetteer[key]
+        else:
+            missing.append(city)
+
+    if online and missing:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            for i, (city, info) in enumerate(
+                zip(missing, pool.map(_lookup_online, missing)), start=1
+            ):
+                resolved[city] = info
+                if info is not None:
+                    cached[normalise_city(city)] = info
+                if progress is not None:
+                    progress(i / len(missing))
+        CITIES_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(CITIES_CACHE_PATH, json.dumps(cached, ensure_ascii=False))
+
+    # Last resort for INSEE codes: climate zone of the department.
+    climate_zones = None
+    for city in missing:
+        if resolved.get(city) is None and _is_insee_code(city.strip()):
+            if climate_zones is None:
+                climate_zones = Geo_API_requester().climate_zones
+            dept = city.strip()[:2].upper()
+            dept = "20" if dept in {"2A", "2B"} else dept
+            if dept in climate_zones:
+                resolved[city] = {
+                    "zone_climatique": climate_zones[dept],
+                    "altitude_moyenne": None,
+                    "lat": None,
+                    "lon": None,
+                    "source": "department",
+                }
+        resolved.setdefault(city, None)
+
+    if progress is not None:
+        progress(1.0)
+    return resolved
@@ -4,6 +4,7 @@ import requests
 
 from data_requesters.helper import retry_on_error
 from src.data_requesters.base_api import BaseAPIRequester
+from src.data_requesters.metadata_cache import fetch_metadata
 
 
 class Enedis_API_requester(BaseAPIRequester):
@@ -56,9 +57,8 @@ class Enedis_API_requester(BaseAPIRequester):
             >>> for field in fields:
             ...     print(f"{field['name']}: {field['label']} ({field['type']})")
         """
-        response = requests.get(self.__dataset_url)
-        response.raise_for_status()
-        dataset_info = response.json()
+        # Cached on disk and revalidated, see metadata_cache.
+        dataset_info = fetch_metadata(self.__dataset_url)
 
         fields = dataset_info.get("fields", [])
 
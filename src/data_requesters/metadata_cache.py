@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import requests
+
+from src.storage.locks import atomic_write_text
+
+# ============================================================ #
+# Cache of the API metadata (dataset schemas)                  #
+# ============================================================ #
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent  # Get to the root folder.
+
+# One JSON file per URL: body, fetch time and validators (ETag, Last-Modified).
+CACHE_DIR = BASE_DIR / "data" / "api_cache"
+
+# Seconds during which a cached answer is used without asking the API.
+METADATA_TTL = int(os.getenv("API_METADATA_TTL", 6 * 3600))
+
+REQUEST_TIMEOUT = 10
+
+# Seconds before asking again an API found unreachable.
+OFFLINE_RETRY_DELAY = 60
+
+_entries: dict[str, dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def _cache_path(url: str) -> Path:
+    """Path of the cache file of a URL."""
+    return CACHE_DIR / f"{hashlib.sha1(url.encode()).hexdigest()[:16]}.json"
+
+
+def _read_entry(url: str) -> dict[str, Any] | None:
+    """Cached entry of a URL, from memory or from disk."""
+    with _lock:
+        entry = _entries.get(url)
+    if entry is not None:
+        return entry
+
+    path = _cache_path(url)
+    if not path.exists():
+        return None
+    try:
+        entry = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        _entries[url] = entry
+    return entry
+
+
+def _write_entry(url: str, entry: dict[str, Any]) -> None:
+    """Store the entry of a URL in memory and on disk."""
+    with _lock:
+        _entries[url] = entry
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(_cache_path(url), json.dumps(entry, ensure_ascii=False))
+    except OSError as e:
+        print(f"Unable to persist the metadata cache: {e}")
+
+
+def fetch_metadata(url: str, ttl: int | None = None) -> dict[str, Any]:
+    """Get the JSON metadata of an API URL through the cache.
+
+    - Fresh entry (younger than the TTL): returned without any request.
+    - Expired entry: revalidated with If-None-Match / If-Modified-Since, the body is
+      only downloaded again if it changed.
+    - API unreachable: the last known answer is returned, the API is asked again
+      after OFFLINE_RETRY_DELAY seconds.
+
+    Args:
+        url (str): The API URL.
+        ttl (int | None, optional): Freshness in seconds. Defaults to None (METADATA_TTL).
+
+    Raises:
+        requests.RequestException: If the API is unreachable and nothing is cached.
+
+    Returns:
+        dict[str, Any]: The JSON body.
+    """
+    ttl = METADATA_TTL if ttl is None else ttl
+    entry = _read_entry(url)
+    now = time.time()
+    if entry is not None and (
+        now - entry["fetched_at"] < ttl or now < entry.get("retry_after", 0)
+    ):
+        return entry["body"]
+
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304 and entry is not None:
+            entry = {k: v for k, v in entry.items() if k != "retry_after"}
+            _write_entry(url, entry | {"fetched_at": now})
+            return entry["body"]
+        response.raise_for_status()
+        body = response.json()
+    except (requests.RequestException, ValueError) as e:
+        if entry is None:
+            raise
+        # Offline: keep serving the last known good answer (in memory only).
+        print(f"Using the cached metadata of {url}: {e}")
+        with _lock:
+            _entries[url] = entry | {"retry_after": now + OFFLINE_RETRY_DELAY}
+        return entry["body"]
+
+    _write_entry(
+        url,
+        {
+            "url": url,
+            "fetched_at": now,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "body": body,
+        },
+    )
+    return body
@@ -0,0 +1,32 @@
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent  # Get to the root folder.
+MODELS_DIR = BASE_DIR / "MLmodels"
+
+from .model_cache import load_model, model_cache, save_model  # noqa: E402
+from .registry import (  # noqa: E402
+    CURRENT_MODELS,
+    available_model_versions,
+    current_version,
+    load_models,
+    promote,
+    register_model,
+    warm_models,
+    warm_models_in_background,
+)
+
+__all__ = [
+    "BASE_DIR",
+    "MODELS_DIR",
+    "CURRENT_MODELS",
+    "available_model_versions",
+    "current_version",
+    "load_model",
+    "load_models",
+    "model_cache",
+    "promote",
+    "register_model",
+    "save_model",
+    "warm_models",
+    "warm_models_in_background",
+]
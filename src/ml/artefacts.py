@@ -0,0 +1,297 @@
+"""
+Light model artefacts: the XGBoost booster in its native UBJSON format and the
+preprocessing of the pipeline as a JSON spec, described by a manifest. They load
+faster than the pickled pipelines and without unpickling any code.
+
+Usage: python -m src.ml.artefacts (exports the pipelines of the model registry)
+"""
+
+import datetime as dt
+import hashlib
+import json
+import math
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from scipy import sparse
+
+from src.ml import MODELS_DIR
+from src.storage.locks import atomic_write_text, publish, temp_path
+
+# ============================================================ #
+# Export and loading of the light model artefacts              #
+# ============================================================ #
+
+ARTEFACT_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+
+
+def artefact_dir(path: str | Path) -> Path:
+    """Folder of the light artefact of a pickled pipeline (same name, no extension)."""
+    path = Path(path)
+    return path.with_name(path.stem)
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 of a file content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _json_number(value: float) -> float | None:
+    """NaN has no JSON representation: stored as null."""
+    return None if value is None or math.isnan(value) else float(value)
+
+
+def preprocessing_spec(preprocessor: Any) -> dict:
+    """Declarative description of a fitted ColumnTransformer.
+
+    Supported transformers: StandardScaler and OneHotEncoder (no dropped or
+    infrequent categories), the other columns being dropped.
+
+    Raises:
+        ValueError: If the preprocessing cannot be described.
+
+    Returns:
+        dict: Input columns, output density and the transformation of each block.
+    """
+    if type(preprocessor).__name__ != "ColumnTransformer":
+        raise ValueError(f"Unsupported preprocessing: {type(preprocessor).__name__}")
+
+    steps = []
+    for name, transformer, columns in preprocessor.transformers_:
+        kind = type(transformer).__name__
+        if name == "remainder":
+            if transformer != "drop" and len(columns):
+                raise ValueError("Unsupported preprocessing: remainder columns kept")
+            continue
+        if kind == "StandardScaler":
+            steps.append(
+                {
+                    "kind": "scale",
+                    "columns": list(columns),
+                    "mean": (
+                        None
+                        if transformer.mean_ is None
+                        else transformer.mean_.tolist()
+                    ),
+                    "scale": (
+                        None
+                        if transformer.scale_ is None
+                        else transformer.scale_.tolist()
+                    ),
+                }
+            )
+        elif kind == "OneHotEncoder":
+            if transformer.drop is not None or not (
+                transformer.min_frequency is None and transformer.max_categories is None
+            ):
+                raise ValueError("Unsupported one-hot encoding: dropped categories")
+            categories = [c.tolist() for c in transformer.categories_]
+            if any(pd.isna(v) for values in categories for v in values):
+                raise ValueError("Unsupported one-hot encoding: missing value category")
+            steps.append(
+                {
+                    "kind": "onehot",
+                    "columns": list(columns),
+                    "categories": categories,
+                    "handle_unknown": transformer.handle_unknown,
+                }
+            )
+        else:
+            raise ValueError(f"Unsupported transformer: {kind}")
+
+    return {
+        "features": list(preprocessor.feature_names_in_),
+        "sparse": bool(preprocessor.sparse_output_),
+        "steps": steps,
+    }
+
+
+class LightPipeline:
+    """Predictor rebuilt from a light artefact, with the predict method of the pipeline."""
+
+    def __init__(self, manifest: dict, booster: xgb.Booster):
+        self.manifest = manifest
+        self.booster = booster
+        self.features = manifest["preprocessing"]["features"]
+        self.task = manifest["task"]
+        missing = manifest["model"]["missing"]
+        self.missing = np.nan if missing is None else missing
+        self.iteration_range = tuple(manifest["model"]["iteration_range"])
+
+    def transform(self, X: pd.DataFrame) -> np.ndarray | sparse.csr_matrix:
+        """Apply the preprocessing spec to the input rows."""
+        blocks = []
+        for step in self.manifest["preprocessing"]["steps"]:
+            if step["kind"] == "scale":
+                values = X[step["columns"]].to_numpy(dtype="float64", na_value=np.nan)
+                if step["mean"] is not None:
+                    values = values - np.asarray(step["mean"])
+                if step["scale"] is not None:
+                    values = values / np.asarray(step["scale"])
+                blocks.append(values)
+            else:
+                for column, categories in zip(step["columns"], step["categories"]):
+                    codes = pd.Categorical(
+                        X[column].astype(object), categories=categories
+                    ).codes
+                    if step["handle_unknown"] == "error" and (codes < 0).any():
+                        unknown = X[column][codes < 0].unique()[:5]
+                        raise ValueError(
+                            f"Found unknown categories {list(unknown)} in column {column}"
+                        )
+                    block = np.zeros((len(X), len(categories)))
+                    rows = np.flatnonzero(codes >= 0)
+                    block[rows, codes[rows]] = 1.0
+                    blocks.append(block)
+        values = np.hstack(blocks) if blocks else np.empty((len(X), 0))
+        # Zeros of a sparse output are missing values for XGBoost, as when fitted.
+        return (
+            sparse.csr_matrix(values)
+            if self.manifest["preprocessing"]["sparse"]
+            else values
+        )
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        """Predictions of the pipeline: values, or encoded classes for a classifier."""
+        predictions = self.booster.inplace_predict(
+            self.transform(X[self.features]),
+            missing=self.missing,
+            iteration_range=self.iteration_range,
+        )
+        if self.task == "regression":
+            return predictions
+        if predictions.ndim == 2:
+            return np.argmax(predictions, axis=1)
+        return (predictions > 0.5).astype(int)
+
+
+def export_pipeline(pipeline: Any, path: str | Path) -> Path:
+    """Export a fitted pipeline as a light artefact, next to its pickle file.
+
+    The booster file is named after its content and the manifest is written last:
+    readers see either the previous artefact or the new one.
+
+    Args:
+        pipeline (Any): The fitted pipeline (ColumnTransformer, then an XGBoost model).
+        path (str | Path): The pickle file of the pipeline.
+
+    Raises:
+        ValueError: If the pipeline cannot be exported.
+
+    Returns:
+        Path: The folder of the artefact.
+    """
+    path = Path(path)
+    preprocessor, model = pipeline[:-1], pipeline[-1]
+    if len(preprocessor) != 1:
+        raise ValueError(
+            "Unsupported pipeline: a single preprocessing step is expected"
+        )
+    if isinstance(model, xgb.XGBClassifier):
+        task = "classification"
+    elif isinstance(model, xgb.XGBRegressor):
+        task = "regression"
+    else:
+        raise ValueError(f"Unsupported model: {type(model).__name__}")
+    spec = preprocessing_spec(preprocessor[0])
+
+    booster = model.get_booster()
+    raw = bytes(booster.save_raw("ubj"))
+    booster_sha = hashlib.sha256(raw).hexdigest()
+    best_iteration = booster.attr("best_iteration")
+
+    folder = artefact_dir(path)
+    folder.mkdir(parents=True, exist_ok=True)
+    booster_path = folder / f"booster-{booster_sha[:12]}.ubj"
+    if not booster_path.exists():
+        tmp_path = temp_path(booster_path)
+        tmp_path.write_bytes(raw)
+        publish(tmp_path, booster_path)
+
+    manifest = {
+        "format": ARTEFACT_FORMAT,
+        "created_at": dt.datetime.now().isoformat(timespec="seconds"),
+        "source": {"file": path.name, "sha256": file_sha256(path)},
+        "task": task,
+        "preprocessing": spec,
+        "model": {
+            "file": booster_path.name,
+            "sha256": booster_sha,
+            "missing": _json_number(model.missing),
+            "iteration_range": [
+                0,
+                0 if best_iteration is None else int(best_iteration) + 1,
+            ],
+        },
+    }
+    atomic_write_text(folder / MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False))
+
+    for old in folder.glob("booster-*.ubj"):
+        if old != booster_path:
+            old.unlink(missing_ok=True)
+    return folder
+
+
+def load_artefact(path: str | Path) -> LightPipeline | None:
+    """Load the light artefact of a pickled pipeline.
+
+    Args:
+        path (str | Path): The pickle file of the pipeline.
+
+    Returns:
+        LightPipeline | None: The predictor, None when there is no artefact or when it
+            was exported from another version of the pickle file.
+    """
+    path = Path(path)
+    try:
+        manifest = json.loads(
+            (artefact_dir(path) / MANIFEST_FILE).read_text(encoding="utf-8")
+        )
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != ARTEFACT_FORMAT:
+        return None
+    if manifest["source"]["sha256"] != file_sha256(path):
+        return None
+
+    try:
+        raw = (artefact_dir(path) / manifest["model"]["file"]).read_bytes()
+    except OSError:
+        # Replaced by a newer export in the meantime.
+        return None
+    if hashlib.sha256(raw).hexdigest() != manifest["model"]["sha256"]:
+        return None
+    booster = xgb.Booster()
+    booster.load_model(bytearray(raw))
+    return LightPipeline(manifest, booster)
+
+
+def export_models(models_dir: Path = MODELS_DIR) -> list[Path]:
+    """Export every registered pipeline that can be exported."""
+    # The registry depends on this module: imported when used.
+    from src.ml.registry import model_files
+
+    folders = []
+    for path in model_files(models_dir):
+        try:
+            folders.append(export_pipeline(joblib.load(path), path))
+        except ValueError as e:
+            print(f"{path.name} not exported: {e}")
+    return folders
+
+
+if __name__ == "__main__":
+    folders = export_models()
+    print(
+        f"{len(folders)} model(s) exported: "
+        f"{', '.join(str(f.relative_to(MODELS_DIR)) for f in folders) or '-'}"
+    )
@@ -0,0 +1,204 @@
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from src.data_requesters.city_lookup import normalise_city
+from src.ml.training import features_target
+
+# ============================================================ #
+# Scoring of many homes at once                                #
+# ============================================================ #
+
+# Columns of the uploaded file (fields of the prediction API input).
+REQUIRED_COLUMNS = [
+    "city",
+    "area",
+    "n_floors",
+    "age",
+    "main_heating_energy",
+    "building",
+]
+OPTIONAL_COLUMNS = ["cost"]
+
+# Accepted spellings -> value known by the models.
+ENERGY_VALUES = {
+    "electricite": "Électricité",
+    "electricity": "Électricité",
+    "gaz naturel": "Gaz naturel",
+    "natural gas": "Gaz naturel",
+    "gaz": "Gaz naturel",
+    "autre": "Autre",
+    "other": "Autre",
+}
+BUILDING_VALUES = {
+    "maison": "maison",
+    "house": "maison",
+    "appartement": "appartement",
+    "apartment": "appartement",
+    "immeuble": "immeuble",
+    "building": "immeuble",
+}
+
+# Rows predicted at once: bounds the memory used by the pipelines.
+CHUNK_ROWS = 20_000
+
+
+def template() -> pd.DataFrame:
+    """Example of an input file."""
+    return pd.DataFrame(
+        {
+            "city": ["Lyon", "69266", "Marseille"],
+            "cost": [1200.0, None, None],
+            "area": [65.0, 110.0, 45.0],
+            "n_floors": [1, 2, 1],
+            "age": [40, 12, 75],
+            "main_heating_energy": ["Gaz naturel", "Électricité", "Autre"],
+            "building": ["appartement", "maison", "appartement"],
+        }
+    )
+
+
+def check_columns(df: pd.DataFrame) -> list[str]:
+    """Required columns missing from an input file."""
+    return [c for c in REQUIRED_COLUMNS if c not in df.columns]
+
+
+def prepare_features(
+    df: pd.DataFrame, geo: dict[str, dict[str, Any] | None]
+) -> tuple[pd.DataFrame, pd.Series]:
+    """Model features of the input rows, and the reason why a row cannot be scored.
+
+    Args:
+        df (pd.DataFrame): The input rows (REQUIRED_COLUMNS, optional "cost").
+        geo (dict[str, dict[str, Any] | None]): City -> features, from resolve_cities.
+
+    Returns:
+        tuple[pd.DataFrame, pd.Series]: The features of both models and the status of
+            each row ("ok" or the reason of the rejection).
+    """
+    city = df["city"].astype("string").str.strip()
+    # One lookup per distinct city, then broadcast to the rows.
+    geo_frame = pd.DataFrame.from_dict(
+        {c.strip(): info for c, info in geo.items() if info is not None},
+        orient="index",
+    ).reindex(columns=["zone_climatique", "altitude_moyenne"])
+    geo_rows = geo_frame.reindex(city.to_numpy())
+
+    def mapped(column: str, values: dict[str, str]) -> pd.Series:
+        # Spellings normalised once per distinct value.
+        raw = df[column].astype("string")
+        lookup = {v: values.get(normalise_city(v)) for v in raw.dropna().unique()}
+        return raw.map(lookup)
+
+    features = pd.DataFrame(
+        {
+            "cout_total_5_usages": (
+                pd.to_numeric(df["cost"], errors="coerce")
+                if "cost" in df.columns
+                else np.nan
+            ),
+            "surface_habitable_logement": pd.to_numeric(df["area"], errors="coerce"),
+            "nombre_niveau_logement": pd.to_numeric(df["n_floors"], errors="coerce"),
+            "age_batiment": pd.to_numeric(df["age"], errors="coerce"),
+            "altitude_moyenne": pd.to_numeric(
+                geo_rows["altitude_moyenne"].to_numpy(), errors="coerce"
+            ),
+            "type_energie_principale_chauffage": mapped(
+                "main_heating_energy", ENERGY_VALUES
+            ).to_numpy(),
+            "type_batiment": mapped("building", BUILDING_VALUES).to_numpy(),
+            "zone_climatique": geo_rows["zone_climatique"].to_numpy(),
+        },
+        index=df.index,
+    )
+    # As for a single prediction: unknown altitude -> 0.
+    features["altitude_moyenne"] = features["altitude_moyenne"].fillna(0)
+
+    status = pd.Series("ok", index=df.index, dtype="object")
+    checks = [
+        (features["zone_climatique"].isna(), "unknown city"),
+        (features["type_batiment"].isna(), "invalid building"),
+        (
+            features["type_energie_principale_chauffage"].isna(),
+            "invalid main_heating_energy",
+        ),
+        (~(features["surface_habitable_logement"] > 0), "invalid area"),
+        (~(features["nombre_niveau_logement"] > 0), "invalid n_floors"),
+        (~(features["age_batiment"] > 0), "invalid age"),
+        # A given cost must be positive, as for the prediction API.
+        (
+            features["cout_total_5_usages"].notna()
+            & ~(features["cout_total_5_usages"] > 0),
+            "invalid cost",
+        ),
+    ]
+    # The first failed check of a row is reported.
+    for failed, reason in reversed(checks):
+        status[failed.to_numpy()] = reason
+
+    return features, status
+
+
+def score(
+    df: pd.DataFrame,
+    geo: dict[str, dict[str, Any] | None],
+    pipeline_regression: Any,
+    pipeline_classification: Any,
+    label_encoder: Any,
+    chunk_rows: int = CHUNK_ROWS,
+    progress: Callable[[float], None] | None = None,
+) -> pd.DataFrame:
+    """Predict the cost (when not given) and the DPE class of every input row.
+
+    The rows are predicted chunk by chunk, each chunk in a single call of the pipelines.
+
+    Args:
+        df (pd.DataFrame): The input rows.
+        geo (dict[str, dict[str, Any] | None]): City -> features, from resolve_cities.
+        pipeline_regression (Any): The cost regression pipeline.
+        pipeline_classification (Any): The DPE classification pipeline.
+        label_encoder (Any): Encoder of the DPE classes.
+        chunk_rows (int, optional): Rows predicted at once. Defaults to CHUNK_ROWS.
+        progress (Callable[[float], None] | None, optional): Called with the fraction of rows scored. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The input rows with zone_climatique, altitude_moyenne,
+            predicted_cost_eur (when the cost is not given), predicted_dpe_class and status.
+    """
+    features, status = prepare_features(df, geo)
+    # Features of the models, in the order used at training time.
+    regression_features, _ = features_target("regression")
+    classification_features, _ = features_target("classification")
+    cost = features["cout_total_5_usages"].to_numpy(dtype="float64", copy=True)
+    predicted_cost = np.full(len(df), np.nan)
+    predicted_class = np.full(len(df), None, dtype="object")
+
+    valid = np.flatnonzero((status == "ok").to_numpy())
+    for start in range(0, len(valid), chunk_rows):
+        rows = valid[start : start + chunk_rows]
+        X = features.iloc[rows]
+
+        need_cost = np.isnan(cost[rows])
+        if need_cost.any():
+            predicted = pipeline_regression.predict(
+                X.loc[need_cost, regression_features]
+            )
+            predicted_cost[rows[need_cost]] = predicted
+            cost[rows[need_cost]] = predicted
+
+        X = X.assign(cout_total_5_usages=cost[rows])[classification_features]
+        predicted_class[rows] = label_encoder.inverse_transform(
+            pipeline_classification.predict(X)
+        )
+
+        if progress is not None:
+            progress(min(start + chunk_rows, len(valid)) / max(len(valid), 1))
+
+    scored = df.copy()
+    scored["zone_climatique"] = features["zone_climatique"]
+    scored["altitude_moyenne"] = features["altitude_moyenne"].round(1)
+    scored["predicted_cost_eur"] = np.round(predicted_cost, 2)
+    scored["predicted_dpe_class"] = predicted_class
+    scored["status"] = status
+    return scored
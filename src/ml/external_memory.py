@@ -0,0 +1,308 @@
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import xgboost as xgb
+
+from src.ml import MODELS_DIR
+from src.ml.registry import model_path, register_model
+from src.ml.training import (
+    DATE_COLUMN,
+    current_model,
+    features_target,
+    thread_budget,
+    training_info,
+)
+from src.storage.locks import dataset_lock
+from src.storage.parquet_store import partition_files, to_pandas
+
+# ============================================================ #
+# Out-of-core training over the partitions of the datasets     #
+# ============================================================ #
+
+# Rows read from the partition files at once: bounds the memory of the training.
+BATCH_ROWS = 100_000
+
+# Rows sampled across the partitions to fit the preprocessing of the pipeline.
+SAMPLE_ROWS = 200_000
+
+
+def _batches(
+    files: list[Path], columns: list[str], batch_rows: int
+) -> Iterator[pd.DataFrame]:
+    """Rows of partition files, batch by batch (columns missing from a file are nulls)."""
+    schema = pa.unify_schemas([pq.read_schema(f) for f in files])
+    dataset = ds.dataset(files, schema=schema, format="parquet")
+    for batch in dataset.to_batches(
+        columns=[c for c in columns if c in schema.names], batch_size=batch_rows
+    ):
+        if batch.num_rows:
+            yield to_pandas(pa.Table.from_batches([batch])).reindex(columns=columns)
+
+
+class PartitionIter(xgb.DataIter):
+    """Batches of preprocessed rows for XGBoost, read from the partition files.
+
+    XGBoost goes through the batches a few times to build its quantiles, then keeps
+    its own compressed pages in cache_dir: the rows are never all in memory.
+    """
+
+    def __init__(
+        self,
+        files: list[Path],
+        features: list[str],
+        target: str,
+        transform: Callable[[pd.DataFrame], Any],
+        encode: Callable[[pd.Series], tuple[np.ndarray, np.ndarray]],
+        cache_dir: str,
+        batch_rows: int = BATCH_ROWS,
+    ):
+        self.files = files
+        self.features = features
+        self.target = target
+        self.transform = transform
+        self.encode = encode
+        self.batch_rows = batch_rows
+        self._it: Iterator[pd.DataFrame] | None = None
+        self.rows = 0
+        self.last_date: pd.Timestamp | None = None
+        super().__init__(cache_prefix=str(Path(cache_dir) / "cache"))
+
+    def reset(self) -> None:
+        self._it = None
+        self.rows = 0
+        self.last_date = None
+
+    def next(self, input_data: Callable) -> bool:
+        if self._it is None:
+            columns = self.features + [self.target, DATE_COLUMN]
+            self._it = _batches(self.files, columns, self.batch_rows)
+        for df in self._it:
+            keep, y = self.encode(df[self.target])
+            if not keep.any():
+                continue
+            input_data(data=self.transform(df.loc[keep, self.features]), label=y)
+            self.rows += int(keep.sum())
+            last_date = df.loc[keep, DATE_COLUMN].max()
+            if pd.notna(last_date) and (
+                self.last_date is None or last_date > self.last_date
+            ):
+                self.last_date = last_date
+            return True
+        return False
+
+
+def sample_rows(files: list[Path], columns: list[str], n: int) -> pd.DataFrame:
+    """Random rows taken from every partition file, about n in total."""
+    total = sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+    share = min(1.0, n / max(total, 1))
+    rng = np.random.default_rng(42)
+    parts = [
+        df.sample(frac=share, random_state=rng.integers(2**31))
+        for df in _batches(files, columns, BATCH_ROWS)
+    ]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+def _streamed_metrics(
+    family: str,
+    files: list[Path],
+    features: list[str],
+    target: str,
+    pipelines: dict[str, Any],
+    decode: Callable,
+    log: Callable[[str], None],
+) -> dict[str, dict]:
+    """Metrics of several pipelines over all the rows, computed batch by batch.
+
+    A pipeline failing on a batch (e.g. a category unknown to the current model) is
+    logged and left out of the following batches, its metrics are None.
+    """
+    sums = {name: np.zeros(4) for name in pipelines}  # n, sum y, sum y², errors
+    failed = set()
+    for df in _batches(files, features + [target], BATCH_ROWS):
+        df = df.dropna(subset=[target])
+        if df.empty:
+            continue
+        y = df[target].to_numpy()
+        for name, pipeline in pipelines.items():
+            if name in failed:
+                continue
+            try:
+                y_pred = decode(pipeline.predict(df[features]))
+            except Exception as e:
+                log(f"Could not evaluate the {name} {family} model: {e}")
+                failed.add(name)
+                continue
+            if family == "regression":
+                errors = float(((y - y_pred) ** 2).sum())
+                sums[name] += [len(y), y.sum(), (y**2).sum(), errors]
+            else:
+                sums[name] += [len(y), 0, 0, float((y_pred != y).sum())]
+
+    metrics = {}
+    for name, (n, s, s2, errors) in sums.items():
+        if name in failed:
+            metrics[name] = (
+                {"R2": None, "RMSE": None}
+                if family == "regression"
+                else {"Accuracy": None}
+            )
+        elif n == 0:
+            metrics[name] = {}
+        elif family == "regression":
+            total = s2 - s**2 / n
+            metrics[name] = {
+                "R2": 1 - errors / total if total else None,
+                "RMSE": float(np.sqrt(errors / n)),
+            }
+        else:
+            metrics[name] = {"Accuracy": 1 - errors / n}
+    return metrics
+
+
+def train_external_memory(
+    family: str,
+    datasets: list[str],
+    job: Any,
+    n_jobs: int | None = None,
+    models_dir: Path = MODELS_DIR,
+) -> dict:
+    """Train a model family from scratch on several datasets without loading them in memory.
+
+    The preprocessing of the pipeline is fitted on a sample of the rows, then the
+    partitions are streamed batch by batch into an external-memory QuantileDMatrix.
+    The datasets cannot be rewritten during the training (shared locks). The model is
+    registered as a new version, not promoted.
+
+    Args:
+        family (str): "regression" or "classification".
+        datasets (list[str]): The datasets to train on.
+        job (Any): The running job (progress and log methods), see src.ml.jobs.
+        n_jobs (int | None, optional): Threads of the training. Defaults to None (the model setting).
+        models_dir (Path, optional): Folder of the model files. Defaults to MODELS_DIR.
+
+    Returns:
+        dict: Registered version, metrics of the current and retrained models on all
+            the rows, wall time of each step (timings) and in total (duration_s).
+    """
+    start = time.time()
+    timings = {}
+    features, target = features_target(family, models_dir)
+    base, pipeline, label_encoder = current_model(family, models_dir)
+    pipeline_original = joblib.load(model_path(family, base, models_dir))
+    model = pipeline[-1]
+
+    # Classes of the current model, registered with the new one.
+    if family == "classification":
+
+        def encode(y: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+            keep = y.isin(label_encoder.classes_).to_numpy()
+            return keep, label_encoder.transform(y[keep])
+
+        decode = label_encoder.inverse_transform
+    else:
+
+        def encode(y: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+            keep = y.notna().to_numpy()
+            return keep, y[keep].to_numpy(dtype="float64")
+
+        def decode(y_pred):
+            return y_pred
+
+    with ExitStack() as locks:
+        for name in sorted(datasets):
+            locks.enter_context(dataset_lock(name, shared=True))
+        files = [f for name in datasets for f in partition_files(name)]
+        if not files:
+            raise ValueError(f"No rows in the datasets {datasets}")
+
+        job.progress(0.05, f"Fitting the preprocessing on {SAMPLE_ROWS:,} sampled rows")
+        sample = sample_rows(files, features + [target], SAMPLE_ROWS)
+        keep, y_sample = encode(sample[target])
+        pipeline[:-1].fit(sample.loc[keep, features], y_sample)
+        # Categories missing from the sample are encoded as all zeros.
+        for _, transformer, _ in pipeline[0].transformers_:
+            if hasattr(transformer, "handle_unknown"):
+                transformer.set_params(handle_unknown="ignore")
+        timings["load_s"] = time.time() - start
+
+        with (
+            tempfile.TemporaryDirectory(prefix="xgb-cache-") as cache_dir,
+            thread_budget(pipeline, n_jobs),
+        ):
+            job.progress(0.15, f"Streaming {len(files)} partition files to XGBoost")
+            step = time.time()
+            batches = PartitionIter(
+                files, features, target, pipeline[:-1].transform, encode, cache_dir
+            )
+            dtrain = xgb.ExtMemQuantileDMatrix(batches, nthread=n_jobs)
+            timings["matrix_s"] = time.time() - step
+            job.log(f"{batches.rows:,} rows streamed from {len(datasets)} dataset(s)")
+
+            job.progress(0.3, f"Training the {family} model")
+            step = time.time()
+            params = model.get_xgb_params() | {"tree_method": "hist"}
+            params.pop("n_jobs", None)
+            params.pop("use_label_encoder", None)
+            if n_jobs is not None:
+                params["nthread"] = n_jobs
+            if family == "classification":
+                params["num_class"] = len(label_encoder.classes_)
+            booster = xgb.train(params, dtrain, num_boost_round=model.n_estimators)
+            model.load_model(bytearray(booster.save_raw("ubj")))
+            timings["fit_s"] = time.time() - step
+
+            # The matrix holds the cache files: released before the folder is removed.
+            rows, last_date = batches.rows, batches.last_date
+            del dtrain, batches, booster
+
+        job.progress(0.85, "Evaluating the current and retrained models")
+        step = time.time()
+        metrics = _streamed_metrics(
+            family,
+            files,
+            features,
+            target,
+            {"original": pipeline_original, "retrained": pipeline},
+            decode,
+            job.log,
+        )
+        timings["evaluate_s"] = time.time() - step
+
+    version = register_model(
+        family,
+        pipeline,
+        training_info(
+            ", ".join(datasets),
+            rows,
+            None if last_date is None else last_date.date().isoformat(),
+            "external",
+        ),
+        metrics["retrained"],
+        label_encoder=label_encoder,
+        parent=base,
+        models_dir=models_dir,
+    )
+    job.log(f"Registered as version {version}")
+
+    return {
+        "mode": "external",
+        "base": base,
+        "version": version,
+        "datasets": list(datasets),
+        "rows": rows,
+        "n_jobs": n_jobs,
+        "metrics_original": metrics["original"],
+        "metrics_retrained": metrics["retrained"],
+        "timings": timings,
+        "duration_s": time.time() - start,
+    }
@@ -0,0 +1,269 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+from src.ml import BASE_DIR
+from src.ml.training import (
+    continue_training,
+    retrain_classification,
+    retrain_regression,
+)
+from src.ml.external_memory import train_external_memory
+from src.ml.sampling import SAMPLE_ROWS
+from src.ml.tuning import tune
+from src.storage.locks import atomic_write_text, dataset_lock
+
+# ============================================================ #
+# Background jobs (model retraining) run by a process pool     #
+# ============================================================ #
+
+# One state file (<job id>.json) and one log file (<job id>.log) per job.
+JOBS_DIR = BASE_DIR / "data" / "jobs"
+
+# Advisory lock serialising the submissions (one training per model family).
+JOBS_LOCK = "_jobs"
+
+# Model family -> training function(dataset, job, n_jobs, sample_rows).
+JOB_FUNCTIONS: dict[str, Callable[..., dict]] = {
+    "regression": retrain_regression,
+    "classification": retrain_classification,
+}
+
+# Full retraining from scratch, quick retraining on a stratified sample of the rows,
+# boosting continued on the new rows, hyperparameter search followed by a full
+# retraining of the best candidate, or training from scratch on several datasets
+# streamed from disk.
+MODES = ("full", "sample", "incremental", "tune", "external")
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+ACTIVE_STATES = {QUEUED, RUNNING}
+
+# One worker per model family: both families can train at the same time.
+MAX_WORKERS = len(JOB_FUNCTIONS)
+
+# Cores given to the trainings, shared evenly by the workers so that concurrent
+# trainings never use more threads than there are cores.
+TRAINING_THREADS = int(os.getenv("TRAINING_THREADS") or 0) or os.cpu_count() or 1
+THREADS_PER_JOB = max(1, TRAINING_THREADS // MAX_WORKERS)
+
+
+class JobConflictError(RuntimeError):
+    """A job of the same model family is already queued or running."""
+
+
+class Job:
+    """State of a job, persisted in its JSON file and updated by the worker."""
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.path = JOBS_DIR / f"{job_id}.json"
+        self.log_path = JOBS_DIR / f"{job_id}.log"
+
+    def read(self) -> dict[str, Any]:
+        """Current state of the job."""
+        return json.loads(self.path.read_text(encoding="utf-8"))
+
+    def update(self, **fields) -> dict[str, Any]:
+        """Update fields of the job state (atomic write)."""
+        state = self.read() | fields
+        atomic_write_text(self.path, json.dumps(state, ensure_ascii=False))
+        return state
+
+    def log(self, message: str) -> None:
+        """Append a line to the job log."""
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(f"[{time.strftime('%H:%M:%S')}] {message}\n")
+
+    def progress(self, fraction: float, message: str) -> None:
+        """Report the progress of the job (0 to 1) and its current step."""
+        self.update(progress=fraction, step=message)
+        self.log(message)
+
+    def read_log(self) -> str:
+        """Content of the job log."""
+        try:
+            return self.log_path.read_text(encoding="utf-8")
+        except OSError:
+            return ""
+
+
+def _run_job(job_id: str) -> None:
+    """Run a job in a worker process, its outcome is written in its state file."""
+    job = Job(job_id)
+    state = job.update(status=RUNNING, started_at=time.time(), pid=os.getpid())
+    job.log(f"Started {state['family']} training on {state['dataset']}")
+    try:
+        if state.get("mode") == "incremental":
+            result = continue_training(
+                state["family"], state["dataset"], job, n_jobs=state["n_jobs"]
+            )
+        elif state.get("mode") == "external":
+            result = train_external_memory(
+                state["family"], state["datasets"], job, n_jobs=state["n_jobs"]
+            )
+        elif state.get("mode") == "tune":
+            result = tune(
+                state["family"], state["dataset"], job, n_jobs=state["n_jobs"]
+            )
+        else:
+            result = JOB_FUNCTIONS[state["family"]](
+                state["dataset"],
+                job,
+                n_jobs=state["n_jobs"],
+                sample_rows=SAMPLE_ROWS if state.get("mode") == "sample" else None,
+            )
+    except Exception as e:
+        job.log(traceback.format_exc())
+        job.update(status=FAILED, finished_at=time.time(), error=str(e))
+        return
+    job.update(
+        status=SUCCEEDED,
+        finished_at=time.time(),
+        progress=1.0,
+        step="Done",
+        result=result,
+    )
+    job.log("Done")
+
+
+def _job_crashed(job_id: str, error: BaseException) -> None:
+    """Mark a job whose worker died as failed, the next job gets a new pool."""
+    global _executor
+    job = Job(job_id)
+    if job.read()["status"] in ACTIVE_STATES:
+        job.log(f"Worker error: {error!r}")
+        job.update(status=FAILED, finished_at=time.time(), error=repr(error))
+    with _executor_lock:
+        _executor = None
+
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Process pool shared by the sessions, created on the first submission."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers: no copy of the threads of the Streamlit server.
+            _executor = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _pid_alive(pid: int | None) -> bool:
+    """Whether a process is still running."""
+    if pid is None:
+        return False
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows: assumed alive.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def list_jobs(family: str | None = None, limit: int | None = None) -> list[dict]:
+    """States of the jobs, most recent first.
+
+    A job left running by a process that no longer exists (server restart) is
+    marked as failed.
+
+    Args:
+        family (str | None, optional): Only the jobs of a model family. Defaults to None.
+        limit (int | None, optional): Maximum number of jobs. Defaults to None.
+
+    Returns:
+        list[dict]: The job states (id, family, dataset, status, progress, step, result...).
+    """
+    if not JOBS_DIR.exists():
+        return []
+    jobs = []
+    for path in JOBS_DIR.glob("*.json"):
+        try:
+            state = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if family is None or state["family"] == family:
+            jobs.append(state)
+
+    jobs.sort(key=lambda s: s["created_at"], reverse=True)
+    for state in jobs[:limit]:
+        owner = state.get("pid") if state["status"] == RUNNING else state["owner_pid"]
+        if state["status"] in ACTIVE_STATES and not _pid_alive(owner):
+            state |= Job(state["id"]).update(
+                status=FAILED, finished_at=time.time(), error="Interrupted"
+            )
+    return jobs[:limit]
+
+
+def submit(
+    family: str, dataset: str, mode: str = "full", datasets: list[str] | None = None
+) -> str:
+    """Queue a training job, run in a worker process.
+
+    Args:
+        family (str): A key of JOB_FUNCTIONS.
+        dataset (str): The dataset to train on.
+        mode (str, optional): One of MODES. Defaults to "full".
+        datasets (list[str] | None, optional): Datasets of an "external" training.
+            Defaults to None (the dataset only).
+
+    Raises:
+        JobConflictError: If a job of the same family is already queued or running.
+
+    Returns:
+        str: The job id.
+    """
+    if family not in JOB_FUNCTIONS:
+        raise ValueError(f"Unknown model family: {family}")
+    if mode not in MODES:
+        raise ValueError(f"Unknown training mode: {mode}")
+
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    with dataset_lock(JOBS_LOCK):
+        active = [j for j in list_jobs(family) if j["status"] in ACTIVE_STATES]
+        if active:
+            raise JobConflictError(
+                f"A {family} training is already {active[0]['status']} "
+                f"(dataset {active[0]['dataset']})"
+            )
+
+        job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{family}-{uuid.uuid4().hex[:6]}"
+        state = {
+            "id": job_id,
+            "family": family,
+            "dataset": dataset,
+            "mode": mode,
+            "datasets": datasets or [dataset],
+            "status": QUEUED,
+            "progress": 0.0,
+            "step": "Queued",
+            "created_at": time.time(),
+            "n_jobs": THREADS_PER_JOB,
+            # Process owning the pool: a queued job dies with it.
+            "owner_pid": os.getpid(),
+        }
+        atomic_write_text(JOBS_DIR / f"{job_id}.json", json.dumps(state))
+
+    try:
+        future = _get_executor().submit(_run_job, job_id)
+    except Exception as e:
+        _job_crashed(job_id, e)
+        raise
+    future.add_done_callback(
+        lambda f: f.exception() is not None and _job_crashed(job_id, f.exception())
+    )
+    return job_id
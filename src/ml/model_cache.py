@@ -0,0 +1,119 @@
+import threading
+from pathlib import Path
+from typing import Any
+
+import joblib
+
+from src.ml.artefacts import export_pipeline, load_artefact
+from src.ml.onnx_backend import (
+    INFERENCE_BACKEND,
+    ONNX_AVAILABLE,
+    export_onnx,
+    load_onnx,
+)
+from src.storage.locks import publish, temp_path
+
+# ============================================================ #
+# Process-wide cache of the loaded models                      #
+# ============================================================ #
+
+
+class ModelCache:
+    """Cache of the unpickled model files, shared by every session of the process.
+
+    Entries are keyed on the file path (one per model version) and validated against
+    the file modification time and size: a model rewritten by a retraining is
+    reloaded on its next use, never served stale.
+    A pipeline exported as a light artefact (see src.ml.artefacts) is rebuilt from it
+    instead of being unpickled, or runs with onnxruntime from its ONNX export when
+    INFERENCE_BACKEND=onnx (see src.ml.onnx_backend).
+    The cached objects are shared, they must only be used for predictions: a model to
+    fit is loaded with joblib.load.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[Path, tuple[tuple[int, int], Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str | Path) -> Any:
+        """Get a model, loading it from its file when missing or modified.
+
+        Args:
+            path (str | Path): Path of the model file.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+
+        Returns:
+            Any: The loaded object.
+        """
+        path = Path(path).resolve()
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        # One model loaded at a time: concurrent sessions wait for the first load.
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            model = load_onnx(path) if INFERENCE_BACKEND == "onnx" else None
+            if model is None:
+                model = load_artefact(path)
+            if model is None:
+                model = joblib.load(path)
+            self._entries[path] = (signature, model)
+            return model
+
+    def invalidate(self, path: str | Path | None = None) -> None:
+        """Drop a model (or every model) from the cache."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(Path(path).resolve(), None)
+
+    def stats(self) -> dict:
+        """Number of cached models, hits and misses."""
+        with self._lock:
+            return {
+                "models": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+model_cache = ModelCache()
+
+
+def load_model(path: str | Path) -> Any:
+    """Load a model through the process-wide cache (for predictions only)."""
+    return model_cache.get(path)
+
+
+def save_model(model: Any, path: str | Path) -> None:
+    """Write a model file atomically, export its light artefact (and ONNX model when
+    onnx is installed) and drop its previous version from the cache.
+
+    Sessions keep reading the previous file until the new one is complete.
+    """
+    path = Path(path)
+    tmp_path = temp_path(path)
+    joblib.dump(model, tmp_path)
+    publish(tmp_path, path)
+    if hasattr(model, "steps"):
+        try:
+            export_pipeline(model, path)
+        except ValueError as e:
+            # The pickle file is used instead.
+            print(f"{path.name} not exported as a light artefact: {e}")
+        if ONNX_AVAILABLE:
+            try:
+                export_onnx(model, path)
+            except ValueError as e:
+                print(f"{path.name} not exported to ONNX: {e}")
+    model_cache.invalidate(path)
@@ -0,0 +1,398 @@
+"""
+ONNX export of the pipelines and onnxruntime inference backend (optional).
+
+The preprocessing and the XGBoost model of a pipeline are converted into a single
+ONNX graph, run on CPU by onnxruntime: a prediction skips the per-call overhead of
+scikit-learn and XGBoost. It needs the optional dependencies (uv sync --extra onnx)
+and is used by the app when INFERENCE_BACKEND=onnx.
+
+Usage: python -m src.ml.onnx_backend [--check] (exports the pipelines of the model
+registry, then checks that the predictions of the current ones match on the stored
+datasets)
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from src.ml import MODELS_DIR
+from src.ml.artefacts import artefact_dir, file_sha256, preprocessing_spec
+from src.storage.locks import publish, temp_path
+
+try:
+    import onnx
+    import onnxruntime as ort
+    from onnx import TensorProto, compose, helper
+    from onnxmltools.convert.xgboost.operator_converters.XGBoost import (
+        convert_xgboost,
+    )
+    from skl2onnx import convert_sklearn, update_registered_converter
+    from skl2onnx.common.data_types import (
+        DoubleTensorType,
+        FloatTensorType,
+        StringTensorType,
+    )
+    from skl2onnx.common.shape_calculator import (
+        calculate_linear_classifier_output_shapes,
+        calculate_linear_regressor_output_shapes,
+    )
+
+    update_registered_converter(
+        xgb.XGBRegressor,
+        "XGBoostXGBRegressor",
+        calculate_linear_regressor_output_shapes,
+        convert_xgboost,
+    )
+    update_registered_converter(
+        xgb.XGBClassifier,
+        "XGBoostXGBClassifier",
+        calculate_linear_classifier_output_shapes,
+        convert_xgboost,
+        options={"nocl": [True, False], "zipmap": [True, False, "columns"]},
+    )
+    ONNX_AVAILABLE = True
+except ImportError:  # Optional dependencies not installed
+    ONNX_AVAILABLE = False
+
+# ============================================================ #
+# Export and loading of the ONNX models                        #
+# ============================================================ #
+
+# "onnx" to predict with onnxruntime, "native" for the scikit-learn pipelines.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "native").lower()
+
+ONNX_FILE = "model.onnx"
+OPSETS = {"": 17, "ai.onnx.ml": 3}
+
+# Float32 sums of the trees differ in the last digits from XGBoost.
+COST_RTOL = 1e-5
+COST_ATOL = 0.01
+
+
+def onnx_path(path: str | Path) -> Path:
+    """ONNX file of a pickled pipeline, in the folder of its light artefact."""
+    return artefact_dir(path) / ONNX_FILE
+
+
+class OnnxPipeline:
+    """Predictor running an exported pipeline with onnxruntime, with the predict
+    method of the pipeline."""
+
+    def __init__(self, session: Any, spec: dict, task: str):
+        self.session = session
+        self.spec = spec
+        self.task = task
+        self.numeric = {
+            c
+            for step in spec["steps"]
+            if step["kind"] == "scale"
+            for c in step["columns"]
+        }
+        self.inputs = [i.name for i in session.get_inputs()]
+        # The ONNX encoder outputs zeros for an unknown category, the pipeline fails.
+        self.known = {
+            column: set(categories)
+            for step in spec["steps"]
+            if step["kind"] == "onehot" and step["handle_unknown"] == "error"
+            for column, categories in zip(step["columns"], step["categories"])
+        }
+
+    def _feeds(self, X: pd.DataFrame) -> dict[str, np.ndarray]:
+        """Input columns of the graph: doubles (scaled as by scikit-learn) and strings."""
+        feeds = {}
+        for c in self.inputs:
+            if c in self.numeric:
+                values = X[c].to_numpy(dtype="float64", na_value=np.nan)
+            else:
+                values = X[c].to_numpy(dtype=object, na_value="")
+                if c in self.known:
+                    unknown = [v for v in set(values) if v not in self.known[c]]
+                    if unknown:
+                        raise ValueError(
+                            f"Found unknown categories {unknown[:5]} in column {c}"
+                        )
+            feeds[c] = values.reshape(-1, 1)
+        return feeds
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        """Predictions of the pipeline: values, or encoded classes for a classifier."""
+        outputs = self.session.run(None, self._feeds(X))
+        if self.task == "regression":
+            return outputs[0].ravel()
+        return outputs[0]
+
+
+def _initial_types(spec: dict) -> list[tuple]:
+    """One graph input per column, the numerical ones as doubles.
+
+    The scaling is computed in double precision then cast, as scikit-learn does
+    before XGBoost: scaled in float32, values lying on a split threshold of the
+    trees would fall on the other side.
+    """
+    numeric = {
+        c for step in spec["steps"] if step["kind"] == "scale" for c in step["columns"]
+    }
+    return [
+        (c, (DoubleTensorType if c in numeric else StringTensorType)([None, 1]))
+        for c in spec["features"]
+    ]
+
+
+def to_onnx(pipeline: Any) -> tuple[Any, dict, str]:
+    """Convert a fitted pipeline into a single ONNX graph.
+
+    Raises:
+        ValueError: If the pipeline cannot be converted.
+
+    Returns:
+        tuple[Any, dict, str]: The ONNX model, the preprocessing spec and the task.
+    """
+    if not ONNX_AVAILABLE:
+        raise ValueError(
+            "onnx, onnxruntime, skl2onnx and onnxmltools are not installed"
+        )
+    preprocessor, model = pipeline[:-1], pipeline[-1]
+    if len(preprocessor) != 1:
+        raise ValueError(
+            "Unsupported pipeline: a single preprocessing step is expected"
+        )
+    if isinstance(model, xgb.XGBClassifier):
+        task = "classification"
+    elif isinstance(model, xgb.XGBRegressor):
+        task = "regression"
+    else:
+        raise ValueError(f"Unsupported model: {type(model).__name__}")
+    spec = preprocessing_spec(preprocessor[0])
+    if spec["sparse"]:
+        # Zeros of a sparse matrix are missing values for XGBoost, not for ONNX.
+        raise ValueError("Unsupported preprocessing: sparse output")
+
+    try:
+        graph_pre = convert_sklearn(
+            preprocessor[0], initial_types=_initial_types(spec), target_opset=OPSETS
+        )
+        n_features = len(preprocessor[0].get_feature_names_out())
+        graph_model = convert_sklearn(
+            model,
+            initial_types=[("features", FloatTensorType([None, n_features]))],
+            target_opset=OPSETS,
+            options={"zipmap": False} if task == "classification" else None,
+        )
+    except Exception as e:
+        raise ValueError(f"ONNX conversion failed: {e}") from e
+
+    # Preprocessing output cast to float32 and fed to the trees.
+    graph_pre.graph.node.append(
+        helper.make_node(
+            "Cast", [graph_pre.graph.output[0].name], ["features"], to=TensorProto.FLOAT
+        )
+    )
+    del graph_pre.graph.output[:]
+    graph_pre.graph.output.append(
+        helper.make_tensor_value_info("features", TensorProto.FLOAT, [None, n_features])
+    )
+    graph_model = compose.add_prefix(graph_model, "model_")
+    # The converters pick the lowest opsets their operators need, the same ones are
+    # required to merge the graphs.
+    for graph in (graph_pre, graph_model):
+        del graph.opset_import[:]
+        graph.opset_import.extend(
+            helper.make_opsetid(domain, version) for domain, version in OPSETS.items()
+        )
+    merged = compose.merge_models(
+        graph_pre, graph_model, io_map=[("features", "model_features")]
+    )
+    onnx.checker.check_model(merged)
+    return merged, spec, task
+
+
+def export_onnx(pipeline: Any, path: str | Path) -> Path:
+    """Export a fitted pipeline as an ONNX file, in the folder of its light artefact.
+
+    The pickle file it comes from is recorded in the metadata of the ONNX model.
+
+    Args:
+        pipeline (Any): The fitted pipeline (ColumnTransformer, then an XGBoost model).
+        path (str | Path): The pickle file of the pipeline.
+
+    Raises:
+        ValueError: If the pipeline cannot be exported.
+
+    Returns:
+        Path: The ONNX file.
+    """
+    path = Path(path)
+    model, spec, task = to_onnx(pipeline)
+    onnx.helper.set_model_props(
+        model,
+        {
+            "source_file": path.name,
+            "source_sha256": file_sha256(path),
+            "task": task,
+            "preprocessing": json.dumps(spec, ensure_ascii=False),
+        },
+    )
+
+    target = onnx_path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temp_path(target)
+    tmp_path.write_bytes(model.SerializeToString())
+    publish(tmp_path, target)
+    return target
+
+
+def load_onnx(path: str | Path) -> OnnxPipeline | None:
+    """Load the ONNX export of a pickled pipeline in an onnxruntime CPU session.
+
+    Args:
+        path (str | Path): The pickle file of the pipeline.
+
+    Returns:
+        OnnxPipeline | None: The predictor, None when onnxruntime is not installed,
+            when there is no export or when it was exported from another version of
+            the pickle file.
+    """
+    if not ONNX_AVAILABLE or not onnx_path(path).exists():
+        return None
+    try:
+        session = ort.InferenceSession(
+            str(onnx_path(path)), providers=["CPUExecutionProvider"]
+        )
+    except Exception:
+        # Missing, or replaced by a newer export in the meantime.
+        return None
+    metadata = session.get_modelmeta().custom_metadata_map
+    if metadata.get("source_sha256") != file_sha256(Path(path)):
+        return None
+    return OnnxPipeline(
+        session, json.loads(metadata["preprocessing"]), metadata["task"]
+    )
+
+
+def export_models(models_dir: Path = MODELS_DIR) -> list[Path]:
+    """Export every registered pipeline that can be exported."""
+    # The registry saves its models through this module: imported when used.
+    from src.ml.registry import model_files
+
+    files = []
+    for path in model_files(models_dir):
+        try:
+            files.append(export_onnx(joblib.load(path), path))
+        except ValueError as e:
+            print(f"{path.name} not exported to ONNX: {e}")
+    return files
+
+
+# ============================================================ #
+# Parity of the ONNX models with the native pipelines          #
+# ============================================================ #
+
+
+def _latency_ms(predict: Any, X: pd.DataFrame, n: int) -> float:
+    """Median wall time of a single-row prediction (milliseconds)."""
+    times = []
+    for i in range(min(n, len(X))):
+        row = X.iloc[[i]]
+        start = time.perf_counter()
+        predict(row)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000) if times else float("nan")
+
+
+def check_parity(
+    datasets: list[str] | None = None,
+    models_dir: Path = MODELS_DIR,
+    latency_rows: int = 100,
+) -> list[dict]:
+    """Compare the predictions of the ONNX models with the native pipelines.
+
+    The current version of each model family predicts every row of the stored
+    datasets it can score (rows with unknown categories are skipped, as the native
+    pipelines reject them): classes must be identical, costs equal up to COST_RTOL
+    and COST_ATOL.
+
+    Args:
+        datasets (list[str] | None, optional): The datasets. Defaults to None (all).
+        models_dir (Path, optional): Folder of the model files. Defaults to MODELS_DIR.
+        latency_rows (int, optional): Single-row predictions timed. Defaults to 100.
+
+    Returns:
+        list[dict]: One report per pipeline and dataset: rows compared, mismatches,
+            largest difference, single-row latency of both backends and verdict.
+    """
+    from src.ml.registry import MODEL_FILES, current_version, model_path
+    from src.storage import read_catalog
+    from src.storage.arrow_mmap import load_dataset
+
+    datasets = list(read_catalog()) if datasets is None else datasets
+    reports = []
+    for family in MODEL_FILES:
+        version = current_version(family, models_dir)
+        path = model_path(family, version, models_dir)
+        onnx_model = load_onnx(path)
+        if onnx_model is None:
+            print(f"{family} {version}: no up-to-date ONNX export, skipped")
+            continue
+        pipeline = joblib.load(path)
+        features = onnx_model.spec["features"]
+
+        for dataset in datasets:
+            X = load_dataset(dataset, columns=features)
+            for step in onnx_model.spec["steps"]:
+                if step["kind"] == "onehot":
+                    for column, categories in zip(step["columns"], step["categories"]):
+                        X = X[X[column].isin(categories)]
+            if X.empty:
+                continue
+
+            expected, predicted = pipeline.predict(X), onnx_model.predict(X)
+            if onnx_model.task == "regression":
+                mismatches = ~np.isclose(
+                    predicted, expected, rtol=COST_RTOL, atol=COST_ATOL
+                )
+                max_diff = float(np.abs(predicted - expected).max())
+            else:
+                mismatches = predicted != expected
+                max_diff = None
+            reports.append(
+                {
+                    "model": f"{family} {version}",
+                    "dataset": dataset,
+                    "rows": len(X),
+                    "mismatches": int(mismatches.sum()),
+                    "max_abs_diff": max_diff,
+                    "native_ms": _latency_ms(pipeline.predict, X, latency_rows),
+                    "onnx_ms": _latency_ms(onnx_model.predict, X, latency_rows),
+                    "ok": not mismatches.any(),
+                }
+            )
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="compare the ONNX and native predictions on the stored datasets",
+    )
+    args = parser.parse_args()
+
+    files = export_models()
+    print(
+        f"{len(files)} model(s) exported to ONNX: "
+        f"{', '.join(str(f.parent.relative_to(MODELS_DIR)) for f in files) or '-'}"
+    )
+    if args.check:
+        reports = check_parity()
+        print(pd.DataFrame(reports).to_string(index=False))
+        if not all(r["ok"] for r in reports):
+            raise SystemExit("❌ The ONNX predictions differ from the native pipelines")
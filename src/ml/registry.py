@@ -0,0 +1,445 @@
+"""
+Versioned registry of the trained models.
+
+Every training registers a new version of its model family in its own folder
+(MLmodels/registry/<family>/v0001, v0002...): the pipeline, the label encoder of
+its classes for the classification, and a manifest describing the training data,
+the metrics, the features and the files. A version is complete once its folder is
+renamed into place and is never modified afterwards.
+The version served to the users is the "current" one of each family: a pointer file
+rewritten atomically on promotion, cheap to poll (see current_version).
+The original models of the MLmodels folder are registered as the first versions.
+
+Usage: python -m src.ml.registry [promote <family> <version>] (lists the versions)
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import pickle
+import re
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any
+
+import joblib
+
+from src.ml import MODELS_DIR
+from src.ml.artefacts import file_sha256
+from src.ml.model_cache import load_model, save_model
+from src.storage.locks import atomic_write_text, dataset_lock, fsync_dir
+
+# ============================================================ #
+# Versions of the models and promotion                         #
+# ============================================================ #
+
+REGRESSION_FILE = "pipeline_best_regression.pkl"
+CLASSIFICATION_FILE = "pipeline_xgboost_classification.pkl"
+LABEL_ENCODER_FILE = "label_encoder_target.pkl"
+MODEL_FILES = {"regression": REGRESSION_FILE, "classification": CLASSIFICATION_FILE}
+
+# Files of a version folder, and pointer to the current version of a family.
+MODEL_FILE = "model.pkl"
+ENCODER_FILE = "label_encoder.pkl"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "current.json"
+
+# Registrations and promotions run one at a time, across processes.
+REGISTRY_LOCK = "_registry"
+
+# Model versions offered to the users.
+CURRENT_MODELS = "Current models"
+LATEST_MODELS = "Latest models"
+ORIGINAL_MODELS = "Original models"
+
+
+def registry_dir(models_dir: Path = MODELS_DIR) -> Path:
+    """Folder of the model registry."""
+    return models_dir / "registry"
+
+
+def family_dir(family: str, models_dir: Path = MODELS_DIR) -> Path:
+    """Folder of the versions of a model family."""
+    if family not in MODEL_FILES:
+        raise ValueError(f"Unknown model family: {family}")
+    return registry_dir(models_dir) / family
+
+
+def model_path(family: str, version: str, models_dir: Path = MODELS_DIR) -> Path:
+    """Pickle file of the pipeline of a version."""
+    return family_dir(family, models_dir) / version / MODEL_FILE
+
+
+def encoder_path(family: str, version: str, models_dir: Path = MODELS_DIR) -> Path:
+    """Label encoder decoding the predictions of a version (classification)."""
+    return family_dir(family, models_dir) / version / ENCODER_FILE
+
+
+def feature_lists(family: str, models_dir: Path = MODELS_DIR) -> dict:
+    """Quantitative and qualitative features and target of a model family."""
+    with open(models_dir / f"features_target_columns_{family}.pkl", "rb") as f:
+        return pickle.load(f)
+
+
+def list_versions(family: str, models_dir: Path = MODELS_DIR) -> list[str]:
+    """Complete versions of a model family, oldest first."""
+    try:
+        folders = [p for p in family_dir(family, models_dir).iterdir() if p.is_dir()]
+    except FileNotFoundError:
+        return []
+    return sorted(
+        (p.name for p in folders if re.fullmatch(r"v\d+", p.name)),
+        key=lambda name: int(name[1:]),
+    )
+
+
+def read_manifest(family: str, version: str, models_dir: Path = MODELS_DIR) -> dict:
+    """Manifest of a version.
+
+    Raises:
+        ValueError: If the version does not exist.
+    """
+    if not re.fullmatch(r"v\d+", version):
+        raise ValueError(f"Invalid model version: {version}")
+    try:
+        manifest = json.loads(
+            (family_dir(family, models_dir) / version / MANIFEST_FILE).read_text(
+                encoding="utf-8"
+            )
+        )
+    except FileNotFoundError:
+        raise ValueError(f"Unknown {family} model version: {version}") from None
+    return {"version": version, **manifest}
+
+
+# Pointer files already read -> (file signature, content).
+_pointers: dict[Path, tuple[tuple[int, int, int], dict]] = {}
+_pointers_lock = threading.Lock()
+
+
+def _read_pointer(path: Path) -> dict | None:
+    """Content of a pointer file, read again only when the file was replaced."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _pointers_lock:
+        entry = _pointers.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+    pointer = json.loads(path.read_text(encoding="utf-8"))
+    with _pointers_lock:
+        _pointers[path] = (signature, pointer)
+    return pointer
+
+
+def current_version(family: str, models_dir: Path = MODELS_DIR) -> str:
+    """Current version of a model family.
+
+    A single stat of the pointer file while it is unchanged: consumers call it before
+    each prediction to pick up a promotion. The original models are registered on
+    the first call.
+    """
+    path = family_dir(family, models_dir) / CURRENT_FILE
+    pointer = _read_pointer(path)
+    if pointer is None:
+        with dataset_lock(REGISTRY_LOCK):
+            _bootstrap(family, models_dir)
+        pointer = _read_pointer(path)
+    return pointer["version"]
+
+
+def current_versions(models_dir: Path = MODELS_DIR) -> dict[str, str]:
+    """Current version of every model family, to poll the promotions."""
+    return {family: current_version(family, models_dir) for family in MODEL_FILES}
+
+
+def _stage(
+    family: str,
+    pipeline: Any,
+    training: dict,
+    metrics: dict | None,
+    label_encoder: Any,
+    parent: str | None,
+    models_dir: Path,
+) -> Path:
+    """Write a version in a temporary folder of the family: files, then manifest."""
+    root = family_dir(family, models_dir)
+    staging = root / f".staging-{uuid.uuid4().hex[:8]}"
+    staging.mkdir(parents=True)
+    try:
+        save_model(pipeline, staging / MODEL_FILE)
+        if label_encoder is not None:
+            joblib.dump(label_encoder, staging / ENCODER_FILE)
+
+        info = feature_lists(family, models_dir)
+        manifest = {
+            "family": family,
+            "created_at": dt.datetime.now().isoformat(timespec="seconds"),
+            "parent": parent,
+            "training": training,
+            "metrics": metrics,
+            "features": {
+                "quantitative": info["quantitative_features"],
+                "qualitative": info["qualitative_features"],
+                "target": info["target"],
+            },
+            "classes": (
+                None
+                if label_encoder is None
+                else [str(c) for c in label_encoder.classes_]
+            ),
+            "model": {
+                "file": MODEL_FILE,
+                "sha256": file_sha256(staging / MODEL_FILE),
+                "size_bytes": (staging / MODEL_FILE).stat().st_size,
+            },
+            # With the light artefact and the ONNX export.
+            "size_bytes": sum(
+                p.stat().st_size for p in staging.rglob("*") if p.is_file()
+            ),
+        }
+        atomic_write_text(
+            staging / MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False)
+        )
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return staging
+
+
+def _publish(family: str, staging: Path, models_dir: Path) -> str:
+    """Rename a staged version to the next version number (registry lock held)."""
+    versions = list_versions(family, models_dir)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+    os.rename(staging, family_dir(family, models_dir) / version)
+    fsync_dir(family_dir(family, models_dir))
+    return version
+
+
+def _promote(family: str, version: str, models_dir: Path) -> None:
+    """Point the current version of a family to a version (registry lock held)."""
+    read_manifest(family, version, models_dir)
+    if not model_path(family, version, models_dir).exists():
+        raise ValueError(f"The {family} model version {version} has no model file")
+    path = family_dir(family, models_dir) / CURRENT_FILE
+    previous = _read_pointer(path)
+    atomic_write_text(
+        path,
+        json.dumps(
+            {
+                "version": version,
+                "previous": previous["version"] if previous else None,
+                "promoted_at": dt.datetime.now().isoformat(timespec="seconds"),
+            }
+        ),
+    )
+
+
+def _bootstrap(family: str, models_dir: Path) -> None:
+    """Register the original model of a family as its first version and promote it
+    (registry lock held). A model retrained before the registry existed is kept as
+    the second version."""
+    if _read_pointer(family_dir(family, models_dir) / CURRENT_FILE) is not None:
+        return
+    label_encoder = (
+        joblib.load(models_dir / LABEL_ENCODER_FILE)
+        if family == "classification"
+        else None
+    )
+    if not list_versions(family, models_dir):
+        staging = _stage(
+            family,
+            joblib.load(models_dir / MODEL_FILES[family]),
+            {"mode": "original"},
+            None,
+            label_encoder,
+            None,
+            models_dir,
+        )
+        _publish(family, staging, models_dir)
+
+        legacy = models_dir / MODEL_FILES[family].replace(".pkl", "_retrained.pkl")
+        if legacy.exists():
+            try:
+                training = json.loads(
+                    legacy.with_suffix(".json").read_text(encoding="utf-8")
+                )
+            except (OSError, ValueError):
+                training = {"mode": "full"}
+            staging = _stage(
+                family,
+                joblib.load(legacy),
+                training,
+                None,
+                label_encoder,
+                "v0001",
+                models_dir,
+            )
+            _publish(family, staging, models_dir)
+    _promote(family, list_versions(family, models_dir)[0], models_dir)
+
+
+def register_model(
+    family: str,
+    pipeline: Any,
+    training: dict,
+    metrics: dict | None = None,
+    label_encoder: Any = None,
+    parent: str | None = None,
+    models_dir: Path = MODELS_DIR,
+) -> str:
+    """Register a trained pipeline as a new version of its family (not promoted).
+
+    The version is written in a temporary folder then renamed into place: readers
+    never see a partial version.
+
+    Args:
+        family (str): "regression" or "classification".
+        pipeline (Any): The fitted pipeline.
+        training (dict): The data it was trained on (mode, dataset, rows...).
+        metrics (dict | None, optional): Its metrics. Defaults to None.
+        label_encoder (Any, optional): Encoder of the classes it predicts
+            (classification). Defaults to None.
+        parent (str | None, optional): The version it started from. Defaults to None.
+        models_dir (Path, optional): Folder of the model files. Defaults to MODELS_DIR.
+
+    Returns:
+        str: The new version.
+    """
+    if family == "classification" and label_encoder is None:
+        raise ValueError("A classification model is registered with its label encoder")
+    current_version(family, models_dir)
+    staging = _stage(
+        family, pipeline, training, metrics, label_encoder, parent, models_dir
+    )
+    try:
+        with dataset_lock(REGISTRY_LOCK):
+            return _publish(family, staging, models_dir)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def promote(family: str, version: str, models_dir: Path = MODELS_DIR) -> None:
+    """Make a version the current one of its family (or roll back to an older one).
+
+    Raises:
+        ValueError: If the version does not exist.
+    """
+    current_version(family, models_dir)
+    with dataset_lock(REGISTRY_LOCK):
+        _promote(family, version, models_dir)
+
+
+def model_files(models_dir: Path = MODELS_DIR) -> list[Path]:
+    """Pipeline files of every registered version."""
+    return [
+        model_path(family, version, models_dir)
+        for family in MODEL_FILES
+        for version in list_versions(family, models_dir)
+    ]
+
+
+# ============================================================ #
+# Models offered to the users                                  #
+# ============================================================ #
+
+
+def model_versions(models_dir: Path = MODELS_DIR) -> dict[str, dict[str, str]]:
+    """Model versions offered -> version of each family.
+
+    The current models, the latest ones when they are not promoted yet, and the
+    original ones when they are no longer current.
+    """
+    current = current_versions(models_dir)
+    offered = {CURRENT_MODELS: current}
+    latest = {f: list_versions(f, models_dir)[-1] for f in MODEL_FILES}
+    if latest != current:
+        offered[LATEST_MODELS] = latest
+    original = {f: list_versions(f, models_dir)[0] for f in MODEL_FILES}
+    if original not in offered.values():
+        offered[ORIGINAL_MODELS] = original
+    return offered
+
+
+def available_model_versions(models_dir: Path = MODELS_DIR) -> list[str]:
+    """Model versions offered to the users, the current models first."""
+    return list(model_versions(models_dir))
+
+
+def load_models(
+    choice: str = CURRENT_MODELS, models_dir: Path = MODELS_DIR
+) -> tuple[Any, Any, Any]:
+    """Regression and classification pipelines of a model version, and the label encoder.
+
+    Args:
+        choice (str, optional): A key of model_versions. Defaults to CURRENT_MODELS.
+        models_dir (Path, optional): Folder of the model files. Defaults to MODELS_DIR.
+
+    Returns:
+        tuple[Any, Any, Any]: The cached regression pipeline, classification pipeline
+            and label encoder of the classification.
+    """
+    versions = (
+        current_versions(models_dir)
+        if choice == CURRENT_MODELS
+        else model_versions(models_dir)[choice]
+    )
+    return (
+        load_model(model_path("regression", versions["regression"], models_dir)),
+        load_model(
+            model_path("classification", versions["classification"], models_dir)
+        ),
+        load_model(
+            encoder_path("classification", versions["classification"], models_dir)
+        ),
+    )
+
+
+def warm_models(models_dir: Path = MODELS_DIR) -> None:
+    """Load the current models in the cache, so the first prediction does not wait for them."""
+    try:
+        load_models(CURRENT_MODELS, models_dir)
+    except Exception as e:
+        print(f"Unable to load the current models: {e}")
+
+
+_warm_started = False
+
+
+def warm_models_in_background() -> None:
+    """Start warm_models in a background thread, once per process."""
+    global _warm_started
+    if _warm_started:
+        return
+    _warm_started = True
+    threading.Thread(target=warm_models, daemon=True, name="warm-models").start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    subparsers = parser.add_subparsers(dest="command")
+    promote_parser = subparsers.add_parser("promote", help="promote a version")
+    promote_parser.add_argument("family", choices=list(MODEL_FILES))
+    promote_parser.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "promote":
+        promote(args.family, args.version)
+    for family in MODEL_FILES:
+        current = current_version(family)
+        print(f"{family}:")
+        for version in list_versions(family):
+            manifest = read_manifest(family, version)
+            training = manifest["training"]
+            print(
+                f"  {'*' if version == current else ' '} {version}  "
+                f"{manifest['created_at']}  {training.get('mode')}  "
+                f"{training.get('dataset') or '-'}  {training.get('rows') or '-'} rows  "
+                f"{manifest['metrics'] or '-'}"
+            )
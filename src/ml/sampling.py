@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# ============================================================ #
+# Stratified samples and confidence intervals of the metrics   #
+# ============================================================ #
+
+# Columns whose combinations are kept in the same proportions in the samples.
+STRATA = ["etiquette_dpe", "zone_climatique", "type_batiment"]
+
+# Training rows of a quick ("sample") retraining.
+SAMPLE_ROWS = int(os.getenv("SAMPLE_ROWS") or 50_000)
+
+# Rows on which the models are compared: bounds the prediction time of the metrics.
+EVAL_ROWS = int(os.getenv("EVAL_ROWS") or 20_000)
+
+# Bootstrap resamples of the evaluation rows and level of the confidence intervals.
+N_RESAMPLES = 200
+CONFIDENCE = 0.95
+
+
+def stratified_order(keys: np.ndarray, seed: int = 42) -> np.ndarray:
+    """Random order of the rows, each stratum spread evenly.
+
+    The first rows of the order, however many, keep the proportions of the strata.
+
+    Args:
+        keys (np.ndarray): Stratum of each row.
+        seed (int, optional): Seed of the random order. Defaults to 42.
+
+    Returns:
+        np.ndarray: Positions of the rows.
+    """
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(keys))
+    labels = pd.Series(np.asarray(keys)[order])
+    rank = labels.groupby(labels).cumcount().to_numpy()
+    size = labels.map(labels.value_counts()).to_numpy()
+    return order[np.argsort((rank + 0.5) / size, kind="stable")]
+
+
+def strata_keys(df: pd.DataFrame, strata: list[str] = STRATA) -> np.ndarray:
+    """Stratum of each row: its combination of the strata columns (missing values included)."""
+    columns = [c for c in strata if c in df.columns]
+    if not columns:
+        return np.zeros(len(df), dtype=int)
+    return (
+        df.groupby(columns, dropna=False, observed=True, sort=False).ngroup().to_numpy()
+    )
+
+
+def sample_split(
+    df: pd.DataFrame,
+    train_rows: int | None = None,
+    eval_rows: int = EVAL_ROWS,
+    strata: list[str] = STRATA,
+    seed: int = 42,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Stratified training and evaluation rows of a dataset.
+
+    Args:
+        df (pd.DataFrame): The rows, with the strata columns.
+        train_rows (int | None, optional): Training rows, a stratified sample. Defaults
+            to None (all the rows but the evaluation ones).
+        eval_rows (int, optional): Evaluation rows, never trained on and at most a
+            fifth of the dataset. Defaults to EVAL_ROWS.
+        strata (list[str], optional): The strata columns. Defaults to STRATA.
+        seed (int, optional): Seed of the sampling. Defaults to 42.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The training and evaluation rows.
+    """
+    order = stratified_order(strata_keys(df, strata), seed)
+    eval_rows = min(eval_rows, len(df) // 5)
+    train = order[eval_rows:] if train_rows is None else order[eval_rows:][:train_rows]
+    return df.iloc[np.sort(train)], df.iloc[np.sort(order[:eval_rows])]
+
+
+def metric_intervals(
+    family: str,
+    y_true,
+    y_pred,
+    n_resamples: int = N_RESAMPLES,
+    confidence: float = CONFIDENCE,
+    seed: int = 42,
+) -> dict[str, list[float]]:
+    """Bootstrap confidence intervals of the metrics of a model family.
+
+    Args:
+        family (str): "regression" (R2 and RMSE) or "classification" (accuracy).
+        y_true: True values.
+        y_pred: Predicted values.
+        n_resamples (int, optional): Bootstrap resamples. Defaults to N_RESAMPLES.
+        confidence (float, optional): Level of the intervals. Defaults to CONFIDENCE.
+        seed (int, optional): Seed of the resamples. Defaults to 42.
+
+    Returns:
+        dict[str, list[float]]: Lower and upper bound of each metric.
+    """
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    n = len(y_true)
+    if n < 2:
+        return {}
+    rng = np.random.default_rng(seed)
+    resamples = rng.integers(0, n, size=(n_resamples, n))
+
+    if family == "regression":
+        y_true = y_true.astype("float64")
+        sse = ((y_true - y_pred.astype("float64")) ** 2)[resamples].sum(axis=1)
+        y_resampled = y_true[resamples]
+        sst = ((y_resampled - y_resampled.mean(axis=1, keepdims=True)) ** 2).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stats = {"R2": 1 - sse / sst, "RMSE": np.sqrt(sse / n)}
+    else:
+        stats = {"Accuracy": (y_true == y_pred)[resamples].mean(axis=1)}
+
+    alpha = (1 - confidence) / 2
+    return {
+        name: [
+            float(np.nanquantile(values, alpha)),
+            float(np.nanquantile(values, 1 - alpha)),
+        ]
+        for name, values in stats.items()
+    }
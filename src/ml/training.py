@@ -0,0 +1,520 @@
+import datetime as dt
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+from threadpoolctl import threadpool_limits
+
+from src.ml import MODELS_DIR
+from src.ml.registry import (
+    current_version,
+    encoder_path,
+    feature_lists,
+    model_path,
+    read_manifest,
+    register_model,
+)
+from src.ml.sampling import EVAL_ROWS, STRATA, metric_intervals, sample_split
+from src.storage import dataset_info
+from src.storage.arrow_mmap import load_dataset
+
+# ============================================================ #
+# Retraining of the regression and classification models      #
+# ============================================================ #
+
+# Reception date of the DPE: rows received after the last training are new rows.
+DATE_COLUMN = "date_reception_dpe"
+
+# Incremental training: boosting rounds added to the current booster, share of the
+# new rows kept aside to measure the update, minimum number of new rows.
+INCREMENTAL_ROUNDS = 50
+HOLDOUT_FRACTION = 0.2
+MIN_INCREMENTAL_ROWS = 200
+
+
+def rmse_score(y_true, y_pred) -> float:
+    """Compute RMSE safely (compatible with older sklearn versions)."""
+    try:
+        return mean_squared_error(y_true, y_pred, squared=False)
+    except TypeError:
+        return np.sqrt(mean_squared_error(y_true, y_pred))
+
+
+@contextmanager
+def thread_budget(pipeline: Any, n_jobs: int | None) -> Iterator[None]:
+    """Use at most n_jobs threads: those of the model and the native pools (BLAS, OpenMP).
+
+    The model keeps its own n_jobs once the block exits, so the saved file does not
+    depend on the budget of the training.
+    """
+    if n_jobs is None:
+        yield
+        return
+    model = pipeline[-1] if hasattr(pipeline, "steps") else pipeline
+    previous = model.get_params().get("n_jobs", "unset")
+    if previous != "unset":
+        model.set_params(n_jobs=n_jobs)
+    try:
+        with threadpool_limits(limits=n_jobs):
+            yield
+    finally:
+        if previous != "unset":
+            model.set_params(n_jobs=previous)
+
+
+def current_model(family: str, models_dir: Path = MODELS_DIR) -> tuple[str, Any, Any]:
+    """Current version of a model family, loaded to be fitted.
+
+    Returns:
+        tuple[str, Any, Any]: The version, its pipeline and the label encoder of its
+            classes (None for the regression).
+    """
+    version = current_version(family, models_dir)
+    pipeline = joblib.load(model_path(family, version, models_dir))
+    label_encoder = (
+        joblib.load(encoder_path(family, version, models_dir))
+        if family == "classification"
+        else None
+    )
+    return version, pipeline, label_encoder
+
+
+def read_training_info(family: str, models_dir: Path = MODELS_DIR) -> dict:
+    """Data the current model of a family was trained on (dataset, rows, last
+    reception date), only the mode for the original models."""
+    version = current_version(family, models_dir)
+    return read_manifest(family, version, models_dir)["training"]
+
+
+def last_reception(df: pd.DataFrame) -> str | None:
+    """Last reception date (ISO) of the rows, None if unknown."""
+    if DATE_COLUMN not in df.columns or df[DATE_COLUMN].isna().all():
+        return None
+    return df[DATE_COLUMN].max().date().isoformat()
+
+
+def training_info(
+    dataset: str,
+    rows: int,
+    last_date: str | None,
+    mode: str,
+    previous: dict | None = None,
+) -> dict:
+    """Description of the data a model has just been trained on, for its manifest.
+
+    Args:
+        dataset (str): The dataset name.
+        rows (int): Rows seen by the training.
+        last_date (str | None): Last reception date of the rows.
+        mode (str): The training mode (see src.ml.jobs.MODES).
+        previous (dict | None, optional): Training info of the model it continues
+            (incremental mode). Defaults to None.
+
+    Returns:
+        dict: Dataset and its version, mode, rows, last reception date and time.
+    """
+    # A training from scratch restarts the history, an incremental one extends it.
+    dates = [last_date]
+    if mode == "incremental" and previous:
+        dates.append(previous.get("trained_until"))
+    return {
+        "dataset": dataset,
+        "dataset_version": (dataset_info(dataset) or {}).get("version"),
+        "mode": mode,
+        "rows": rows,
+        "trained_until": max((d for d in dates if d), default=None),
+        "trained_at": dt.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def evaluate(family: str, y_true, y_pred) -> dict[str, float]:
+    """Metrics of a model family: R2 and RMSE for the regression, accuracy otherwise."""
+    if family == "regression":
+        return {"R2": r2_score(y_true, y_pred), "RMSE": rmse_score(y_true, y_pred)}
+    return {"Accuracy": accuracy_score(y_true, y_pred)}
+
+
+def features_target(
+    family: str, models_dir: Path = MODELS_DIR
+) -> tuple[list[str], str]:
+    """Features and target of a model family ("regression" or "classification")."""
+    info = feature_lists(family, models_dir)
+    return info["quantitative_features"] + info["qualitative_features"], info["target"]
+
+
+def load_split(
+    dataset: str,
+    columns: list[str],
+    job: Any,
+    sample_rows: int | None = None,
+    eval_rows: int = EVAL_ROWS,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Load a dataset and draw its stratified training and held-out evaluation rows.
+
+    Args:
+        dataset (str): The dataset name.
+        columns (list[str]): Columns to load, the strata (STRATA) are added.
+        job (Any): The running job, to log the sizes.
+        sample_rows (int | None, optional): Training rows of a quick run. Defaults to
+            None (all the rows but the evaluation ones).
+        eval_rows (int, optional): Evaluation rows. Defaults to EVAL_ROWS.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: All the rows, the training
+            rows and the evaluation rows.
+    """
+    df = load_dataset(dataset, columns=list(dict.fromkeys(columns + STRATA)))
+    train, holdout = sample_split(df, sample_rows, eval_rows)
+    job.log(
+        f"{len(df):,} rows loaded: {len(train):,} for training"
+        + (" (stratified sample)" if sample_rows is not None else "")
+        + f", {len(holdout):,} held out for evaluation"
+    )
+    return df, train, holdout
+
+
+def retrain_regression(
+    dataset: str,
+    job: Any,
+    n_jobs: int | None = None,
+    sample_rows: int | None = None,
+    models_dir: Path = MODELS_DIR,
+) -> dict:
+    """Retrain the cost regression pipeline on a stored dataset.
+
+    The current model is the starting point (hyperparameters) and the reference
+    (metrics); the retrained one is registered as a new version, not promoted. Both
+    are measured on at most EVAL_ROWS stratified rows held out of the training, with
+    bootstrap confidence intervals. A full retraining then fits the model again on
+    all the rows, the held-out ones included, for the registered version.
+
+    Args:
+        dataset (str): The dataset name.
+        job (Any): The running job (progress and log methods), see src.ml.jobs.
+        n_jobs (int | None, optional): Threads of the training. Defaults to None (the model setting).
+        sample_rows (int | None, optional): Train on a stratified sample of this many
+            rows (quick run), registered as measured. Defaults to None (all the rows).
+        models_dir (Path, optional): Folder of the model files. Defaults to MODELS_DIR.
+
+    Returns:
+        dict: Registered version, metrics of the current and retrained models on the
+            evaluation rows and their confidence intervals, wall time of each step
+            (timings) and in total (duration_s).
+    """
+    start = time.time()
+    timings = {}
+    features, target = features_target("regression", models_dir)
+
+    job.progress(0.05, f"Loading dataset {dataset}")
+    df, train, holdout = load_split(
+        dataset, features + [target, DATE_COLUMN], job, sample_rows
+    )
+    X, y = train[features], train[target]
+    X_eval, y_eval = holdout[features], holdout[target]
+    job.log(f"{n_jobs or 'default'} thread(s)")
+    timings["load_s"] = time.time() - start
+
+    # Evaluate current model on new data
+    job.progress(0.15, "Evaluating the current model")
+    step = time.time()
+    base, pipeline_original, _ = current_model("regression", models_dir)
+    try:
+        with thread_budget(pipeline_original, n_jobs):
+            y_pred = pipeline_original.predict(X_eval)
+        metrics_original = evaluate("regression", y_eval, y_pred)
+        intervals_original = metric_intervals("regression", y_eval, y_pred)
+    except Exception as e:
+        job.log(f"Could not evaluate the current regression model {base}: {e}")
+        metrics_original = {"R2": None, "RMSE": None}
+        intervals_original = {}
+    timings["evaluate_original_s"] = time.time() - step
+
+    # Retrain the model directly (DataCleaner already handles unseen categories)
+    job.progress(0.3, "Training the regression model")
+    pipeline = joblib.load(model_path("regression", base, models_dir))
+    with thread_budget(pipeline, n_jobs):
+        step = time.time()
+        pipeline.fit(X, y)
+        timings["fit_s"] = time.time() - step
+
+        job.progress(0.75, "Evaluating the retrained model on the held-out rows")
+        step = time.time()
+        y_pred = pipeline.predict(X_eval)
+        timings["evaluate_s"] = time.time() - step
+    metrics_retrained = evaluate("regression", y_eval, y_pred)
+    intervals_retrained = metric_intervals("regression", y_eval, y_pred)
+
+    mode = "full" if sample_rows is None else "sample"
+    if mode == "full":
+        # The version served to the users is trained on all the rows.
+        job.progress(0.9, "Training the regression model on all the rows")
+        train = df
+        with thread_budget(pipeline, n_jobs):
+            step = time.time()
+            pipeline.fit(df[features], df[target])
+            timings["refit_s"] = time.time() - step
+    version = register_model(
+        "regression",
+        pipeline,
+        training_info(dataset, len(train), last_reception(train), mode),
+        metrics_retrained,
+        parent=base,
+        models_dir=models_dir,
+    )
+    job.log(f"Registered as version {version}")
+
+    return {
+        "mode": mode,
+        "base": base,
+        "version": version,
+        "rows": len(train),
+        "rows_total": len(df),
+        "rows_eval": len(holdout),
+        "n_jobs": n_jobs,
+        "metrics_original": metrics_original,
+        "metrics_retrained": metrics_retrained,
+        "intervals_original": intervals_original,
+        "intervals_retrained": intervals_retrained,
+        "timings": timings,
+        "duration_s": time.time() - start,
+    }
+
+
+def retrain_classification(
+    dataset: str,
+    job: Any,
+    n_jobs: int | None = None,
+    sample_rows: int | None = None,
+    models_dir: Path = MODELS_DIR,
+) -> dict:
+    """Retrain the DPE classification pipeline on a stored dataset.
+
+    The current model is the starting point (hyperparameters) and the reference
+    (metrics); the retrained one is registered as a new version, not promoted. Both
+    are measured on at most EVAL_ROWS stratified rows held out of the training, with
+    bootstrap confidence intervals. A full retraining then fits the model again on
+    all the rows, the held-out ones included, for the registered version.
+
+    Args:
+        dataset (str): The dataset name.
+        job (Any): The running job (progress and log methods), see src.ml.jobs.
+        n_jobs (int | None, optional): Threads of the training. Defaults to None (the model setting).
+        sample_rows (int | None, optional): Train on a stratified sample of this many
+            rows (quick run), registered as measured. Defaults to None (all the rows).
+        models_dir (Path, optional): Folder of the model files. Defaults to MODELS_DIR.
+
+    Returns:
+        dict: Registered version, metrics of the current and retrained models on the
+            evaluation rows and their confidence intervals, wall time of each step
+            (timings) and in total (duration_s).
+    """
+    start = time.time()
+    timings = {}
+    features, target = features_target("classification", models_dir)
+
+    job.progress(0.05, f"Loading dataset {dataset}")
+    df, train, holdout = load_split(
+        dataset, features + [target, DATE_COLUMN], job, sample_rows
+    )
+    X, y = train[features], train[target]
+    X_eval, y_eval = holdout[features], holdout[target]
+    job.log(f"{n_jobs or 'default'} thread(s)")
+    timings["load_s"] = time.time() - start
+
+    # Label encoder of the current model, to decode its predictions.
+    job.progress(0.15, "Evaluating the current model")
+    step = time.time()
+    base, pipeline_original, label_encoder_original = current_model(
+        "classification", models_dir
+    )
+    try:
+        with thread_budget(pipeline_original, n_jobs):
+            y_pred = pipeline_original.predict(X_eval)
+        y_pred = label_encoder_original.inverse_transform(y_pred)
+        metrics_original = evaluate("classification", y_eval, y_pred)
+        intervals_original = metric_intervals("classification", y_eval, y_pred)
+    except Exception as e:
+        job.log(f"Could not evaluate the current classification model {base}: {e}")
+        metrics_original = {"Accuracy": None}
+        intervals_original = {}
+    timings["evaluate_original_s"] = time.time() - step
+
+    # New label encoder in case the training data does not have the same classes.
+    label_encoder = LabelEncoder()
+    y_encoded = label_encoder.fit_transform(y)
+
+    job.progress(0.3, "Training the classification model")
+    pipeline = joblib.load(model_path("classification", base, models_dir))
+    with thread_budget(pipeline, n_jobs):
+        step = time.time()
+        pipeline.fit(X, y_encoded)
+        timings["fit_s"] = time.time() - step
+
+        job.progress(0.75, "Evaluating the retrained model on the held-out rows")
+        step = time.time()
+        y_pred = label_encoder.inverse_transform(pipeline.predict(X_eval))
+        timings["evaluate_s"] = time.time() - step
+    metrics_retrained = evaluate("classification", y_eval, y_pred)
+    intervals_retrained = metric_intervals("classification", y_eval, y_pred)
+
+    mode = "full" if sample_rows is None else "sample"
+    if mode == "full":
+        # The version served to the users is trained on all the rows.
+        job.progress(0.9, "Training the classification model on all the rows")
+        train = df
+        label_encoder = LabelEncoder()
+        with thread_budget(pipeline, n_jobs):
+            step = time.time()
+            pipeline.fit(df[features], label_encoder.fit_transform(df[target]))
+            timings["refit_s"] = time.time() - step
+    version = register_model(
+        "classification",
+        pipeline,
+        training_info(dataset, len(train), last_reception(train), mode),
+        metrics_retrained,
+        label_encoder=label_encoder,
+        parent=base,
+        models_dir=models_dir,
+    )
+    job.log(f"Registered as version {version}")
+
+    return {
+        "mode": mode,
+        "base": base,
+        "version": version,
+        "rows": len(train),
+        "rows_total": len(df),
+        "rows_eval": len(holdout),
+        "n_jobs": n_jobs,
+        "metrics_original": metrics_original,
+        "metrics_retrained": metrics_retrained,
+        "intervals_original": intervals_original,
+        "intervals_retrained": intervals_retrained,
+        "timings": timings,
+        "duration_s": time.time() - start,
+    }
+
+
+def continue_training(
+    family: str,
+    dataset: str,
+    job: Any,
+    n_jobs: int | None = None,
+    since: str | None = None,
+    models_dir: Path = MODELS_DIR,
+) -> dict:
+    """Continue boosting the current model of a family on the new rows of a dataset.
+
+    The fitted preprocessing is kept as it is: the new rows go through it and
+    INCREMENTAL_ROUNDS trees are added to the booster of the current version, the
+    update being registered as a new version. The model is measured before and
+    after the update on a held-out share of the new rows.
+
+    Args:
+        family (str): "regression" or "classification".
+        dataset (str): The dataset name.
+        job (Any): The running job (progress and log methods), see src.ml.jobs.
+        n_jobs (int | None, optional): Threads of the training. Defaults to None (the model setting).
+        since (str | None, optional): Only the rows received after this ISO date. Defaults to
+            None (after the last training of the current version, all rows if unknown).
+        models_dir (Path, optional): Folder of the model files. Defaults to MODELS_DIR.
+
+    Raises:
+        ValueError: If there are fewer than MIN_INCREMENTAL_ROWS new rows.
+
+    Returns:
+        dict: Registered version, metrics before and after the update on the held-out
+            rows and their difference (deltas), wall time of each step (timings) and
+            in total (duration_s).
+    """
+    start = time.time()
+    timings = {}
+    features, target = features_target(family, models_dir)
+    base, pipeline, label_encoder = current_model(family, models_dir)
+    previous = read_manifest(family, base, models_dir)["training"]
+    if since is None:
+        since = previous.get("trained_until")
+
+    job.progress(0.05, f"Loading the new rows of {dataset} (since {since or 'ever'})")
+    df = load_dataset(dataset, columns=features + [target, DATE_COLUMN])
+    if since is not None and DATE_COLUMN in df.columns:
+        df = df[df[DATE_COLUMN] > pd.Timestamp(since)]
+
+    X, y = df[features], df[target]
+    if family == "classification":
+        # The booster keeps the classes it was trained with.
+        known = y.isin(label_encoder.classes_).to_numpy()
+        X, y = X[known], label_encoder.transform(y[known])
+
+    if len(X) < MIN_INCREMENTAL_ROWS:
+        raise ValueError(
+            f"Only {len(X):,} new rows since {since}: at least "
+            f"{MIN_INCREMENTAL_ROWS} are needed, run a full retraining instead"
+        )
+    X_train, X_holdout, y_train, y_holdout = train_test_split(
+        X, y, test_size=HOLDOUT_FRACTION, random_state=42
+    )
+    job.log(
+        f"{len(X_train):,} new rows for training, {len(X_holdout):,} held out, "
+        f"starting from version {base}, {n_jobs or 'default'} thread(s)"
+    )
+    timings["load_s"] = time.time() - start
+
+    model = pipeline[-1]
+    with thread_budget(pipeline, n_jobs):
+        job.progress(0.2, "Evaluating the current model on the held-out rows")
+        step = time.time()
+        metrics_before = evaluate(family, y_holdout, pipeline.predict(X_holdout))
+        timings["evaluate_original_s"] = time.time() - step
+
+        # Frozen preprocessing: only the booster is updated.
+        job.progress(0.4, f"Adding {INCREMENTAL_ROUNDS} boosting rounds")
+        step = time.time()
+        X_train = pipeline[:-1].transform(X_train)
+        n_estimators = model.get_params()["n_estimators"]
+        model.set_params(n_estimators=INCREMENTAL_ROUNDS)
+        try:
+            model.fit(X_train, y_train, xgb_model=model.get_booster())
+        finally:
+            model.set_params(n_estimators=n_estimators)
+        timings["fit_s"] = time.time() - step
+
+        job.progress(0.85, "Evaluating and saving the updated model")
+        step = time.time()
+        metrics_after = evaluate(family, y_holdout, pipeline.predict(X_holdout))
+        timings["evaluate_s"] = time.time() - step
+
+    version = register_model(
+        family,
+        pipeline,
+        training_info(
+            dataset, len(df), last_reception(df), "incremental", previous=previous
+        ),
+        metrics_after,
+        label_encoder=label_encoder,
+        parent=base,
+        models_dir=models_dir,
+    )
+    job.log(f"Registered as version {version}")
+
+    return {
+        "mode": "incremental",
+        "base": base,
+        "version": version,
+        "since": since,
+        "rows": len(X_train),
+        "rows_holdout": len(X_holdout),
+        "n_jobs": n_jobs,
+        "metrics_original": metrics_before,
+        "metrics_retrained": metrics_after,
+        "deltas": {k: metrics_after[k] - metrics_before[k] for k in metrics_after},
+        "timings": timings,
+        "duration_s": time.time() - start,
+    }
@@ -0,0 +1,321 @@
+import math
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy.stats import loguniform, randint, uniform
+from sklearn.base import clone
+from sklearn.model_selection import KFold, ParameterSampler, StratifiedKFold
+from sklearn.preprocessing import LabelEncoder
+
+from src.ml import MODELS_DIR
+from src.ml.registry import model_path, register_model
+from src.ml.sampling import metric_intervals, stratified_order
+from src.ml.training import (
+    DATE_COLUMN,
+    current_model,
+    evaluate,
+    features_target,
+    last_reception,
+    load_split,
+    thread_budget,
+    training_info,
+)
+
+# ============================================================ #
+# Hyperparameter search of the XGBoost models                  #
+# ============================================================ #
+
+# Hyperparameters searched, sampled at random for the candidates.
+SEARCH_SPACE = {
+    "learning_rate": loguniform(0.02, 0.3),
+    "max_depth": randint(3, 11),
+    "min_child_weight": loguniform(1, 20),
+    "subsample": uniform(0.6, 0.4),
+    "colsample_bytree": uniform(0.6, 0.4),
+    "reg_lambda": loguniform(0.1, 10),
+}
+
+# Successive halving: N_CANDIDATES candidates (the current hyperparameters among
+# them) are trained on a share of the rows, the best 1 / ETA go on with ETA times
+# more rows, up to all the rows of the folds.
+N_CANDIDATES = 16
+ETA = 3
+N_FOLDS = 3
+
+# Boosting rounds: at most MAX_ROUNDS, stopped once the validation score has not
+# improved for EARLY_STOPPING_ROUNDS rounds.
+MAX_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 30
+
+# Seconds given to the search, the best candidate so far is kept once spent.
+TUNING_TIME_BUDGET = int(os.getenv("TUNING_TIME_BUDGET", 600))
+
+
+def _prefix_order(y: np.ndarray, seed: int, stratify: bool) -> np.ndarray:
+    """Random order of the rows, each class spread evenly when stratified.
+
+    The first rows of a stratified order keep the class proportions, so the small
+    rungs of the search see every class.
+    """
+    if not stratify:
+        return np.random.default_rng(seed).permutation(len(y))
+    return stratified_order(y, seed)
+
+
+def preprocessed_folds(
+    pipeline: Any, X: pd.DataFrame, y: np.ndarray, stratify: bool
+) -> list[tuple]:
+    """Cross-validation folds, preprocessed once and shared by all the candidates.
+
+    The preprocessing of the pipeline is fitted on the training part of each fold.
+
+    Returns:
+        list[tuple]: (X_train, y_train, X_val, y_val) per fold, the training rows in
+            the order used to take the first rows of a rung.
+    """
+    splitter = (
+        StratifiedKFold(N_FOLDS, shuffle=True, random_state=42)
+        if stratify
+        else KFold(N_FOLDS, shuffle=True, random_state=42)
+    )
+    folds = []
+    for i, (train, val) in enumerate(splitter.split(X, y)):
+        train = train[_prefix_order(y[train], seed=i, stratify=stratify)]
+        preprocessor = clone(pipeline[:-1]).fit(X.iloc[train], y[train])
+        folds.append(
+            (
+                preprocessor.transform(X.iloc[train]),
+                y[train],
+                preprocessor.transform(X.iloc[val]),
+                y[val],
+            )
+        )
+    return folds
+
+
+def _fit_fold(
+    candidate: int, model: Any, params: dict, fold: tuple, rows: int
+) -> tuple[int, tuple[float, int]]:
+    """Train a candidate on the first rows of a fold.
+
+    Returns:
+        tuple[int, tuple[float, int]]: The candidate, its best validation score (lower
+            is better) and the number of boosting rounds reaching it.
+    """
+    X_train, y_train, X_val, y_val = fold
+    model = clone(model).set_params(
+        **params,
+        n_estimators=MAX_ROUNDS,
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        n_jobs=1,
+    )
+    try:
+        model.fit(
+            X_train[:rows], y_train[:rows], eval_set=[(X_val, y_val)], verbose=False
+        )
+    except ValueError:
+        # A class missing from the first rows of the fold.
+        return candidate, (math.inf, 0)
+    return candidate, (model.best_score, model.best_iteration + 1)
+
+
+def tune(
+    family: str,
+    dataset: str,
+    job: Any,
+    n_jobs: int | None = None,
+    time_budget: float = TUNING_TIME_BUDGET,
+    models_dir: Path = MODELS_DIR,
+) -> dict:
+    """Search the hyperparameters of a model family, then retrain the best candidate.
+
+    The candidates are trained in parallel worker processes (one thread each) by
+    successive halving on cached preprocessed folds, with early stopping. The current
+    hyperparameters are among them. The search runs without the EVAL_ROWS stratified
+    rows held out to measure the best candidate against the current model; it is then
+    retrained on all the rows and registered as a new version, not promoted.
+
+    Args:
+        family (str): "regression" or "classification".
+        dataset (str): The dataset name.
+        job (Any): The running job (progress and log methods), see src.ml.jobs.
+        n_jobs (int | None, optional): Worker processes of the search and threads of the
+            final training. Defaults to None (one).
+        time_budget (float, optional): Seconds given to the search. Defaults to TUNING_TIME_BUDGET.
+        models_dir (Path, optional): Folder of the model files. Defaults to MODELS_DIR.
+
+    Returns:
+        dict: Registered version, scores of the rungs, best hyperparameters,
+            cross-validation score of the best and of the current hyperparameters,
+            metrics of the current and retrained models on the held-out rows and their
+            confidence intervals, wall time of each step and in total.
+    """
+    start = time.time()
+    deadline = start + time_budget
+    timings = {}
+    features, target = features_target(family, models_dir)
+
+    job.progress(0.02, f"Loading dataset {dataset}")
+    df, train, holdout = load_split(dataset, features + [target, DATE_COLUMN], job)
+    X, y = train[features], train[target].to_numpy()
+    X_eval, y_eval = holdout[features], holdout[target]
+    if family == "classification":
+        # New label encoder in case the training data does not have the same classes.
+        label_encoder = LabelEncoder()
+        y = label_encoder.fit_transform(y)
+    base, pipeline, label_encoder_current = current_model(family, models_dir)
+    model = pipeline[-1]
+    timings["load_s"] = time.time() - start
+
+    job.progress(0.05, f"Preprocessing {N_FOLDS} cross-validation folds")
+    step = time.time()
+    folds = preprocessed_folds(pipeline, X, y, stratify=family == "classification")
+    fold_rows = min(len(fold[1]) for fold in folds)
+    timings["folds_s"] = time.time() - step
+
+    # The current hyperparameters compete with the sampled ones.
+    current = {k: v for k, v in model.get_params().items() if k in SEARCH_SPACE}
+    candidates = [current] + list(
+        ParameterSampler(SEARCH_SPACE, N_CANDIDATES - 1, random_state=42)
+    )
+    n_rungs = math.ceil(math.log(N_CANDIDATES, ETA))
+    scores: dict[int, tuple[float, int]] = {}
+    rungs = []
+    alive = list(range(len(candidates)))
+    # Best candidate of the last rung with finished candidates, None before any.
+    best = None
+
+    step = time.time()
+    for rung in range(n_rungs):
+        rows = max(fold_rows // ETA ** (n_rungs - 1 - rung), 100)
+        job.progress(
+            0.1 + 0.7 * rung / n_rungs,
+            f"Rung {rung + 1}/{n_rungs}: {len(alive)} candidates on {rows:,} rows",
+        )
+        tasks = (
+            delayed(_fit_fold)(c, model, candidates[c], fold, rows)
+            for c in alive
+            for fold in folds
+        )
+        results: dict[int, list] = {c: [] for c in alive}
+        with Parallel(n_jobs=n_jobs or 1, return_as="generator_unordered") as parallel:
+            for c, result in parallel(tasks):
+                results[c].append(result)
+                if time.time() > deadline:
+                    break
+
+        finished = {c: r for c, r in results.items() if len(r) == len(folds)}
+        for c, r in finished.items():
+            scores[c] = (
+                float(np.mean([s for s, _ in r])),
+                int(np.mean([n for _, n in r])),
+            )
+        ranked = sorted(finished, key=lambda c: scores[c][0])
+        if ranked:
+            best = ranked[0]
+        rungs.append(
+            {
+                "rows": rows,
+                "candidates": len(alive),
+                "finished": len(finished),
+                "best_score": scores[ranked[0]][0] if ranked else None,
+            }
+        )
+        job.log(
+            f"Rung {rung + 1}: {len(finished)}/{len(alive)} candidates, "
+            f"best score {rungs[-1]['best_score']}"
+        )
+        if time.time() > deadline or not ranked:
+            job.log("Time budget spent, the best candidate so far is kept")
+            break
+        alive = ranked[: max(1, len(ranked) // ETA)]
+    timings["search_s"] = time.time() - step
+
+    # The current hyperparameters when no rung was finished in time.
+    if best is None:
+        best = 0
+    best_params = candidates[best]
+    n_estimators = scores[best][1] if best in scores else model.n_estimators
+    job.log(f"Best candidate: {best_params}, {n_estimators} rounds")
+
+    job.progress(0.8, "Training the best candidate")
+    step = time.time()
+    pipeline[-1].set_params(**best_params, n_estimators=n_estimators)
+    with thread_budget(pipeline, n_jobs):
+        pipeline.fit(X, y)
+        y_pred = pipeline.predict(X_eval)
+    timings["fit_s"] = time.time() - step
+
+    # Metrics on the held-out rows, as for a full retraining.
+    step = time.time()
+    if family == "classification":
+        y_pred = label_encoder.inverse_transform(y_pred)
+    metrics_retrained = evaluate(family, y_eval, y_pred)
+    intervals_retrained = metric_intervals(family, y_eval, y_pred)
+    try:
+        pipeline_original = joblib.load(model_path(family, base, models_dir))
+        with thread_budget(pipeline_original, n_jobs):
+            y_pred = pipeline_original.predict(X_eval)
+        if family == "classification":
+            y_pred = label_encoder_current.inverse_transform(y_pred)
+        metrics_original = evaluate(family, y_eval, y_pred)
+        intervals_original = metric_intervals(family, y_eval, y_pred)
+    except Exception as e:
+        job.log(f"Could not evaluate the current {family} model {base}: {e}")
+        metrics_original = {k: None for k in metrics_retrained}
+        intervals_original = {}
+    timings["evaluate_s"] = time.time() - step
+
+    # The version served to the users is trained on all the rows.
+    job.progress(0.9, "Training the best candidate on all the rows")
+    step = time.time()
+    y_all = df[target].to_numpy()
+    if family == "classification":
+        label_encoder = LabelEncoder()
+        y_all = label_encoder.fit_transform(y_all)
+    with thread_budget(pipeline, n_jobs):
+        pipeline.fit(df[features], y_all)
+    timings["refit_s"] = time.time() - step
+
+    version = register_model(
+        family,
+        pipeline,
+        training_info(dataset, len(df), last_reception(df), "tune"),
+        metrics_retrained,
+        label_encoder=label_encoder if family == "classification" else None,
+        parent=base,
+        models_dir=models_dir,
+    )
+    job.log(f"Registered as version {version}")
+
+    return {
+        "mode": "tune",
+        "base": base,
+        "version": version,
+        "rows": len(df),
+        "rows_total": len(df),
+        "rows_eval": len(holdout),
+        "n_jobs": n_jobs,
+        "rungs": rungs,
+        # Sampled values are numpy scalars: plain values for the JSON job state.
+        "best_params": {
+            k: v.item() if isinstance(v, np.generic) else v
+            for k, v in best_params.items()
+        },
+        "n_estimators": n_estimators,
+        "cv_score_current": scores.get(0, (None,))[0],
+        "cv_score_best": scores.get(best, (None,))[0],
+        "budget_spent": time.time() > deadline,
+        "metrics_original": metrics_original,
+        "metrics_retrained": metrics_retrained,
+        "intervals_original": intervals_original,
+        "intervals_retrained": intervals_retrained,
+        "timings": timings,
+        "duration_s": time.time() - start,
+    }
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent  # Get to the root folder.
+DATASETS_DIR = BASE_DIR / "data" / "datasets"
+
+# Import the dataset storage helpers
+from .catalog import dataset_info, read_catalog  # noqa: E402
+from .parquet_store import (  # noqa: E402
+    append_dataset,
+    conform,
+    dataset_columns,
+    delete_dataset,
+    export_csv,
+    import_csv,
+    list_datasets,
+    partition_files,
+    read_csv,
+    read_dataset,
+    read_manifest,
+    read_partitions,
+    rebuild_catalog,
+    write_dataset,
+)
+
+__all__ = [
+    "BASE_DIR",
+    "DATASETS_DIR",
+    "append_dataset",
+    "conform",
+    "dataset_columns",
+    "dataset_info",
+    "delete_dataset",
+    "export_csv",
+    "import_csv",
+    "list_datasets",
+    "partition_files",
+    "read_catalog",
+    "read_csv",
+    "read_dataset",
+    "read_manifest",
+    "read_partitions",
+    "rebuild_catalog",
+    "write_dataset",
+]
@@ -0,0 +1,110 @@
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.storage.locks import dataset_lock, publish, temp_path
+from src.storage.parquet_store import dataset_dir, partition_files, read_manifest
+
+# ============================================================ #
+# Memory-mapped Arrow IPC copies of the stored datasets        #
+# ============================================================ #
+
+# Each dataset version is materialised once as an uncompressed Arrow IPC file:
+# <name>/_mmap/v<version>.arrow. Every process (Streamlit, FastAPI) maps it read-only,
+# so the data is held once in the OS page cache whatever the number of sessions.
+MMAP_DIR = "_mmap"
+
+
+def mmap_path(name: str, version: int) -> Path:
+    """Path of the Arrow IPC file of a dataset version."""
+    return dataset_dir(name) / MMAP_DIR / f"v{version}.arrow"
+
+
+def materialise(name: str) -> Path:
+    """Write the Arrow IPC file of the current version of a dataset, if missing.
+
+    Older versions are removed. A process still mapping one of them keeps a valid
+    mapping until it closes it.
+
+    Args:
+        name (str): The dataset name.
+
+    Returns:
+        Path: Path to the Arrow IPC file.
+    """
+    with dataset_lock(name, shared=True):
+        version = read_manifest(name)["version"]
+        path = mmap_path(name, version)
+        if path.exists():
+            return path
+
+        files = partition_files(name)
+        schema = pa.unify_schemas([pq.read_schema(f) for f in files]) if files else None
+        table = (
+            ds.dataset(files, schema=schema, format="parquet").to_table()
+            if files
+            else pa.table({})
+        )
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique temporary name: two processes may materialise the same version at once.
+        tmp_path = temp_path(path)
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        publish(tmp_path, path)
+
+    for old in path.parent.glob("v*.arrow"):
+        if old != path:
+            try:
+                old.unlink()
+            except OSError:
+                # Still mapped by another process (Windows), removed on a next write.
+                pass
+
+    return path
+
+
+def open_table(name: str, columns: list[str] | None = None) -> pa.Table:
+    """Open the current version of a dataset as a memory-mapped arrow table (no data is read).
+
+    Args:
+        name (str): The dataset name.
+        columns (list[str] | None, optional): Columns to keep. Unknown columns are ignored. Defaults to None (all columns).
+
+    Returns:
+        pa.Table: The table, its buffers point into the mapped file.
+    """
+    source = pa.memory_map(str(materialise(name)), "r")
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select([c for c in columns if c in table.column_names])
+    return table
+
+
+def load_dataset(name: str, columns: list[str] | None = None) -> pd.DataFrame:
+    """Load a dataset as a DataFrame backed by the memory-mapped file where possible.
+
+    Text columns stay arrow-backed (pd.ArrowDtype) and numeric columns without
+    missing values are wrapped without copy. Dates and numeric columns with missing
+    values are converted (NaN filled), as for a parquet read.
+
+    Args:
+        name (str): The dataset name.
+        columns (list[str] | None, optional): Columns to load. Defaults to None (all columns).
+
+    Returns:
+        pd.DataFrame: The dataset.
+    """
+
+    def types_mapper(dtype: pa.DataType):
+        if pa.types.is_string(dtype) or pa.types.is_large_string(dtype):
+            return pd.ArrowDtype(dtype)
+        return None
+
+    return open_table(name, columns).to_pandas(
+        date_as_object=False, split_blocks=True, types_mapper=types_mapper
+    )
@@ -0,0 +1,108 @@
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from src.storage.arrow_mmap import load_dataset
+from src.storage.parquet_store import read_manifest
+
+# ============================================================ #
+# Process-wide dataset cache shared by the Streamlit sessions  #
+# ============================================================ #
+
+# Memory budget of the cache, in megabytes.
+DEFAULT_CACHE_MB = int(os.environ.get("DATASET_CACHE_MB", "1024"))
+
+
+class DatasetCache:
+    """Least recently used cache of loaded datasets, bounded by a memory budget.
+
+    Entries are keyed on the dataset name, its version (from the manifest, bumped on every
+    write) and the loaded columns, so a rewritten dataset is never served stale.
+    Frames are loaded from the memory-mapped Arrow files, the size counted against the
+    budget includes the mapped columns.
+
+    The sessions get shallow copies sharing the cached data: they are read-only. Adding
+    or replacing a column only changes the copy, but modifying values in place (loc
+    assignment, inplace=True) would change the cached frame of every session.
+    """
+
+    def __init__(self, max_mb: int = DEFAULT_CACHE_MB):
+        self.max_bytes = max_mb * 1024**2
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str, columns: list[str] | None = None) -> pd.DataFrame:
+        """Get a dataset, loading it from the store on a miss.
+
+        Args:
+            name (str): The dataset name.
+            columns (list[str] | None, optional): Columns to load. Defaults to None (all columns).
+
+        Returns:
+            pd.DataFrame: A shallow copy of the cached frame (no data is copied), to be
+                treated as read-only.
+        """
+        key = (
+            name,
+            read_manifest(name)["version"],
+            tuple(columns) if columns else None,
+        )
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0].copy(deep=False)
+
+        # Load outside the lock, so other sessions are not blocked meanwhile.
+        df = load_dataset(name, columns=columns)
+        size = int(df.memory_usage(deep=True).sum())
+
+        with self._lock:
+            self.misses += 1
+
+            # Older versions of the dataset can no longer be requested.
+            for old_key in [
+                k for k in self._entries if k[0] == name and k[1] != key[1]
+            ]:
+                self._drop(old_key)
+
+            # A dataset larger than the whole budget is not cached.
+            if size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = (df, size)
+                self.size_bytes += size
+                while self.size_bytes > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+
+        return df.copy(deep=False)
+
+    def invalidate(self, name: str | None = None) -> None:
+        """Drop the cached frames of a dataset (all datasets if name is None)."""
+        with self._lock:
+            for key in [k for k in self._entries if name is None or k[0] == name]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        """Cache usage: number of entries, size, budget, hits and misses."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_mb": round(self.size_bytes / 1024**2, 1),
+                "max_mb": round(self.max_bytes / 1024**2, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _drop(self, key: tuple) -> None:
+        """Remove an entry (the lock must be held)."""
+        _, size = self._entries.pop(key)
+        self.size_bytes -= size
+
+
+# Single instance shared by every session of the process.
+dataset_cache = DatasetCache()
@@ -0,0 +1,204 @@
+import datetime as dt
+import json
+import math
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.storage import DATASETS_DIR
+from src.storage.locks import atomic_write_text, dataset_lock
+
+# ============================================================ #
+# Catalog of the stored datasets                               #
+# ============================================================ #
+
+# Metadata of every dataset in a single small file, so pages can list, describe
+# and filter the datasets without opening their parquet files.
+CATALOG_PATH = DATASETS_DIR / "_catalog.json"
+# Lock serialising the updates of the catalog by concurrent writers.
+CATALOG_LOCK = "_catalog"
+
+# Numeric columns summarised in the catalog.
+SUMMARY_COLUMNS = [
+    "cout_total_5_usages",
+    "conso_5_usages_ef",
+    "emission_ges_5_usages",
+    "surface_habitable_logement",
+    "age_batiment",
+]
+
+DPE_COLUMN = "etiquette_dpe"
+DATE_COLUMN = "date_reception_dpe"
+
+
+def partition_stats(df: pd.DataFrame) -> dict:
+    """Summary statistics of the rows of one partition, computed when the partition is written.
+
+    Only mergeable statistics are kept (count, sum, sum of squares, min, max), so the
+    statistics of a dataset are obtained from its partitions without reading any row.
+
+    Args:
+        df (pd.DataFrame): The rows of the partition.
+
+    Returns:
+        dict: {"date_min", "date_max", "dpe_counts", "columns": {column: {count, sum, sumsq, min, max}}}.
+    """
+    stats = {"date_min": None, "date_max": None, "dpe_counts": {}, "columns": {}}
+
+    if DATE_COLUMN in df.columns:
+        dates = pd.to_datetime(df[DATE_COLUMN], errors="coerce").dropna()
+        if not dates.empty:
+            stats["date_min"] = dates.min().date().isoformat()
+            stats["date_max"] = dates.max().date().isoformat()
+
+    if DPE_COLUMN in df.columns:
+        counts = df[DPE_COLUMN].dropna().astype(str).value_counts()
+        stats["dpe_counts"] = {k: int(v) for k, v in sorted(counts.items())}
+
+    for col in SUMMARY_COLUMNS:
+        if col not in df.columns:
+            continue
+        values = pd.to_numeric(df[col], errors="coerce").dropna().astype("float64")
+        if values.empty:
+            continue
+        stats["columns"][col] = {
+            "count": int(values.size),
+            "sum": float(values.sum()),
+            "sumsq": float((values**2).sum()),
+            "min": float(values.min()),
+            "max": float(values.max()),
+        }
+
+    return stats
+
+
+def _merge_stats(partition_stats_list: list[dict]) -> dict:
+    """Merge the statistics of several partitions into the statistics of the dataset."""
+    dates_min = [s["date_min"] for s in partition_stats_list if s["date_min"]]
+    dates_max = [s["date_max"] for s in partition_stats_list if s["date_max"]]
+
+    dpe_counts: dict[str, int] = {}
+    columns: dict[str, dict] = {}
+    for stats in partition_stats_list:
+        for label, n in stats["dpe_counts"].items():
+            dpe_counts[label] = dpe_counts.get(label, 0) + n
+
+        for col, s in stats["columns"].items():
+            if col not in columns:
+                columns[col] = dict(s)
+                continue
+            merged = columns[col]
+            merged["count"] += s["count"]
+            merged["sum"] += s["sum"]
+            merged["sumsq"] += s["sumsq"]
+            merged["min"] = min(merged["min"], s["min"])
+            merged["max"] = max(merged["max"], s["max"])
+
+    summary = {}
+    for col, s in columns.items():
+        n, mean = s["count"], s["sum"] / s["count"]
+        variance = (s["sumsq"] - n * mean**2) / (n - 1) if n > 1 else float("nan")
+        summary[col] = {
+            "count": n,
+            "mean": mean,
+            "std": math.sqrt(max(variance, 0.0)) if n > 1 else None,
+            "min": s["min"],
+            "max": s["max"],
+        }
+
+    return {
+        "date_min": min(dates_min) if dates_min else None,
+        "date_max": max(dates_max) if dates_max else None,
+        "dpe_counts": dict(sorted(dpe_counts.items())),
+        "stats": summary,
+    }
+
+
+def catalog_entry(name: str, manifest: dict) -> dict:
+    """Build the catalog entry of a dataset from its manifest.
+
+    Only the parquet footers are read (schema and file sizes). Partitions written before
+    the statistics were recorded in the manifest are summarised from their file.
+
+    Args:
+        name (str): The dataset name.
+        manifest (dict): The manifest of the dataset.
+
+    Returns:
+        dict: Version, rows, size on disk, schema, departments, years, reception date range and summary statistics.
+    """
+    partitions = list(manifest["partitions"].values())
+    files = [DATASETS_DIR / name / p["file"] for p in partitions]
+
+    stats = []
+    for partition, file in zip(partitions, files):
+        if "stats" not in partition:
+            columns = set(pq.read_schema(file).names)
+            wanted = [DATE_COLUMN, DPE_COLUMN] + SUMMARY_COLUMNS
+            table = pq.read_table(file, columns=[c for c in wanted if c in columns])
+            partition = {**partition, "stats": partition_stats(table.to_pandas())}
+        stats.append(partition["stats"])
+
+    schema = pa.unify_schemas([pq.read_schema(f) for f in files]) if files else None
+
+    return {
+        "name": name,
+        "version": manifest["version"],
+        "updated_at": manifest["updated_at"],
+        "rows": sum(p["rows"] for p in partitions),
+        "size_bytes": sum(f.stat().st_size for f in files),
+        "schema": (
+            {field.name: str(field.type) for field in schema}
+            if schema is not None
+            else {c: "null" for c in manifest["columns"]}
+        ),
+        "departments": sorted({p["departement"] for p in partitions}),
+        "years": sorted({p["year"] for p in partitions if p["year"] is not None}),
+        **_merge_stats(stats),
+    }
+
+
+def read_catalog() -> dict[str, dict]:
+    """Read the catalog: dataset name -> catalog entry (empty if no dataset has been written yet)."""
+    if not CATALOG_PATH.exists():
+        return {}
+    return json.loads(CATALOG_PATH.read_text(encoding="utf-8"))["datasets"]
+
+
+def dataset_info(name: str) -> dict | None:
+    """Get the catalog entry of a dataset, None if the dataset is unknown."""
+    return read_catalog().get(name)
+
+
+def write_catalog(entries: dict[str, dict]) -> None:
+    """Replace the catalog in one step, so readers never see a partial file.
+
+    Callers updating the catalog hold the CATALOG_LOCK lock.
+    """
+    CATALOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    catalog = {
+        "updated_at": dt.datetime.now().isoformat(timespec="seconds"),
+        "datasets": dict(sorted(entries.items())),
+    }
+    atomic_write_text(CATALOG_PATH, json.dumps(catalog, indent=2))
+
+
+def update_entry(name: str, manifest: dict) -> dict:
+    """Refresh the catalog entry of a dataset after a write.
+
+    Returns:
+        dict: The new catalog entry.
+    """
+    entry = catalog_entry(name, manifest)
+    with dataset_lock(CATALOG_LOCK):
+        write_catalog(read_catalog() | {name: entry})
+    return entry
+
+
+def remove_entry(name: str) -> None:
+    """Remove a deleted dataset from the catalog."""
+    with dataset_lock(CATALOG_LOCK):
+        entries = read_catalog()
+        if entries.pop(name, None) is not None:
+            write_catalog(entries)
@@ -0,0 +1,170 @@
+from functools import lru_cache
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from sklearn.neighbors import KDTree
+
+from src.storage.catalog import read_catalog
+from src.storage.locks import dataset_lock, publish, temp_path
+from src.storage.parquet_store import dataset_dir, read_manifest
+
+# ============================================================ #
+# Nearest comparable homes in the feature space                #
+# ============================================================ #
+
+# Comparables share these values with the searched home.
+GROUP_COLUMNS = [
+    "zone_climatique",
+    "type_batiment",
+    "type_energie_principale_chauffage",
+]
+
+# Numeric features and the difference counting as a distance of 1. The scales are
+# fixed (not fitted on the data) so the index of a partition never has to be rebuilt
+# when other partitions change. The surface is compared in log scale (about +/-25%).
+FEATURE_SCALES = {
+    "surface_habitable_logement": 0.25,
+    "age_batiment": 10.0,
+    "nombre_niveau_logement": 1.0,
+}
+
+# Columns returned for each comparable.
+RESULT_COLUMNS = [
+    "numero_dpe",
+    "etiquette_dpe",
+    "cout_total_5_usages",
+    "nom_commune_ban",
+    "code_postal_ban",
+    *GROUP_COLUMNS,
+    *FEATURE_SCALES,
+]
+
+# One index file per partition file: <name>/_comparables/<partition file stem>.joblib
+# An append only indexes the partitions it rewrote.
+COMPARABLES_DIR = "_comparables"
+
+
+def scale_features(df: pd.DataFrame) -> np.ndarray:
+    """Normalised feature matrix (one row per home) compared with the euclidean distance.
+
+    Args:
+        df (pd.DataFrame): Homes with the FEATURE_SCALES columns.
+
+    Returns:
+        np.ndarray: A (n, len(FEATURE_SCALES)) float64 array.
+    """
+    surface = pd.to_numeric(df["surface_habitable_logement"], errors="coerce")
+    columns = [np.log(surface.clip(lower=1)).to_numpy("float64")]
+    for column in ["age_batiment", "nombre_niveau_logement"]:
+        columns.append(pd.to_numeric(df[column], errors="coerce").to_numpy("float64"))
+    return np.column_stack(columns) / np.array(list(FEATURE_SCALES.values()))
+
+
+def _partition_index_path(name: str, file: str) -> Path:
+    """Path of the index of a partition file (relative path of the manifest)."""
+    return dataset_dir(name) / COMPARABLES_DIR / f"{Path(file).stem}.joblib"
+
+
+def _index_partition(path: Path) -> dict[tuple, tuple[KDTree, pd.DataFrame]]:
+    """One KD-tree per group of a partition file, with the returned columns of its homes."""
+    columns = set(pq.read_schema(path).names)
+    if not set(GROUP_COLUMNS) | set(FEATURE_SCALES) <= columns:
+        return {}
+    df = pq.read_table(
+        path, columns=[c for c in RESULT_COLUMNS if c in columns]
+    ).to_pandas()
+
+    features = scale_features(df)
+    keep = ~np.isnan(features).any(axis=1) & df[GROUP_COLUMNS].notna().all(axis=1)
+    df, features = df[keep.to_numpy()].reset_index(drop=True), features[keep]
+
+    groups = {}
+    for key, rows in df.groupby(GROUP_COLUMNS).indices.items():
+        groups[key] = (KDTree(features[rows]), df.iloc[rows].reset_index(drop=True))
+    return groups
+
+
+def build_comparables(name: str) -> list[Path]:
+    """Index the partitions of the current version of a dataset that are not indexed yet.
+
+    Indexes of partition files that are no longer in the dataset are removed.
+
+    Args:
+        name (str): The dataset name.
+
+    Returns:
+        list[Path]: The index files of the current partitions.
+    """
+    with dataset_lock(name, shared=True):
+        files = [p["file"] for p in read_manifest(name)["partitions"].values()]
+        paths = []
+        for file in files:
+            path = _partition_index_path(name, file)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = temp_path(path)
+                joblib.dump(_index_partition(dataset_dir(name) / file), tmp_path)
+                publish(tmp_path, path)
+            paths.append(path)
+
+    index_dir = dataset_dir(name) / COMPARABLES_DIR
+    for old in index_dir.glob("*.joblib") if index_dir.exists() else []:
+        if old not in paths:
+            old.unlink(missing_ok=True)
+
+    return paths
+
+
+@lru_cache(maxsize=8)
+def _load_comparables(
+    name: str, version: int
+) -> list[dict[tuple, tuple[KDTree, pd.DataFrame]]]:
+    """Read the partition indexes of a dataset version."""
+    return [joblib.load(path) for path in build_comparables(name)]
+
+
+def find_comparables(
+    home: dict, k: int = 10, datasets: list[str] | None = None
+) -> pd.DataFrame:
+    """The k stored homes most similar to a home.
+
+    Comparables have the same climate zone, building type and heating energy, and the
+    closest surface, age and number of floors.
+
+    Args:
+        home (dict): Values of the GROUP_COLUMNS and FEATURE_SCALES columns.
+        k (int, optional): Number of comparables. Defaults to 10.
+        datasets (list[str] | None, optional): Datasets searched. Defaults to None (all stored datasets).
+
+    Returns:
+        pd.DataFrame: The comparables, closest first: RESULT_COLUMNS, dataset name and distance.
+    """
+    key = tuple(home[c] for c in GROUP_COLUMNS)
+    point = scale_features(pd.DataFrame([home]))
+    if np.isnan(point).any():
+        raise ValueError("The surface, age and number of floors must be given")
+
+    candidates = []
+    for name in datasets if datasets is not None else list(read_catalog()):
+        for partition in _load_comparables(name, read_manifest(name)["version"]):
+            if key not in partition:
+                continue
+            tree, rows = partition[key]
+            dist, ind = tree.query(point, k=min(k, len(rows)))
+            found = rows.iloc[ind[0]].assign(dataset=name, distance=dist[0])
+            candidates.append(found)
+
+    if not candidates:
+        return pd.DataFrame(columns=[*RESULT_COLUMNS, "dataset", "distance"])
+
+    comparables = pd.concat(candidates, ignore_index=True).sort_values(
+        "distance", kind="stable"
+    )
+    # A home stored in several datasets is returned once.
+    if "numero_dpe" in comparables.columns:
+        known = comparables["numero_dpe"].notna()
+        comparables = comparables[~(known & comparables["numero_dpe"].duplicated())]
+    return comparables.head(k).reset_index(drop=True)
@@ -0,0 +1,369 @@
+import json
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.storage.locks import dataset_lock, publish, temp_path
+from src.storage.parquet_store import (
+    COMPRESSION,
+    _read_files,
+    dataset_dir,
+    partition_files,
+    read_manifest,
+)
+
+# ============================================================ #
+# Pre-aggregated filter cube of the statistics page            #
+# ============================================================ #
+
+# One cell per combination of the filter columns of the statistics page.
+DIMENSIONS = ["nom_commune_ban", "type_batiment", "etiquette_dpe"]
+
+# Value used for missing categories, same as the query engine.
+UNKNOWN = "Unknown"
+
+# Class counts stored in each cell (besides the DIMENSIONS).
+GES_COLUMN = "etiquette_ges"
+GES_CLASSES = ["A", "B", "C", "D", "E", "F", "G"]
+
+# Columns aggregated in each cell: count, sum, sum of squares, min and max.
+MEASURES = [
+    "surface_habitable_logement",
+    "cout_total_5_usages",
+    "conso_5_usages_ef",
+    "emission_ges_5_usages",
+    "cout_chauffage",
+    "cout_ecs",
+    "cout_refroidissement",
+    "cout_eclairage",
+    "cout_auxiliaires",
+    "conso_chauffage_ef",
+    "conso_ecs_ef",
+    "conso_refroidissement_ef",
+    "conso_eclairage_ef",
+    "conso_auxiliaires_ef",
+    "emission_ges_chauffage",
+    "emission_ges_ecs",
+    "emission_ges_refroidissement",
+    "emission_ges_eclairage",
+    "emission_ges_auxiliaires",
+]
+
+# Columns with a quantile sketch: a histogram per cell over bins shared by all the cells.
+SKETCHED = [
+    "surface_habitable_logement",
+    "cout_total_5_usages",
+    "conso_5_usages_ef",
+    "emission_ges_5_usages",
+]
+
+# Bin edges are quantiles of the whole dataset, so each bin holds ~1/NB_BINS of the rows
+# and quantiles of any selection are estimated within about one bin.
+NB_BINS = 128
+
+# The cube is stored next to the dataset: <name>/_cube/v<version>.parquet
+CUBE_DIR = "_cube"
+
+
+def cube_path(name: str, version: int) -> Path:
+    """Path of the cube of a dataset version."""
+    return dataset_dir(name) / CUBE_DIR / f"v{version}.parquet"
+
+
+def _compute_cube(df: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, list[float]]]:
+    """Aggregate the rows of a dataset into the cube cells.
+
+    Args:
+        df (pd.DataFrame): The dataset (at least the DIMENSIONS columns).
+
+    Returns:
+        tuple[pd.DataFrame, dict[str, list[float]]]: The cells and the bin edges of the sketched columns.
+    """
+    keys = pd.DataFrame(
+        {
+            dim: (
+                df[dim].astype("string").fillna(UNKNOWN)
+                if dim in df.columns
+                else pd.Series(UNKNOWN, index=df.index, dtype="string")
+            )
+            for dim in DIMENSIONS
+        }
+    )
+    if len(keys):
+        codes, uniques = pd.MultiIndex.from_frame(keys).factorize()
+    else:
+        # No rows: no cell (a MultiIndex cannot be factorized without values).
+        codes = np.empty(0, dtype="int64")
+        uniques = pd.MultiIndex.from_arrays([[]] * len(DIMENSIONS), names=DIMENSIONS)
+    nb_cells = len(uniques)
+
+    columns = {"n": np.bincount(codes, minlength=nb_cells)}
+
+    if GES_COLUMN in df.columns:
+        ges = df[GES_COLUMN].astype("string")
+        for label in GES_CLASSES:
+            mask = (ges == label).fillna(False).to_numpy()
+            columns[f"ges|{label}"] = np.bincount(codes[mask], minlength=nb_cells)
+
+    edges = {}
+    for col in MEASURES:
+        if col not in df.columns:
+            continue
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64")
+        valid = ~np.isnan(values)
+        cell, values = codes[valid], values[valid]
+
+        columns[f"{col}|count"] = np.bincount(cell, minlength=nb_cells)
+        columns[f"{col}|sum"] = np.bincount(cell, weights=values, minlength=nb_cells)
+        columns[f"{col}|sumsq"] = np.bincount(
+            cell, weights=values**2, minlength=nb_cells
+        )
+        minimum = np.full(nb_cells, np.inf)
+        maximum = np.full(nb_cells, -np.inf)
+        np.minimum.at(minimum, cell, values)
+        np.maximum.at(maximum, cell, values)
+        columns[f"{col}|min"] = np.where(np.isinf(minimum), np.nan, minimum)
+        columns[f"{col}|max"] = np.where(np.isinf(maximum), np.nan, maximum)
+
+        if col in SKETCHED and values.size:
+            col_edges = np.unique(np.quantile(values, np.linspace(0, 1, NB_BINS + 1)))
+            if len(col_edges) == 1:
+                # A single value: one empty-width bin.
+                col_edges = np.repeat(col_edges, 2)
+            nb_bins = len(col_edges) - 1
+            bins = np.clip(
+                np.searchsorted(col_edges, values, "right") - 1, 0, nb_bins - 1
+            )
+            hist = np.bincount(
+                cell * nb_bins + bins, minlength=nb_cells * nb_bins
+            ).reshape(nb_cells, nb_bins)
+            columns[f"{col}|hist"] = list(hist.astype("int32"))
+            edges[col] = col_edges.tolist()
+
+    cells = pd.concat(
+        [uniques.to_frame(index=False, name=DIMENSIONS), pd.DataFrame(columns)],
+        axis=1,
+    )
+    return cells, edges
+
+
+def build_cube(name: str) -> Path:
+    """Get the cube of the current version of a dataset, building it if missing.
+
+    Only the needed columns are read. Cubes of older versions are removed.
+
+    Args:
+        name (str): The dataset name.
+
+    Returns:
+        Path: Path of the cube file.
+    """
+    with dataset_lock(name, shared=True):
+        version = read_manifest(name)["version"]
+        path = cube_path(name, version)
+        if path.exists():
+            return path
+
+        columns = DIMENSIONS + [GES_COLUMN] + MEASURES
+        # Read without read_dataset: the lock is held and is not reentrant.
+        cells, edges = _compute_cube(_read_files(partition_files(name), columns))
+
+        table = pa.Table.from_pandas(cells, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), b"edges": json.dumps(edges).encode()}
+        )
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = temp_path(path)
+        pq.write_table(table, tmp_path, compression=COMPRESSION)
+        publish(tmp_path, path)
+
+    for old in path.parent.glob("v*.parquet"):
+        if old != path:
+            old.unlink(missing_ok=True)
+
+    return path
+
+
+class FilterCube:
+    """Cube of a dataset version: metrics for any filter combination without reading the rows.
+
+    Filters have the same form as for the query engine, restricted to the DIMENSIONS:
+    column -> list of accepted values (missing values match "Unknown").
+    """
+
+    def __init__(self, cells: pd.DataFrame, edges: dict[str, list[float]]):
+        self.edges = {col: np.asarray(e) for col, e in edges.items()}
+        self.hist = {
+            col: np.vstack(cells[f"{col}|hist"].to_numpy())
+            for col in self.edges
+            if len(cells)
+        }
+        self.cells = cells.drop(columns=[f"{col}|hist" for col in self.edges])
+
+    def _mask(self, filters: dict[str, list] | None) -> np.ndarray:
+        """Cells matching the filters."""
+        mask = np.ones(len(self.cells), dtype=bool)
+        for col, values in (filters or {}).items():
+            if col not in DIMENSIONS:
+                raise ValueError(f"Column {col} is not a dimension of the cube")
+            mask &= self.cells[col].isin([str(v) for v in values]).to_numpy()
+        return mask
+
+    def options(self, column: str, filters: dict[str, list] | None = None) -> list[str]:
+        """Sorted distinct values of a dimension among the cells matching the filters."""
+        return sorted(self.cells.loc[self._mask(filters), column].unique())
+
+    def count(self, filters: dict[str, list] | None = None) -> int:
+        """Number of rows matching the filters."""
+        return int(self.cells.loc[self._mask(filters), "n"].sum())
+
+    def class_counts(
+        self, column: str, filters: dict[str, list] | None = None
+    ) -> pd.Series:
+        """Number of rows per value of a dimension, or per GES class ("etiquette_ges")."""
+        cells = self.cells.loc[self._mask(filters)]
+        if column == GES_COLUMN:
+            ges = [f"ges|{label}" for label in GES_CLASSES if f"ges|{label}" in cells]
+            return cells[ges].sum().rename(lambda c: c.split("|")[1])
+        return cells.groupby(column)["n"].sum()
+
+    def stats(
+        self,
+        columns: list[str],
+        filters: dict[str, list] | None = None,
+        group_by: str | None = None,
+    ) -> pd.DataFrame:
+        """count, sum, avg, std, min and max of measures among the rows matching the filters.
+
+        Args:
+            columns (list[str]): Columns of MEASURES.
+            filters (dict[str, list] | None, optional): Filters on the dimensions. Defaults to None.
+            group_by (str | None, optional): A dimension to group by. Defaults to None (a single row).
+
+        Returns:
+            pd.DataFrame: One row per group, columns "<column>|<stat>".
+        """
+        cells = self.cells.loc[self._mask(filters)]
+        groups = cells.groupby(group_by) if group_by else cells.groupby(lambda _: 0)
+
+        result = {}
+        for col in columns:
+            n = groups[f"{col}|count"].sum()
+            total = groups[f"{col}|sum"].sum()
+            sumsq = groups[f"{col}|sumsq"].sum()
+            mean = total / n.where(n > 0)
+            variance = (sumsq - n * mean**2) / (n - 1).where(n > 1)
+            result |= {
+                f"{col}|count": n,
+                f"{col}|sum": total,
+                f"{col}|avg": mean,
+                f"{col}|std": np.sqrt(variance.clip(lower=0)),
+                f"{col}|min": groups[f"{col}|min"].min(),
+                f"{col}|max": groups[f"{col}|max"].max(),
+            }
+
+        df = pd.DataFrame(result)
+        return df.rename_axis(group_by).reset_index() if group_by else df
+
+    def quantiles(
+        self,
+        column: str,
+        qs: list[float],
+        filters: dict[str, list] | None = None,
+        group_by: str | None = None,
+    ) -> pd.DataFrame:
+        """Approximate quantiles of a sketched column among the rows matching the filters.
+
+        The histogram of the selection is interpolated linearly inside each bin, and the
+        result is clipped to the exact min and max of the selection. The quantiles are
+        NaN for a column without histogram (no value in the dataset) or no cell.
+
+        Returns:
+            pd.DataFrame: One row per group, one column per quantile.
+        """
+        mask = self._mask(filters)
+        cells = self.cells.loc[mask]
+        stats = self.stats([column], filters, group_by)
+        if column not in self.hist or stats.empty:
+            df = pd.DataFrame(
+                np.nan, index=range(len(stats) if group_by else 1), columns=qs
+            )
+            if group_by:
+                df.insert(0, group_by, stats[group_by].to_numpy())
+            return df
+        hist = self.hist[column][mask]
+        edges = self.edges[column]
+
+        rows = []
+        labels = cells[group_by].to_numpy() if group_by else np.zeros(len(cells))
+        for i, label in enumerate(stats[group_by] if group_by else [0]):
+            counts = hist[labels == label].sum(axis=0)
+            cumulative = np.concatenate([[0], np.cumsum(counts)])
+            low, high = stats[f"{column}|min"].iloc[i], stats[f"{column}|max"].iloc[i]
+
+            values = []
+            for q in qs:
+                if cumulative[-1] == 0:
+                    values.append(np.nan)
+                    continue
+                values.append(
+                    float(
+                        np.clip(
+                            np.interp(q * cumulative[-1], cumulative, edges), low, high
+                        )
+                    )
+                )
+            rows.append(values)
+
+        df = pd.DataFrame(rows, columns=qs)
+        if group_by:
+            df.insert(0, group_by, stats[group_by].to_numpy())
+        return df
+
+    def describe(
+        self, columns: list[str], filters: dict[str, list] | None = None
+    ) -> pd.DataFrame:
+        """Equivalent of pandas `describe()` (quartiles estimated from the sketches).
+
+        Returns:
+            pd.DataFrame: count, mean, std, min, 25%, 50%, 75% and max (rows) for each column.
+        """
+        stats = self.stats(columns, filters).iloc[0]
+        result = {}
+        for col in columns:
+            quartiles = self.quantiles(col, [0.25, 0.5, 0.75], filters).iloc[0]
+            result[col] = [
+                stats[f"{col}|count"],
+                stats[f"{col}|avg"],
+                stats[f"{col}|std"],
+                stats[f"{col}|min"],
+                *quartiles.tolist(),
+                stats[f"{col}|max"],
+            ]
+        index = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+        return pd.DataFrame(result, index=index)
+
+
+@lru_cache(maxsize=8)
+def _load_cube(name: str, version: int) -> FilterCube:
+    """Read a cube file (kept in memory for the version)."""
+    table = pq.read_table(build_cube(name))
+    edges = json.loads(table.schema.metadata[b"edges"])
+    return FilterCube(table.to_pandas(), edges)
+
+
+def load_cube(name: str) -> FilterCube:
+    """Get the cube of the current version of a dataset, built once per version.
+
+    Args:
+        name (str): The dataset name.
+
+    Returns:
+        FilterCube: The cube.
+    """
+    return _load_cube(name, read_manifest(name)["version"])
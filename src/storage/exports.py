@@ -0,0 +1,126 @@
+from pathlib import Path
+from typing import Iterator
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.storage.locks import dataset_lock, publish, temp_path
+from src.storage.parquet_store import (
+    COMPRESSION,
+    dataset_dir,
+    partition_files,
+    read_manifest,
+)
+
+# ============================================================ #
+# Download artefacts, built on demand and cached by version    #
+# ============================================================ #
+
+# Export format -> (file extension, MIME type).
+EXPORT_FORMATS = {
+    "csv.gz": ("csv.gz", "application/gzip"),
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+# Artefacts are stored next to the dataset: <name>/_exports/v<version>.<extension>
+EXPORTS_DIR = "_exports"
+
+# Rows converted at once while writing an artefact.
+BATCH_ROWS = 50_000
+
+
+def export_path(name: str, fmt: str, version: int | None = None) -> Path:
+    """Path of the download artefact of a dataset version.
+
+    Args:
+        name (str): The dataset name.
+        fmt (str): A key of EXPORT_FORMATS.
+        version (int | None, optional): The dataset version. Defaults to None (current version).
+
+    Returns:
+        Path: Path of the artefact (it may not exist yet).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    version = read_manifest(name)["version"] if version is None else version
+    extension = EXPORT_FORMATS[fmt][0]
+    return dataset_dir(name) / EXPORTS_DIR / f"v{version}.{extension}"
+
+
+def _batches(files: list[Path]) -> tuple[pa.Schema, Iterator[pa.RecordBatch]]:
+    """Schema and record batches of the partition files, read batch by batch."""
+    if not files:
+        return pa.schema([]), iter([])
+    schema = pa.unify_schemas([pq.read_schema(f) for f in files])
+    dataset = ds.dataset(files, schema=schema, format="parquet")
+    return schema, dataset.to_batches(batch_size=BATCH_ROWS)
+
+
+def build_export(name: str, fmt: str = "csv.gz") -> Path:
+    """Get the download artefact of the current version of a dataset, building it if missing.
+
+    The artefact is written batch by batch, the dataset is never fully loaded in memory.
+    Artefacts of older versions are removed.
+
+    Args:
+        name (str): The dataset name.
+        fmt (str, optional): A key of EXPORT_FORMATS. Defaults to "csv.gz".
+
+    Returns:
+        Path: Path of the artefact.
+    """
+    with dataset_lock(name, shared=True):
+        path = export_path(name, fmt)
+        if path.exists():
+            return path
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = temp_path(path)
+        schema, batches = _batches(partition_files(name))
+
+        if fmt == "parquet":
+            with pq.ParquetWriter(tmp_path, schema, compression=COMPRESSION) as writer:
+                for batch in batches:
+                    writer.write_batch(batch)
+        else:
+            compression = "gzip" if fmt == "csv.gz" else None
+            with pa.output_stream(tmp_path, compression=compression) as sink:
+                with pacsv.CSVWriter(sink, schema) as writer:
+                    for batch in batches:
+                        writer.write_batch(batch)
+
+        publish(tmp_path, path)
+
+    extension = EXPORT_FORMATS[fmt][0]
+    for old in path.parent.glob(f"v*.{extension}"):
+        if old != path:
+            old.unlink(missing_ok=True)
+
+    return path
+
+
+def iter_export(
+    name: str, fmt: str = "csv.gz", chunk_size: int = 1024**2
+) -> Iterator[bytes]:
+    """Build (if needed) the download artefact of a dataset and iterate over its bytes, chunk by chunk.
+
+    Args:
+        name (str): The dataset name.
+        fmt (str, optional): A key of EXPORT_FORMATS. Defaults to "csv.gz".
+        chunk_size (int, optional): Size of the chunks in bytes. Defaults to 1 MiB.
+
+    Returns:
+        Iterator[bytes]: The chunks of the artefact.
+    """
+    # Opened now: the file stays readable even if a new version removes it meanwhile.
+    f = open(build_export(name, fmt), "rb")
+
+    def chunks():
+        with f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    return chunks()
@@ -0,0 +1,86 @@
+import os
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.storage import DATASETS_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ============================================================ #
+# Advisory locks and durable writes                            #
+# ============================================================ #
+
+# One lock file per dataset (and one for the catalog), outside the dataset
+# directories so deleting a dataset does not remove a lock in use.
+LOCKS_DIR = DATASETS_DIR / "_locks"
+
+
+@contextmanager
+def dataset_lock(name: str, shared: bool = False):
+    """Hold the advisory lock of a dataset, across threads and processes.
+
+    Writers take the lock exclusively, readers share it: a reader never sees files
+    removed by a concurrent write, and two writers of a dataset run one after the other.
+    Writes to different datasets run in parallel. The lock is not reentrant.
+
+    Args:
+        name (str): The dataset name (or "_catalog").
+        shared (bool, optional): Take a shared (read) lock. Defaults to False (exclusive).
+    """
+    LOCKS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(LOCKS_DIR / f"{name}.lock", "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            # msvcrt only offers exclusive locks (blocking, retried every second).
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def fsync_file(path: Path) -> None:
+    """Flush a written file to disk."""
+    with open(path, "rb+") as f:
+        os.fsync(f.fileno())
+
+
+def fsync_dir(path: Path) -> None:
+    """Flush a directory entry (after a rename) to disk, where the OS allows it."""
+    if fcntl is None:
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def temp_path(path: Path) -> Path:
+    """Unique temporary path next to a file, renamed over it once written."""
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+def publish(tmp_path: Path, path: Path) -> None:
+    """Flush a temporary file and atomically rename it to its final path."""
+    fsync_file(tmp_path)
+    os.replace(tmp_path, path)
+    fsync_dir(path.parent)
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Write a text file atomically: temporary file, fsync, then rename."""
+    tmp_path = temp_path(path)
+    tmp_path.write_text(text, encoding="utf-8")
+    publish(tmp_path, path)
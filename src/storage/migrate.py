@@ -0,0 +1,12 @@
+"""
+One-shot migration of the legacy datasets (CSV files, single parquet files) to the partitioned parquet store,
+then rebuild the catalog of the stored datasets.
+
+Usage: python -m src.storage.migrate
+"""
+
+from src.storage.parquet_store import migrate_csv_datasets
+
+if __name__ == "__main__":
+    names = migrate_csv_datasets()
+    print(f"{len(names)} dataset(s) migrated: {', '.join(names) or '-'}")
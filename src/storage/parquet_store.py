@@ -0,0 +1,538 @@
+import datetime as dt
+import json
+import shutil
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.storage import DATASETS_DIR
+from src.storage.catalog import (
+    CATALOG_LOCK,
+    catalog_entry,
+    partition_stats,
+    remove_entry,
+    update_entry,
+    write_catalog,
+)
+from src.storage.locks import atomic_write_text, dataset_lock, publish, temp_path
+
+# Compression codec used for every stored dataset.
+COMPRESSION = "zstd"
+
+# Each dataset is a directory of partitions: <name>/departement=<dep>/annee=<year>/part-<id>.parquet
+# The manifest lists the live partition files and the dataset version.
+MANIFEST_FILE = "_manifest.json"
+UNKNOWN_PARTITION = "unknown"
+
+# Typed schema of a cleaned dataset (output of DataCleaner.clean_all).
+# Columns not listed here are stored with the type inferred by pyarrow.
+DATASET_SCHEMA: dict[str, pa.DataType] = {
+    "cout_total_5_usages": pa.float64(),
+    "cout_chauffage": pa.float64(),
+    "cout_eclairage": pa.float64(),
+    "cout_refroidissement": pa.float64(),
+    "cout_auxiliaires": pa.float64(),
+    "cout_ecs": pa.float64(),
+    "conso_5_usages_ef": pa.float64(),
+    "conso_chauffage_ef": pa.float64(),
+    "conso_eclairage_ef": pa.float64(),
+    "conso_auxiliaires_ef": pa.float64(),
+    "conso_ecs_ef": pa.float64(),
+    "conso_refroidissement_ef": pa.float64(),
+    "surface_habitable_logement": pa.float64(),
+    "nombre_niveau_logement": pa.float64(),
+    "type_batiment": pa.string(),
+    "annee_construction": pa.int32(),
+    "code_insee_ban": pa.string(),
+    "code_departement_ban": pa.string(),
+    "etiquette_dpe": pa.string(),
+    "etiquette_ges": pa.string(),
+    "nom_commune_ban": pa.string(),
+    "code_postal_ban": pa.string(),
+    "emission_ges_chauffage": pa.float64(),
+    "emission_ges_eclairage": pa.float64(),
+    "emission_ges_ecs": pa.float64(),
+    "emission_ges_5_usages": pa.float64(),
+    "emission_ges_auxiliaires": pa.float64(),
+    "emission_ges_refroidissement": pa.float64(),
+    "type_energie_principale_chauffage": pa.string(),
+    "age_batiment": pa.int32(),
+    "date_reception_dpe": pa.date32(),
+    "numero_dpe": pa.string(),
+    "lat": pa.float64(),
+    "lon": pa.float64(),
+    "zone_climatique": pa.string(),
+    "code_insee": pa.string(),
+    "altitude_moyenne": pa.float64(),
+}
+
+# Codes that must keep their leading zeros when read back from a CSV file.
+CSV_STRING_COLUMNS = {
+    "code_insee_ban",
+    "code_departement_ban",
+    "code_postal_ban",
+    "code_insee",
+}
+
+
+# ============================================================ #
+# Schema handling                                              #
+# ============================================================ #
+
+
+def _coerce_column(series: pd.Series, dtype: pa.DataType) -> pd.Series:
+    """Cast a pandas column to the pandas type matching the target arrow type.
+
+    Args:
+        series (pd.Series): The column to cast.
+        dtype (pa.DataType): The arrow type of the column in the stored schema.
+
+    Returns:
+        pd.Series: The casted column, missing values are kept as missing.
+    """
+    if pa.types.is_string(dtype):
+        return series.where(series.isna(), series.astype(str))
+    if pa.types.is_date(dtype):
+        return pd.to_datetime(series, errors="coerce")
+    if pa.types.is_integer(dtype):
+        values = pd.to_numeric(series, errors="coerce").round()
+        # Only fall back to the nullable integer type when values are missing.
+        return (
+            values.astype("int32") if values.notna().all() else values.astype("Int32")
+        )
+    return pd.to_numeric(series, errors="coerce").astype("float64")
+
+
+def to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Convert a cleaned DataFrame to an arrow table following DATASET_SCHEMA.
+
+    Args:
+        df (pd.DataFrame): The cleaned dataset.
+
+    Returns:
+        pa.Table: The typed arrow table, without the pandas index.
+    """
+    df = df.copy()
+    fields = []
+
+    for col in df.columns:
+        dtype = DATASET_SCHEMA.get(col)
+        if dtype is None:
+            # Unknown column: let pyarrow infer its type.
+            fields.append(pa.field(col, pa.array(df[col], from_pandas=True).type))
+            continue
+
+        df[col] = _coerce_column(df[col], dtype)
+        fields.append(pa.field(col, dtype))
+
+    return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    """Convert a stored arrow table back to a DataFrame (dates as datetime64)."""
+    return table.to_pandas(date_as_object=False)
+
+
+def conform(df: pd.DataFrame) -> pd.DataFrame:
+    """Give a freshly cleaned DataFrame the same column types as a stored dataset.
+
+    Needed before concatenating new rows with a stored dataset, so duplicates are detected.
+    """
+    return to_pandas(to_arrow(df))
+
+
+# ============================================================ #
+# Partitions and manifest                                      #
+# ============================================================ #
+
+
+def dataset_dir(name: str) -> Path:
+    """Get the directory storing a dataset.
+
+    Args:
+        name (str): The dataset name (e.g. "data_69").
+
+    Returns:
+        Path: Path to the dataset directory.
+    """
+    return DATASETS_DIR / name
+
+
+def read_manifest(name: str) -> dict:
+    """Read the manifest of a dataset.
+
+    The manifest contains the dataset version, its columns and its partitions:
+    "<departement>/<year>" -> {"departement", "year", "file", "rows", "stats"}.
+    """
+    return json.loads((dataset_dir(name) / MANIFEST_FILE).read_text(encoding="utf-8"))
+
+
+def _write_manifest(name: str, manifest: dict) -> None:
+    """Replace the manifest of a dataset in one step, so readers never see a partial file."""
+    atomic_write_text(dataset_dir(name) / MANIFEST_FILE, json.dumps(manifest, indent=2))
+
+
+def _partition_keys(df: pd.DataFrame) -> pd.DataFrame:
+    """Department and reception year of each row, used as partition keys."""
+    departement = (
+        df["code_departement_ban"]
+        if "code_departement_ban" in df.columns
+        else pd.Series(pd.NA, index=df.index)
+    )
+    date = (
+        pd.to_datetime(df["date_reception_dpe"], errors="coerce")
+        if "date_reception_dpe" in df.columns
+        else pd.Series(pd.NaT, index=df.index)
+    )
+    return pd.DataFrame(
+        {
+            "departement": departement.astype("string").fillna(UNKNOWN_PARTITION),
+            "year": date.dt.year.astype("Int64")
+            .astype("string")
+            .fillna(UNKNOWN_PARTITION),
+        },
+        index=df.index,
+    )
+
+
+def _write_partition(name: str, departement: str, year: str, df: pd.DataFrame) -> dict:
+    """Write the rows of one partition to a new parquet file (flushed to disk before the manifest references it).
+
+    Returns:
+        dict: The manifest entry of the partition.
+    """
+    relative = Path(f"departement={departement}") / f"annee={year}"
+    relative /= f"part-{uuid.uuid4().hex[:12]}.parquet"
+
+    path = dataset_dir(name) / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temp_path(path)
+    pq.write_table(to_arrow(df), tmp_path, compression=COMPRESSION)
+    publish(tmp_path, path)
+
+    return {
+        "departement": departement,
+        "year": None if year == UNKNOWN_PARTITION else int(year),
+        "file": relative.as_posix(),
+        "rows": len(df),
+        "stats": partition_stats(df),
+    }
+
+
+def _commit(name: str, manifest: dict, partitions: dict[str, dict], columns) -> dict:
+    """Publish new partitions: bump the version, swap the manifest, update the catalog, then remove the replaced files.
+
+    Must be called with the dataset lock held. The manifest swap is the commit point:
+    a crash before it leaves the previous version intact.
+
+    Args:
+        name (str): The dataset name.
+        manifest (dict): The current manifest (empty for a new dataset).
+        partitions (dict[str, dict]): The partitions of the new version.
+        columns: The dataset columns.
+
+    Returns:
+        dict: The new manifest.
+    """
+    old_files = {p["file"] for p in manifest.get("partitions", {}).values()}
+
+    new_manifest = {
+        "name": name,
+        "version": manifest.get("version", 0) + 1,
+        "updated_at": dt.datetime.now().isoformat(timespec="seconds"),
+        "columns": list(columns),
+        "partitions": dict(sorted(partitions.items())),
+    }
+    _write_manifest(name, new_manifest)
+    update_entry(name, new_manifest)
+
+    # Files no longer referenced by the manifest can now be removed.
+    live_files = {p["file"] for p in partitions.values()}
+    for file in old_files - live_files:
+        (dataset_dir(name) / file).unlink(missing_ok=True)
+
+    return new_manifest
+
+
+# ============================================================ #
+# Dataset storage                                              #
+# ============================================================ #
+
+
+def list_datasets() -> list[str]:
+    """List the names of the stored datasets, sorted alphabetically."""
+    return sorted(f.parent.name for f in DATASETS_DIR.glob(f"*/{MANIFEST_FILE}"))
+
+
+def dataset_columns(name: str) -> list[str]:
+    """Get the column names of a stored dataset without reading its data."""
+    return read_manifest(name)["columns"]
+
+
+def partition_files(
+    name: str,
+    departments: list[str] | None = None,
+    years: list[int] | None = None,
+) -> list[Path]:
+    """Get the files of the partitions matching the departments and reception years.
+
+    Args:
+        name (str): The dataset name.
+        departments (list[str] | None, optional): Departments to keep. Defaults to None (all).
+        years (list[int] | None, optional): Reception years to keep. Defaults to None (all).
+
+    Returns:
+        list[Path]: Paths of the matching partition files.
+    """
+    departments = {str(d).zfill(2) for d in departments} if departments else None
+    years = set(years) if years else None
+
+    return [
+        dataset_dir(name) / p["file"]
+        for p in read_manifest(name)["partitions"].values()
+        if (departments is None or p["departement"] in departments)
+        and (years is None or p["year"] in years)
+    ]
+
+
+def _read_files(files: list[Path], columns: list[str] | None) -> pd.DataFrame:
+    """Read partition files into a single DataFrame (columns missing from a file are filled with nulls)."""
+    if not files:
+        return pd.DataFrame(columns=columns or [])
+
+    schema = pa.unify_schemas([pq.read_schema(f) for f in files])
+    if columns is not None:
+        columns = [c for c in columns if c in schema.names]
+
+    dataset = ds.dataset(files, schema=schema, format="parquet")
+    return to_pandas(dataset.to_table(columns=columns))
+
+
+def read_dataset(
+    name: str,
+    columns: list[str] | None = None,
+    departments: list[str] | None = None,
+    years: list[int] | None = None,
+) -> pd.DataFrame:
+    """Read a stored dataset, only loading the requested columns and partitions from disk.
+
+    Args:
+        name (str): The dataset name.
+        columns (list[str] | None, optional): Columns to read. Unknown columns are ignored. Defaults to None (all columns).
+        departments (list[str] | None, optional): Only read these departments. Defaults to None (all).
+        years (list[int] | None, optional): Only read these reception years. Defaults to None (all).
+
+    Returns:
+        pd.DataFrame: The dataset.
+    """
+    with dataset_lock(name, shared=True):
+        return _read_files(partition_files(name, departments, years), columns)
+
+
+def read_partitions(
+    departments: list[str] | None = None,
+    years: list[int] | None = None,
+    columns: list[str] | None = None,
+    names: list[str] | None = None,
+) -> pd.DataFrame:
+    """Read the matching partitions across several datasets (multi-department analysis).
+
+    Args:
+        departments (list[str] | None, optional): Departments to read. Defaults to None (all).
+        years (list[int] | None, optional): Reception years to read. Defaults to None (all).
+        columns (list[str] | None, optional): Columns to read. Defaults to None (all columns).
+        names (list[str] | None, optional): Datasets to read from. Defaults to None (all datasets).
+
+    Returns:
+        pd.DataFrame: The rows of the matching partitions.
+    """
+    names = sorted(names or list_datasets())
+    with ExitStack() as locks:
+        for name in names:
+            locks.enter_context(dataset_lock(name, shared=True))
+
+        files = [f for name in names for f in partition_files(name, departments, years)]
+        return _read_files(files, columns)
+
+
+def write_dataset(df: pd.DataFrame, name: str) -> dict:
+    """Write a cleaned dataset to the parquet store, replacing any previous version.
+
+    Args:
+        df (pd.DataFrame): The cleaned dataset.
+        name (str): The dataset name.
+
+    Returns:
+        dict: The manifest of the new version.
+    """
+    with dataset_lock(name):
+        return _write_dataset(df, name)
+
+
+def _write_dataset(df: pd.DataFrame, name: str) -> dict:
+    """Write a dataset, the dataset lock must be held."""
+    dataset_dir(name).mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(name) if name in list_datasets() else {}
+
+    keys = _partition_keys(df)
+
+    partitions = {}
+    for (departement, year), part in df.groupby([keys["departement"], keys["year"]]):
+        partitions[f"{departement}/{year}"] = _write_partition(
+            name, departement, year, part
+        )
+
+    return _commit(name, manifest, partitions, df.columns)
+
+
+def append_dataset(df: pd.DataFrame, name: str) -> dict:
+    """Append rows to a stored dataset, only rewriting the partitions receiving new rows.
+
+    Rows already present in a partition are not duplicated.
+
+    Args:
+        df (pd.DataFrame): The new cleaned rows.
+        name (str): The dataset name (created if missing).
+
+    Returns:
+        dict: The manifest of the new version.
+    """
+    with dataset_lock(name):
+        if name not in list_datasets():
+            return _write_dataset(df, name)
+        return _append_dataset(df, name)
+
+
+def _append_dataset(df: pd.DataFrame, name: str) -> dict:
+    """Append rows to an existing dataset, the dataset lock must be held.
+
+    Appending only rows already stored keeps the current version (and the files
+    derived from it).
+    """
+    manifest = read_manifest(name)
+    partitions = dict(manifest["partitions"])
+    keys = _partition_keys(df)
+    rewritten = False
+
+    for (departement, year), part in df.groupby([keys["departement"], keys["year"]]):
+        key = f"{departement}/{year}"
+
+        if key in partitions:
+            existing = _read_files([dataset_dir(name) / partitions[key]["file"]], None)
+            part = pd.concat([existing, conform(part)], ignore_index=True)
+            part = part.drop_duplicates()
+
+            # Nothing new in this partition: keep the current file.
+            if len(part) == len(existing):
+                continue
+
+        partitions[key] = _write_partition(name, departement, year, part)
+        rewritten = True
+
+    columns = list(dict.fromkeys(manifest["columns"] + list(df.columns)))
+    if not rewritten and columns == manifest["columns"]:
+        return manifest
+    return _commit(name, manifest, partitions, columns)
+
+
+def delete_dataset(name: str) -> None:
+    """Remove a dataset from the store."""
+    with dataset_lock(name):
+        shutil.rmtree(dataset_dir(name), ignore_errors=True)
+        remove_entry(name)
+
+
+def rebuild_catalog() -> dict[str, dict]:
+    """Rebuild the catalog from the manifests of the stored datasets.
+
+    Returns:
+        dict[str, dict]: The catalog entries.
+    """
+    entries = {}
+    for name in list_datasets():
+        with dataset_lock(name, shared=True):
+            entries[name] = catalog_entry(name, read_manifest(name))
+
+    with dataset_lock(CATALOG_LOCK):
+        write_catalog(entries)
+    return entries
+
+
+# ============================================================ #
+# CSV import / export                                          #
+# ============================================================ #
+
+
+def read_csv(path) -> pd.DataFrame:
+    """Read a dataset CSV file (path or file-like) while keeping the code columns as strings."""
+    return pd.read_csv(
+        path, low_memory=False, dtype={c: str for c in CSV_STRING_COLUMNS}
+    )
+
+
+def import_csv(path: Path, name: str | None = None) -> str:
+    """Import a dataset CSV file into the parquet store.
+
+    Args:
+        path (Path): Path to the CSV file.
+        name (str | None, optional): Dataset name. Defaults to the file stem.
+
+    Returns:
+        str: The name of the imported dataset.
+    """
+    name = name or Path(path).stem
+    write_dataset(read_csv(path), name)
+    return name
+
+
+def export_csv(name: str, path: Path) -> Path:
+    """Export a stored dataset to a CSV file.
+
+    Args:
+        name (str): The dataset name.
+        path (Path): Destination CSV path.
+
+    Returns:
+        Path: The destination path.
+    """
+    read_dataset(name).to_csv(path, index=False)
+    return path
+
+
+def migrate_csv_datasets(overwrite: bool = False) -> list[str]:
+    """One-shot migration of the legacy datasets to the partitioned parquet store.
+
+    Handles the CSV files and the single-file parquet datasets of the previous layout.
+    CSV files are kept in place, so the migration can be run again safely.
+
+    Args:
+        overwrite (bool, optional): Re-import CSV files already migrated. Defaults to False.
+
+    Returns:
+        list[str]: Names of the migrated datasets.
+    """
+    migrated = []
+    existing = set(list_datasets())
+
+    for csv_path in sorted(DATASETS_DIR.glob("*.csv")):
+        if csv_path.stem in existing and not overwrite:
+            continue
+
+        print(f"Migrating {csv_path.name} to parquet...")
+        migrated.append(import_csv(csv_path))
+
+    for parquet_path in sorted(DATASETS_DIR.glob("*.parquet")):
+        print(f"Partitioning {parquet_path.name}...")
+        write_dataset(to_pandas(pq.read_table(parquet_path)), parquet_path.stem)
+        parquet_path.unlink()
+        migrated.append(parquet_path.stem)
+
+    # Datasets written before the catalog existed are registered here.
+    rebuild_catalog()
+
+    return migrated
@@ -0,0 +1,261 @@
+from typing import Any
+
+import duckdb
+import pandas as pd
+
+from src.storage.locks import dataset_lock
+from src.storage.parquet_store import dataset_columns, partition_files
+
+# ============================================================ #
+# Embedded SQL engine (DuckDB) over the stored parquet files   #
+# ============================================================ #
+
+# Value used for missing categories, same as the statistics page filters.
+UNKNOWN = "Unknown"
+
+# Aggregation functions allowed in `aggregate`.
+AGGREGATIONS = {
+    "count": "count({col})",
+    "sum": "sum({col})",
+    "avg": "avg({col})",
+    "min": "min({col})",
+    "max": "max({col})",
+    "std": "stddev_samp({col})",
+    "median": "median({col})",
+    "q1": "quantile_cont({col}, 0.25)",
+    "q3": "quantile_cont({col}, 0.75)",
+}
+
+# A single in-memory database shared by the process, each query gets its own cursor (thread safe).
+_connection = duckdb.connect()
+
+# A filter maps a column either to a list of accepted values or to a (min, max) range.
+Filters = dict[str, list[Any] | tuple[float, float]]
+
+
+def _quote(column: str) -> str:
+    """Quote a column name for SQL."""
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _source(name: str, filters: Filters | None = None) -> str:
+    """SQL table expression reading a stored dataset.
+
+    Partitions are pruned with the filters on the department and on the reception date,
+    so files which cannot match are never opened.
+    """
+    departments, years = None, None
+    if filters:
+        if isinstance(filters.get("code_departement_ban"), list):
+            departments = filters["code_departement_ban"]
+        if isinstance(filters.get("date_reception_dpe"), tuple):
+            start, end = pd.to_datetime(list(filters["date_reception_dpe"]))
+            years = list(range(start.year, end.year + 1))
+
+    files = partition_files(name, departments, years)
+    if not files:
+        # Keep the dataset schema but return no rows.
+        files, empty = partition_files(name)[:1], " LIMIT 0"
+        if not files:
+            # Empty dataset: no file to read the schema from.
+            columns = ", ".join(f"NULL AS {_quote(c)}" for c in dataset_columns(name))
+            return f"(SELECT {columns} LIMIT 0)"
+    else:
+        empty = ""
+
+    paths = ", ".join("'" + str(f).replace("'", "''") + "'" for f in files)
+    return f"(SELECT * FROM read_parquet([{paths}], union_by_name = true, hive_partitioning = false){empty})"
+
+
+def _check_columns(name: str, columns) -> None:
+    """Raise a ValueError if some columns do not exist in the dataset."""
+    unknown = set(columns) - set(dataset_columns(name))
+    if unknown:
+        raise ValueError(f"Unknown column(s) for dataset {name}: {sorted(unknown)}")
+
+
+def _where(name: str, filters: Filters | None) -> tuple[str, list[Any]]:
+    """Build the WHERE clause and its parameters from a filters dictionary.
+
+    Args:
+        name (str): The dataset name.
+        filters (Filters | None): Column -> list of accepted values (missing values match "Unknown"), or column -> (min, max) range.
+
+    Returns:
+        tuple[str, list[Any]]: The WHERE clause (empty string without filters) and the query parameters.
+    """
+    if not filters:
+        return "", []
+
+    _check_columns(name, filters)
+
+    clauses, params = [], []
+    for col, value in filters.items():
+        if isinstance(value, tuple):
+            clauses.append(f"{_quote(col)} BETWEEN ? AND ?")
+            params.extend(value)
+        elif not value:
+            # Nothing selected: no row can match.
+            clauses.append("FALSE")
+        else:
+            placeholders = ", ".join("?" for _ in value)
+            clauses.append(
+                f"coalesce(CAST({_quote(col)} AS VARCHAR), '{UNKNOWN}') IN ({placeholders})"
+            )
+            params.extend(str(v) for v in value)
+
+    return " WHERE " + " AND ".join(clauses), params
+
+
+def _execute(sql: str, params: list[Any]) -> pd.DataFrame:
+    """Run a query on a new cursor and fetch the result as a DataFrame.
+
+    Callers hold the shared dataset lock from the listing of the files to the end of the
+    query, so a concurrent write cannot remove the files being read.
+    """
+    cursor = _connection.cursor()
+    try:
+        return cursor.execute(sql, params).df()
+    finally:
+        cursor.close()
+
+
+def query_dataset(
+    name: str,
+    columns: list[str] | None = None,
+    filters: Filters | None = None,
+    sample: int | None = None,
+    limit: int | None = None,
+    seed: int = 42,
+) -> pd.DataFrame:
+    """Fetch the rows of a dataset matching the filters, only reading the requested columns.
+
+    Args:
+        name (str): The dataset name.
+        columns (list[str] | None, optional): Columns to return. Defaults to None (all columns).
+        filters (Filters | None, optional): Filters pushed down to the query. Defaults to None.
+        sample (int | None, optional): Random sample size taken among the matching rows. Defaults to None.
+        limit (int | None, optional): Maximum number of rows. Defaults to None.
+        seed (int, optional): Seed of the random sample. Defaults to 42.
+
+    Returns:
+        pd.DataFrame: The matching rows.
+    """
+    if columns:
+        _check_columns(name, columns)
+        select = ", ".join(_quote(c) for c in columns)
+    else:
+        select = "*"
+
+    where, params = _where(name, filters)
+    with dataset_lock(name, shared=True):
+        sql = f"SELECT {select} FROM {_source(name, filters)}{where}"
+
+        if sample is not None:
+            # The sample clause applies before WHERE, so sample from a subquery.
+            sql = f"SELECT * FROM ({sql}) USING SAMPLE reservoir({int(sample)} ROWS) REPEATABLE ({int(seed)})"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+
+        return _execute(sql, params)
+
+
+def count_rows(name: str, filters: Filters | None = None) -> int:
+    """Count the rows of a dataset matching the filters."""
+    where, params = _where(name, filters)
+    with dataset_lock(name, shared=True):
+        result = _execute(
+            f"SELECT count(*) AS n FROM {_source(name, filters)}{where}", params
+        )
+    return int(result["n"].iloc[0])
+
+
+def distinct_values(
+    name: str, column: str, filters: Filters | None = None
+) -> list[str]:
+    """Sorted distinct values of a column among the rows matching the filters (missing values as "Unknown")."""
+    _check_columns(name, [column])
+    where, params = _where(name, filters)
+    expr = f"coalesce(CAST({_quote(column)} AS VARCHAR), '{UNKNOWN}')"
+    with dataset_lock(name, shared=True):
+        result = _execute(
+            f"SELECT DISTINCT {expr} AS value FROM {_source(name, filters)}{where} ORDER BY value",
+            params,
+        )
+    return result["value"].tolist()
+
+
+def aggregate(
+    name: str,
+    metrics: dict[str, tuple[str, str]],
+    group_by: list[str] | None = None,
+    filters: Filters | None = None,
+) -> pd.DataFrame:
+    """Compute aggregations over the rows matching the filters.
+
+    Args:
+        name (str): The dataset name.
+        metrics (dict[str, tuple[str, str]]): Output column -> (aggregation, column), the aggregation being a key of AGGREGATIONS.
+            "count" accepts "*" as column.
+        group_by (list[str] | None, optional): Grouping columns. Defaults to None (a single row).
+        filters (Filters | None, optional): Filters pushed down to the query. Defaults to None.
+
+    Returns:
+        pd.DataFrame: One row per group, one column per metric (plus the grouping columns).
+
+    Example:
+        >>> aggregate("data_69", {"n": ("count", "*"), "cost": ("avg", "cout_total_5_usages")}, group_by=["etiquette_dpe"])
+    """
+    group_by = group_by or []
+    _check_columns(name, group_by + [c for _, c in metrics.values() if c != "*"])
+
+    selects = [_quote(c) for c in group_by]
+    for alias, (func, col) in metrics.items():
+        if func not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation: {func}")
+        col_sql = "*" if col == "*" else _quote(col)
+        selects.append(f"{AGGREGATIONS[func].format(col=col_sql)} AS {_quote(alias)}")
+
+    where, params = _where(name, filters)
+    with dataset_lock(name, shared=True):
+        sql = f"SELECT {', '.join(selects)} FROM {_source(name, filters)}{where}"
+        if group_by:
+            keys = ", ".join(_quote(c) for c in group_by)
+            sql += f" GROUP BY {keys} ORDER BY {keys}"
+
+        return _execute(sql, params)
+
+
+def describe(
+    name: str, columns: list[str], filters: Filters | None = None
+) -> pd.DataFrame:
+    """Equivalent of pandas `describe()` for numeric columns, computed by the engine.
+
+    Returns:
+        pd.DataFrame: count, mean, std, min, 25%, 50%, 75% and max (rows) for each column.
+    """
+    stats = {"count": "count", "mean": "avg", "std": "std", "min": "min"}
+    stats |= {"25%": "q1", "50%": "median", "75%": "q3", "max": "max"}
+
+    metrics = {
+        f"{col}|{stat}": (func, col) for col in columns for stat, func in stats.items()
+    }
+    row = aggregate(name, metrics, filters=filters).iloc[0]
+
+    return pd.DataFrame(
+        {col: [row[f"{col}|{stat}"] for stat in stats] for col in columns},
+        index=list(stats),
+    )
+
+
+def correlation(name: str, x: str, y: str, filters: Filters | None = None) -> float:
+    """Pearson correlation between two numeric columns among the rows matching the filters (NaN if undefined)."""
+    _check_columns(name, [x, y])
+    where, params = _where(name, filters)
+    with dataset_lock(name, shared=True):
+        result = _execute(
+            f"SELECT corr({_quote(x)}, {_quote(y)}) AS r FROM {_source(name, filters)}{where}",
+            params,
+        )
+    value = result["r"].iloc[0]
+    return float("nan") if pd.isna(value) else float(value)
@@ -0,0 +1,238 @@
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.storage.locks import dataset_lock, publish, temp_path
+from src.storage.parquet_store import (
+    COMPRESSION,
+    _read_files,
+    dataset_dir,
+    partition_files,
+    read_manifest,
+)
+
+# ============================================================ #
+# Multi-resolution spatial grid (quadtree of map tiles)        #
+# ============================================================ #
+
+# Grid levels, a level z splits the world in 2^z x 2^z web map tiles.
+LEVELS = range(6, 16)
+
+DPE_CLASSES = ["A", "B", "C", "D", "E", "F", "G"]
+
+# The grid is stored next to the dataset: <name>/_grid/v<version>-f<format>.parquet,
+# the format being bumped when the columns of the grid change.
+GRID_DIR = "_grid"
+GRID_FORMAT = 2
+
+# Perimeter of the Earth at the equator, in meters.
+EARTH_CIRCUMFERENCE = 40_075_016.686
+
+
+def grid_path(name: str, version: int) -> Path:
+    """Path of the spatial grid of a dataset version."""
+    return dataset_dir(name) / GRID_DIR / f"v{version}-f{GRID_FORMAT}.parquet"
+
+
+def tile_coordinates(
+    lat: np.ndarray, lon: np.ndarray, level: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Web map tile (x, y) containing each point at a grid level.
+
+    Args:
+        lat (np.ndarray): Latitudes in degrees.
+        lon (np.ndarray): Longitudes in degrees.
+        level (int): The grid level.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The tile columns and rows.
+    """
+    n = 2**level
+    lat_rad = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = np.floor((lon + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat_rad)) / np.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype("int64"), np.clip(y, 0, n - 1).astype("int64")
+
+
+def tile_size_meters(lat: np.ndarray | float, level: int) -> np.ndarray | float:
+    """Width in meters of a tile of a grid level at a latitude."""
+    return EARTH_CIRCUMFERENCE * np.cos(np.radians(lat)) / 2**level
+
+
+def _compute_grid(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate the points of a dataset in the bins of every grid level.
+
+    Args:
+        df (pd.DataFrame): The dataset (lat, lon, etiquette_dpe, cout_total_5_usages).
+
+    Returns:
+        pd.DataFrame: One row per non-empty bin: level, x, y, n, centroid (lat, lon),
+            number of rows per DPE class (n_A ... n_G), sum of the total cost and
+            number of rows with a cost (cost_sum, cost_n), overall and per DPE class
+            (cost_sum_A, cost_n_A ...).
+    """
+    df = df.dropna(subset=["lat", "lon"])
+    lat, lon = df["lat"].to_numpy("float64"), df["lon"].to_numpy("float64")
+    dpe = (
+        df["etiquette_dpe"].astype("string").fillna("")
+        if "etiquette_dpe" in df.columns
+        else pd.Series("", index=df.index)
+    )
+    cost = (
+        pd.to_numeric(df["cout_total_5_usages"], errors="coerce").to_numpy("float64")
+        if "cout_total_5_usages" in df.columns
+        else np.full(len(df), np.nan)
+    )
+    # Homes without a cost are left out of the mean cost, not counted as 0.
+    has_cost = ~np.isnan(cost)
+    cost = np.where(has_cost, cost, 0.0)
+
+    # Tiles of the finest level, coarser levels are obtained by bit shifts.
+    finest = max(LEVELS)
+    x_max, y_max = tile_coordinates(lat, lon, finest)
+
+    bins = []
+    for level in LEVELS:
+        shift = finest - level
+        x, y = x_max >> shift, y_max >> shift
+        keys, cell = np.unique(x * 2**level + y, return_inverse=True)
+        nb_bins = len(keys)
+
+        n = np.bincount(cell, minlength=nb_bins)
+        columns = {
+            "level": np.full(nb_bins, level, dtype="int8"),
+            "x": (keys // 2**level).astype("int32"),
+            "y": (keys % 2**level).astype("int32"),
+            "n": n,
+            "lat": np.bincount(cell, weights=lat, minlength=nb_bins) / n,
+            "lon": np.bincount(cell, weights=lon, minlength=nb_bins) / n,
+            "cost_sum": np.bincount(cell, weights=cost, minlength=nb_bins),
+            "cost_n": np.bincount(cell[has_cost], minlength=nb_bins),
+        }
+        for label in DPE_CLASSES:
+            mask = (dpe == label).to_numpy()
+            columns[f"n_{label}"] = np.bincount(cell[mask], minlength=nb_bins)
+            columns[f"cost_sum_{label}"] = np.bincount(
+                cell[mask], weights=cost[mask], minlength=nb_bins
+            )
+            columns[f"cost_n_{label}"] = np.bincount(
+                cell[mask & has_cost], minlength=nb_bins
+            )
+        bins.append(pd.DataFrame(columns))
+
+    return pd.concat(bins, ignore_index=True)
+
+
+def build_grid(name: str) -> Path:
+    """Get the spatial grid of the current version of a dataset, building it if missing.
+
+    Args:
+        name (str): The dataset name.
+
+    Returns:
+        Path: Path of the grid file.
+    """
+    with dataset_lock(name, shared=True):
+        version = read_manifest(name)["version"]
+        path = grid_path(name, version)
+        if path.exists():
+            return path
+
+        columns = ["lat", "lon", "etiquette_dpe", "cout_total_5_usages"]
+        # Read without read_dataset: the lock is held and is not reentrant.
+        grid = _compute_grid(_read_files(partition_files(name), columns))
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = temp_path(path)
+        grid.to_parquet(tmp_path, index=False, compression=COMPRESSION)
+        publish(tmp_path, path)
+
+    for old in path.parent.glob("v*.parquet"):
+        if old != path:
+            old.unlink(missing_ok=True)
+
+    return path
+
+
+@lru_cache(maxsize=8)
+def _load_grid(name: str, version: int) -> pd.DataFrame:
+    """Read a grid file (kept in memory for the version)."""
+    return pq.read_table(build_grid(name)).to_pandas()
+
+
+def load_grid(name: str) -> pd.DataFrame:
+    """Get the spatial grid of the current version of a dataset, built once per version."""
+    return _load_grid(name, read_manifest(name)["version"])
+
+
+def grid_bins(
+    name: str,
+    level: int,
+    bbox: tuple[float, float, float, float] | None = None,
+    dpe_classes: list[str] | None = None,
+) -> pd.DataFrame:
+    """Bins of a grid level, restricted to a bounding box and to some DPE classes.
+
+    Args:
+        name (str): The dataset name.
+        level (int): The grid level (clipped to LEVELS).
+        bbox (tuple[float, float, float, float] | None, optional): (lat_min, lon_min, lat_max, lon_max). Defaults to None.
+        dpe_classes (list[str] | None, optional): DPE classes to count. Defaults to None (all rows).
+
+    Returns:
+        pd.DataFrame: The non-empty bins: lat, lon, n (rows of the selected classes),
+            dominant DPE class, mean cost of the selected rows with a cost and bin
+            size in meters.
+    """
+    level = int(np.clip(level, min(LEVELS), max(LEVELS)))
+    grid = load_grid(name)
+    bins = grid[grid["level"] == level]
+
+    if bbox is not None:
+        lat_min, lon_min, lat_max, lon_max = bbox
+        bins = bins[bins["lat"].between(lat_min, lat_max)]
+        bins = bins[bins["lon"].between(lon_min, lon_max)]
+
+    class_counts = bins[[f"n_{c}" for c in DPE_CLASSES]].to_numpy()
+    if dpe_classes is None:
+        n = bins["n"].to_numpy()
+        cost_sum, cost_n = bins["cost_sum"].to_numpy(), bins["cost_n"].to_numpy()
+    else:
+        selected = np.isin(DPE_CLASSES, dpe_classes)
+        class_counts = np.where(selected, class_counts, 0)
+        n = class_counts.sum(axis=1)
+        classes = [c for c in DPE_CLASSES if c in dpe_classes]
+        cost_sum = bins[[f"cost_sum_{c}" for c in classes]].to_numpy().sum(axis=1)
+        cost_n = bins[[f"cost_n_{c}" for c in classes]].to_numpy().sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cost_mean = np.where(cost_n > 0, cost_sum / cost_n, np.nan)
+
+    result = pd.DataFrame(
+        {
+            "lat": bins["lat"].to_numpy(),
+            "lon": bins["lon"].to_numpy(),
+            "n": n,
+            "etiquette_dpe": np.array(DPE_CLASSES)[class_counts.argmax(axis=1)],
+            "cout_moyen": np.round(cost_mean, 0),
+            "size_m": tile_size_meters(bins["lat"].to_numpy(), level),
+        }
+    )
+    return result[result["n"] > 0].reset_index(drop=True)
+
+
+def viewport_bbox(
+    lat: float, lon: float, zoom: float, width_px: int = 1000, height_px: int = 600
+) -> tuple[float, float, float, float]:
+    """Bounding box seen by a web map of a given size, centered on a point at a zoom level.
+
+    Returns:
+        tuple[float, float, float, float]: (lat_min, lon_min, lat_max, lon_max).
+    """
+    degrees_per_px = 360.0 / (256 * 2**zoom)
+    half_width = width_px / 2 * degrees_per_px
+    half_height = height_px / 2 * degrees_per_px * np.cos(np.radians(lat))
+    return lat - half_height, lon - half_width, lat + half_height, lon + half_width
@@ -0,0 +1,201 @@
+from functools import lru_cache
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from sklearn.neighbors import BallTree
+
+from src.storage.arrow_mmap import materialise
+from src.storage.locks import publish, temp_path
+from src.storage.parquet_store import dataset_dir, read_manifest
+
+# ============================================================ #
+# Spatial index of the dataset coordinates                     #
+# ============================================================ #
+
+# The index is stored next to the dataset: <name>/_spatial/v<version>.joblib
+SPATIAL_DIR = "_spatial"
+
+# Mean radius of the Earth, in meters.
+EARTH_RADIUS = 6_371_008.8
+
+
+def index_path(name: str, version: int) -> Path:
+    """Path of the spatial index of a dataset version."""
+    return dataset_dir(name) / SPATIAL_DIR / f"v{version}.joblib"
+
+
+class SpatialIndex:
+    """Bounding box, radius and k-nearest queries over the homes of a dataset version.
+
+    Rows are identified by their position in the memory-mapped Arrow file of the
+    version (see arrow_mmap), the same file the rows are read from.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, version: int):
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+        self.version = version
+        self.row_ids = np.flatnonzero(valid)
+        lat, lon = lat[valid], lon[valid]
+
+        # Bounding boxes: binary search on the sorted latitudes, then a longitude mask.
+        order = np.argsort(lat, kind="stable")
+        self.sorted_lat = lat[order]
+        self.sorted_lon = lon[order]
+        self.sorted_ids = self.row_ids[order]
+
+        # Radius and nearest neighbours: ball tree on the sphere (haversine).
+        self.tree = (
+            BallTree(np.radians(np.column_stack([lat, lon])), metric="haversine")
+            if len(lat)
+            else None
+        )
+        self.table = None
+
+    def __getstate__(self) -> dict:
+        # The memory-mapped table is attached at load time, never persisted.
+        return {k: v for k, v in self.__dict__.items() if k != "table"}
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.table = None
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    def bbox(
+        self, lat_min: float, lon_min: float, lat_max: float, lon_max: float
+    ) -> np.ndarray:
+        """Rows inside a bounding box.
+
+        Returns:
+            np.ndarray: The row ids, in file order.
+        """
+        start = np.searchsorted(self.sorted_lat, lat_min, side="left")
+        stop = np.searchsorted(self.sorted_lat, lat_max, side="right")
+        lon = self.sorted_lon[start:stop]
+        inside = (lon >= lon_min) & (lon <= lon_max)
+        return np.sort(self.sorted_ids[start:stop][inside])
+
+    def within(
+        self, lat: float, lon: float, radius_m: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Rows within a distance of a point, closest first.
+
+        Args:
+            lat (float): Latitude of the point.
+            lon (float): Longitude of the point.
+            radius_m (float): The distance in meters.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The row ids and their distances in meters.
+        """
+        if self.tree is None:
+            return np.array([], dtype="int64"), np.array([])
+        ind, dist = self.tree.query_radius(
+            np.radians([[lat, lon]]),
+            r=radius_m / EARTH_RADIUS,
+            return_distance=True,
+            sort_results=True,
+        )
+        return self.row_ids[ind[0]], dist[0] * EARTH_RADIUS
+
+    def nearest(self, lat: float, lon: float, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """The k rows closest to a point, closest first.
+
+        Args:
+            lat (float): Latitude of the point.
+            lon (float): Longitude of the point.
+            k (int): Number of rows.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The row ids and their distances in meters.
+        """
+        k = min(k, len(self))
+        if k == 0:
+            return np.array([], dtype="int64"), np.array([])
+        dist, ind = self.tree.query(np.radians([[lat, lon]]), k=k)
+        return self.row_ids[ind[0]], dist[0] * EARTH_RADIUS
+
+    def rows(
+        self, row_ids: np.ndarray, columns: list[str] | None = None
+    ) -> pd.DataFrame:
+        """Read rows of the indexed version from its memory-mapped file.
+
+        Args:
+            row_ids (np.ndarray): Row ids returned by a query.
+            columns (list[str] | None, optional): Columns to read. Unknown columns are ignored. Defaults to None (all columns).
+
+        Returns:
+            pd.DataFrame: The rows, in the order of row_ids.
+        """
+        table = self.table
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+        return table.take(pa.array(row_ids, type=pa.int64())).to_pandas()
+
+
+def _coordinates(table: pa.Table, column: str) -> np.ndarray:
+    """A coordinate column as float64 (NaN when missing)."""
+    if column not in table.column_names:
+        return np.full(table.num_rows, np.nan)
+    values = table.column(column).cast(pa.float64()).to_numpy(zero_copy_only=False)
+    return np.asarray(values, dtype="float64")
+
+
+def _open_version(name: str) -> tuple[int, pa.Table]:
+    """Version and memory-mapped table of the current version of a dataset."""
+    arrow_path = materialise(name)
+    # The file of a version is immutable: no lock is needed to read it, and it
+    # stays readable while mapped even if a newer version removes it.
+    table = pa.ipc.open_file(pa.memory_map(str(arrow_path), "r")).read_all()
+    return int(arrow_path.stem.removeprefix("v")), table
+
+
+def build_index(name: str) -> Path:
+    """Get the spatial index of the current version of a dataset, building it if missing.
+
+    Args:
+        name (str): The dataset name.
+
+    Returns:
+        Path: Path of the index file.
+    """
+    version, table = _open_version(name)
+    path = index_path(name, version)
+    if path.exists():
+        return path
+
+    index = SpatialIndex(
+        _coordinates(table, "lat"), _coordinates(table, "lon"), version
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temp_path(path)
+    joblib.dump(index, tmp_path)
+    publish(tmp_path, path)
+
+    for old in path.parent.glob("v*.joblib"):
+        if old != path:
+            old.unlink(missing_ok=True)
+
+    return path
+
+
+@lru_cache(maxsize=8)
+def _load_index(name: str, version: int) -> SpatialIndex:
+    """Read an index file and attach the memory-mapped table of its version."""
+    index = joblib.load(build_index(name))
+    table_version, table = _open_version(name)
+    if table_version != index.version:
+        # A new version was written in between: index that one instead.
+        return _load_index(name, table_version)
+    index.table = table
+    return index
+
+
+def load_spatial_index(name: str) -> SpatialIndex:
+    """Get the spatial index of the current version of a dataset, built once per version."""
+    return _load_index(name, read_manifest(name)["version"])
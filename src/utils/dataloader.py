@@ -1,74 +1,102 @@
-from pathlib import Path
-
 import pandas as pd
 import streamlit as st
 
-# ============================================================ #
-# Loader for csv files in stream lit application with caching  #
-# ============================================================ #
+from src.storage import read_catalog
+from src.storage.cache import dataset_cache
+
+# ================================================================ #
+# Loader for stored datasets in stream lit application with caching #
+# ================================================================ #
 
 
-@st.cache_data
-def load_csv(path: Path) -> pd.DataFrame:
-    """Function to cache loaded dataset.
+def load_dataset(name: str, columns: list[str] | None = None) -> pd.DataFrame:
+    """Load a dataset through the process-wide cache shared by all sessions.
 
     Args:
-        path (Path): Path to the CSV file.
+        name (str): Name of the stored dataset.
+        columns (list[str] | None, optional): Columns to read from disk. Defaults to None (all columns).
 
     Returns:
-        pd.DataFrame: Loaded DataFrame.
+        pd.DataFrame: Loaded DataFrame, sharing its data with the cache (read-only).
     """
-    return pd.read_csv(path)
+    return dataset_cache.get(name, columns)
 
 
-def generate_file_selector(sidebar: bool = True):
-    """
-    Generate a file selector in the sidebar and load the selected file into session state.
-    Cache the loaded file into st.session_sate.df
+def generate_file_selector(
+    sidebar: bool = True, columns: list[str] | None = None, load_data: bool = True
+):
     """
+    Generate a file selector in the sidebar and load the selected dataset into session state.
+    The loaded dataset (st.session_sate.df) shares its data with the process-wide dataset cache:
+    it is read-only, copy it before modifying values in place.
 
-    # === Path to CSV Files ===
-    DATASETS_DIR = Path(__file__).parent.parent.parent / "data" / "datasets"
+    Args:
+        sidebar (bool, optional): Display the selector in the sidebar. Defaults to True.
+        columns (list[str] | None, optional): Columns needed by the page, only those are read from disk. Defaults to None (all columns).
+        load_data (bool, optional): Load the dataset in memory. Pages querying the dataset through the query engine
+            only need the selected name (st.session_state.last_file). Defaults to True.
+    """
 
     # === Side bar files selection ===
-    csv_files = sorted([f.name for f in DATASETS_DIR.glob("*.csv")])
+    # The catalog gives the datasets and their size without opening any file.
+    catalog = read_catalog()
+    datasets = list(catalog)
+
+    # Forget a dataset which has been removed from the store.
+    if st.session_state.get("last_file", None) not in datasets:
+        st.session_state.last_file = None
 
     # Get the default index of the menu.
     default_index = (
-        csv_files.index(st.session_state.last_file) + 1
-        if st.session_state.get("last_file", None) in csv_files
+        datasets.index(st.session_state.last_file) + 1
+        if st.session_state.last_file in datasets
         else 0
     )
 
     # Call back function.
     def load_selected_file():
         if st.session_state.selected_file == "Select a dataset":
-            st.session_state.df = None
             st.session_state.last_file = None
             return
 
-        file_path = DATASETS_DIR / st.session_state.selected_file
-        st.session_state.df = load_csv(file_path)
         st.session_state.last_file = st.session_state.selected_file
         st.sidebar.success(
             f"✅ Dataset `{st.session_state.selected_file}` successfully loaded"
         )
 
+    # Display the number of rows next to each dataset name.
+    def format_dataset(name: str) -> str:
+        if name not in catalog:
+            return name
+        return f"{name} ({catalog[name]['rows']:,} rows)"
+
     # Selectbox avec on_change
     if sidebar:
         st.sidebar.selectbox(
             "**Select your dataset:**",
-            ["Select a dataset"] + csv_files,
+            ["Select a dataset"] + datasets,
             index=default_index,
             key="selected_file",
             on_change=load_selected_file,
+            format_func=format_dataset,
         )
 
     else:
         st.selectbox(
             "**Select your dataset:**",
-            ["Select a dataset"] + csv_files,
+            ["Select a dataset"] + datasets,
             index=default_index,
             key="selected_file",
             on_change=load_selected_file,
+            format_func=format_dataset,
         )
+
+    if not load_data:
+        return
+
+    # Load the selected dataset, the cache serves the current version of the dataset.
+    if st.session_state.last_file is None:
+        st.session_state.df = None
+        return
+
+    st.session_state.df = load_dataset(st.session_state.last_file, columns)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+# ============================================================ #
+# Compact data sent to the pydeck map                          #
+# ============================================================ #
+
+DPE_CLASSES = ["A", "B", "C", "D", "E", "F", "G"]
+
+# RGBA color of each DPE class, the last row is used for unknown labels.
+DPE_PALETTE = np.array(
+    [
+        [38, 160, 110, 255],  # A: Dark green
+        [84, 176, 87, 255],  # B: Green
+        [165, 202, 118, 255],  # C: Light green
+        [238, 229, 54, 255],  # D: Yellow
+        [237, 180, 37, 255],  # E: Orange
+        [231, 131, 63, 255],  # F: Orange red
+        [212, 38, 41, 255],  # G: Red
+        [128, 128, 128, 255],  # Unknown: Grey
+    ],
+    dtype="uint8",
+)
+
+# 5 decimals of a degree is about 1 m, finer positions only make the payload heavier.
+# (The map is sent as JSON: float32 positions would be printed with float64 digits.)
+POSITION_DECIMALS = 5
+
+# Color accessor of a layer built on map_payload().
+FILL_COLOR = "[r, g, b, a]"
+
+
+def dpe_rgba(labels: pd.Series, alpha: int = 255) -> np.ndarray:
+    """RGBA color of DPE labels, looked up in DPE_PALETTE without any Python loop.
+
+    Args:
+        labels (pd.Series): The DPE labels.
+        alpha (int, optional): Opacity of the colors (0-255). Defaults to 255.
+
+    Returns:
+        np.ndarray: A (n, 4) uint8 array.
+    """
+    codes = pd.Categorical(labels, categories=DPE_CLASSES).codes
+    # Unknown labels (code -1) take the last row of the palette.
+    colors = DPE_PALETTE[np.where(codes < 0, len(DPE_CLASSES), codes)]
+    colors[:, 3] = alpha
+    return colors
+
+
+def map_payload(
+    df: pd.DataFrame,
+    tooltip_columns: list[str] | None = None,
+    alpha: int = 255,
+) -> pd.DataFrame:
+    """Minimal typed table drawn by a pydeck layer.
+
+    Only the position (lon, lat), the color channels (r, g, b, a) and the columns
+    shown in the tooltip are kept, so each point is serialized with a handful of
+    short numbers instead of the whole row and a Python list of colors.
+
+    Args:
+        df (pd.DataFrame): Points with lat, lon and etiquette_dpe columns.
+        tooltip_columns (list[str] | None, optional): Other columns to keep. Defaults to None.
+        alpha (int, optional): Opacity of the colors (0-255). Defaults to 255.
+
+    Returns:
+        pd.DataFrame: The payload, to draw with get_position="[lon, lat]" and
+            get_fill_color=FILL_COLOR.
+    """
+    payload = pd.DataFrame(
+        {
+            "lon": df["lon"].to_numpy("float64").round(POSITION_DECIMALS),
+            "lat": df["lat"].to_numpy("float64").round(POSITION_DECIMALS),
+        }
+    )
+    rgba = dpe_rgba(df["etiquette_dpe"], alpha)
+    for i, channel in enumerate("rgba"):
+        payload[channel] = rgba[:, i]
+
+    for column in tooltip_columns or []:
+        if column in payload.columns:
+            continue
+        values = df[column].to_numpy()
+        if pd.api.types.is_float_dtype(values.dtype):
+            values = values.round(0)
+        payload[column] = values
+
+    return payload